@@ -0,0 +1,166 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from migrations import (
+    LATEST_SERIES, PROGRESS_COLUMNS, PROGRESS_SERIES, latest_columns, latest_refresh,
+    latest_select, progress_refresh, progress_select,
+)
+
+# =========================
+# PROGRESS & PERSENTIL KOHORT
+# =========================
+# Nilai setiap pelajar (terkini, beza, purata bergerak) disimpan dalam
+# student_progress oleh trigger. Persentil bergantung pada semua ahli
+# kohort (kelas + jantina + umur), jadi ia dikira semasa dibaca daripada
+# baris kelas itu sahaja, bukan disimpan dan ditulis semula setiap insert.
+METRICS = tuple(PROGRESS_SERIES)
+
+METRIC_FIELDS = ("count", "latest", "latest_date", "delta", "change", "trend")
+
+# perubahan lebih kecil dari ini dikira "stabil"
+STEADY = {"bmi": 0.2, "fitness": 0.5}
+
+
+def _progress_columns():
+    return ", ".join(
+        f"p.{metric}_{field}" for metric in METRICS for field in METRIC_FIELDS
+    )
+
+
+# status semasa (BMI dan tahap kecergasan terkini) dari student_latest
+CLASS_PROGRESS_SQL = f"""
+    SELECT s.student_id, s.name, s.gender, s.age, {_progress_columns()},
+           l.bmi_status, l.fitness_level
+    FROM student s
+    LEFT JOIN student_progress p ON p.student_id = s.student_id
+    LEFT JOIN student_latest l ON l.student_id = s.student_id
+    WHERE s.class_id IS ?
+    ORDER BY s.name, s.student_id
+"""
+
+
+def direction(metric, value):
+    if value is None:
+        return None
+    if abs(value) < STEADY[metric]:
+        return "steady"
+    return "up" if value > 0 else "down"
+
+
+def percentile(ordered, value):
+    # kedudukan tengah: (bawah + bawah-atau-sama) / 2 / n; ordered mesti disusun
+    below = bisect_left(ordered, value)
+    at_or_below = bisect_right(ordered, value)
+    return round(100 * (below + at_or_below) / 2 / len(ordered))
+
+
+def _metric(row, metric):
+    data = {field: row[f"{metric}_{field}"] for field in METRIC_FIELDS}
+    data["count"] = data["count"] or 0
+    data["direction"] = direction(metric, data["trend"] if data["trend"] is not None else data["delta"])
+    data["percentile"] = None
+    data["cohort"] = 0
+    return data
+
+
+def class_progress(conn, class_id):
+    rows = []
+    cohorts = defaultdict(list)
+    for row in conn.execute(CLASS_PROGRESS_SQL, (class_id,)):
+        item = {
+            "student_id": row["student_id"],
+            "name": row["name"],
+            "gender": row["gender"],
+            "age": row["age"],
+            "bmi_status": row["bmi_status"],
+            "fitness_level": row["fitness_level"],
+        }
+        for metric in METRICS:
+            item[metric] = _metric(row, metric)
+        rows.append(item)
+        cohorts[(row["gender"], row["age"])].append(item)
+
+    for members in cohorts.values():
+        for metric in METRICS:
+            values = sorted(m[metric]["latest"] for m in members if m[metric]["latest"] is not None)
+            for m in members:
+                if m[metric]["latest"] is not None:
+                    m[metric]["percentile"] = percentile(values, m[metric]["latest"])
+                    m[metric]["cohort"] = len(values)
+    return rows
+
+
+def class_averages(rows):
+    # purata perubahan kelas (pelajar yang ada sekurang-kurangnya 2 ujian)
+    averages = {}
+    for metric in METRICS:
+        deltas = [r[metric]["delta"] for r in rows if r[metric]["delta"] is not None]
+        averages[metric] = {
+            "students": len(deltas),
+            "delta": round(sum(deltas) / len(deltas), 2) if deltas else None,
+        }
+    return averages
+
+
+def student_progress(conn, student_id):
+    student = conn.execute(
+        "SELECT class_id FROM student WHERE student_id = ?", (student_id,)
+    ).fetchone()
+    if student is None:
+        return None
+    for row in class_progress(conn, student["class_id"]):
+        if row["student_id"] == int(student_id):
+            return row
+    return None
+
+
+# =========================
+# SEMAKAN
+# =========================
+def check(conn):
+    # pulangkan [(student_id, metrik, nilai disimpan, nilai sebenar)]
+    problems = []
+    for metric in METRICS:
+        names = ", ".join(f"{metric}_{c}" for c in PROGRESS_COLUMNS)
+        stored = {
+            row[0]: tuple(row[1:])
+            for row in conn.execute(f"SELECT student_id, {names} FROM student_progress")
+        }
+        for row in conn.execute(progress_select(metric)):
+            expected = tuple(row[1:])
+            # pelajar tanpa baris = tiada rekod langsung
+            actual = stored.get(row[0], (0,) + (None,) * (len(PROGRESS_COLUMNS) - 1))
+            if _rounded(actual) != _rounded(expected):
+                problems.append((row[0], metric, actual, expected))
+    return problems
+
+
+def check_latest(conn):
+    # pulangkan [(student_id, jadual, nilai disimpan, nilai sebenar)]
+    problems = []
+    for table in LATEST_SERIES:
+        columns = latest_columns(table)
+        stored = {
+            row[0]: tuple(row[1:])
+            for row in conn.execute(f"SELECT student_id, {', '.join(columns)} FROM student_latest")
+        }
+        for row in conn.execute(latest_select(table)):
+            expected = tuple(row[1:])
+            actual = stored.get(row[0], (None,) * len(columns))
+            if _rounded(actual) != _rounded(expected):
+                problems.append((row[0], table, actual, expected))
+    return problems
+
+
+def _rounded(values):
+    return tuple(round(v, 4) if isinstance(v, float) else v for v in values)
+
+
+def rebuild(conn):
+    # tidak commit; pemanggil yang tentukan transaction
+    conn.execute("DELETE FROM student_progress")
+    for metric in METRICS:
+        conn.execute(progress_refresh(metric, None))
+    conn.execute("DELETE FROM student_latest")
+    for table in LATEST_SERIES:
+        conn.execute(latest_refresh(table))
@@ -1,29 +1,403 @@
+import hmac
 import os
-import sqlite3
-from flask import Flask, render_template, request, redirect, url_for, session
-from werkzeug.security import check_password_hash
+import time
+import uuid
+
+import click
+from flask import (
+    Flask, Response, abort, jsonify, render_template, request, redirect, send_file,
+    send_from_directory, url_for, session
+)
+
+import analytics
+import auth
+import backup
+import cache
+import capture
+import changes
+import db
+import export
+import fitness
+import importer
+import jobs
+import metrics
+import migrations
+import norms
+import reports
+import search
+import serving
+import shards
+import summary
+from classification import bmi_status, calculate_bmi, reclassify_bmi, to_metres
+from pagination import Page, page_args
 
 # =========================
 # APP CONFIG
 # =========================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+
+def env_setting(name, default, cast=str):
+    # semua tetapan boleh diganti dengan environment variable SEGAK_*
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return cast(value)
+
+
+def env_flag(value):
+    return value.lower() in ("1", "true", "yes", "on")
+
+
 app = Flask(
     __name__,
     template_folder=os.path.join(BASE_DIR, "templates"),
     static_folder=os.path.join(BASE_DIR, "static")
 )
-app.secret_key = "segak_secret_key"
 
-DATABASE = os.path.join(BASE_DIR, "segak.db")
+# kunci dev hanya untuk `python app.py`; create_app() menolaknya
+DEV_SECRET_KEY = "segak_secret_key"
+app.secret_key = env_setting("SEGAK_SECRET_KEY", DEV_SECRET_KEY)
+
+DATABASE = env_setting("SEGAK_DATABASE", os.path.join(BASE_DIR, "segak.db"))
+REPORT_DIR = env_setting("SEGAK_REPORT_DIR", os.path.join(BASE_DIR, "reports_cache"))
+IMPORT_DIR = env_setting("SEGAK_IMPORT_DIR", os.path.join(BASE_DIR, "import_uploads"))
+BACKUP_DIR = env_setting("SEGAK_BACKUP_DIR", os.path.join(BASE_DIR, "backups"))
+
+# worker thread job queue dalam setiap process app
+JOB_THREADS = env_setting("SEGAK_JOB_THREADS", 2, int)
+
+# semakan kata laluan serentak (scrypt) bagi setiap process; lalai
+# CPU / SEGAK_WORKERS supaya semua worker gunicorn bersama tidak melebihi CPU
+auth.configure(env_setting(
+    "SEGAK_HASH_THREADS", auth.threads_per_worker(env_setting("SEGAK_WORKERS", 1, int)), int
+))
+
+# cache header untuk static, gzip/brotli untuk HTML dan JSON
+serving.init_app(app)
+
+# histogram request/template/query di /metrics dan log query perlahan
+METRICS_ENABLED = env_setting("SEGAK_METRICS", True, env_flag)
+METRICS_TOKEN = env_setting("SEGAK_METRICS_TOKEN", None)
+SLOW_QUERY_MS = env_setting("SEGAK_SLOW_QUERY_MS", 100.0, float)
+# pecahan request yang diprofil dengan cProfile (0 = tiada)
+PROFILE_SAMPLE = env_setting("SEGAK_PROFILE_SAMPLE", 0.0, float)
+PROFILE_DIR = env_setting("SEGAK_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+
+# token untuk sistem hiliran yang baca /changes (tanpa session guru)
+SYNC_TOKEN = env_setting("SEGAK_SYNC_TOKEN", None)
+
+# satu fail DB bagi setiap sekolah (<dir>/<kod>.db); kosong = SEGAK_DATABASE sahaja
+SHARD_DIR = env_setting("SEGAK_SHARD_DIR", None)
+# thread untuk query serentak merentas shard (login, laporan daerah)
+shards.configure(env_setting("SEGAK_FANOUT_THREADS", shards.FANOUT_THREADS, int))
+
+if METRICS_ENABLED:
+    metrics.init_app(
+        app,
+        slow_query_seconds=SLOW_QUERY_MS / 1000,
+        profile_sample=PROFILE_SAMPLE,
+        profile_dir=PROFILE_DIR,
+        slow_log_path=env_setting("SEGAK_SLOW_QUERY_LOG", None)
+    )
+DB_FACTORY = metrics.InstrumentedConnection if METRICS_ENABLED else db.Connection
 
 # =========================
 # DATABASE CONNECTION
 # =========================
+db.init_app(app)
+router = shards.Router(DATABASE, SHARD_DIR)
+
+
+def current_db_path():
+    # shard sekolah pengguna yang login (session["school"])
+    return router.path(session.get("school"))
+
+
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # connection dikongsi sepanjang request, dipulangkan ke pool oleh teardown
+    return db.get_db(current_db_path(), DB_FACTORY)
+
+
+@app.before_request
+def require_school():
+    # session sebelum shard, atau shard yang sudah dibuang: login semula
+    if router.sharded and session.get("role") and session.get("school") not in router.schools():
+        session.clear()
+        return redirect(url_for("login"))
+
+
+@app.before_request
+def start_job_workers():
+    # sekali bagi setiap process dan shard; selepas itu hanya semakan dict
+    if not router.sharded or session.get("school"):
+        jobs.start_workers(current_db_path(), JOB_THREADS)
+
+
+@app.context_processor
+def inject_principal():
+    # nama & kelas untuk header base.html, dibaca semula (dicache) setiap render
+    if session.get("role") not in ("teacher", "student"):
+        return {}
+    return {"principal": cache.principal(get_db_connection(), session["role"], session.get("user_id"))}
+
+
+def report_dir(school):
+    # fail laporan diasingkan ikut shard (kunci laporan ikut id kelas shard)
+    return os.path.join(REPORT_DIR, school) if school else REPORT_DIR
+
+
+# Command CLI jalan pada setiap shard, atau satu shard dengan --school.
+school_option = click.option("--school", default=None, help="Only this school's shard.")
+
+
+def cli_paths(school):
+    schools = [school] if school else router.schools()
+    try:
+        return [(s, router.path(s)) for s in schools]
+    except shards.UnknownSchool:
+        raise click.ClickException(f"no shard for school {school!r} in {SHARD_DIR}")
+
+
+def cli_path(school):
+    # command yang ubah satu rekod: shard mesti dipilih
+    if router.sharded and not school:
+        raise click.ClickException("--school is required with SEGAK_SHARD_DIR")
+    return cli_paths(school)[0][1]
+
+
+def cli_label(school):
+    return f"{school}: " if school else ""
+
+
+@app.cli.command("migrate")
+@school_option
+def migrate_command(school):
+    """Apply pending schema migrations to segak.db (or every shard)."""
+    for school, path in cli_paths(school):
+        conn = db.open_connection(path)
+        applied = migrations.migrate(conn)
+        conn.close()
+
+        for version, name in applied:
+            print(f"{cli_label(school)}applied {version}: {name}")
+        if not applied:
+            print(f"{cli_label(school)}schema is up to date")
+
+
+@app.cli.command("reclassify")
+@school_option
+def reclassify_command(school):
+    """Recompute BMI status and fitness level for every stored record."""
+    for school, path in cli_paths(school):
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        bmi_changed = reclassify_bmi(conn)
+        segak_changed = fitness.rescore_all(conn)
+        conn.commit()
+        conn.close()
+
+        print(f"{cli_label(school)}{bmi_changed} BMI record(s) and "
+              f"{segak_changed} SEGAK record(s) updated")
+
+
+@app.cli.command("worker")
+@click.option("--threads", default=JOB_THREADS, show_default=True)
+@school_option
+def worker_command(threads, school):
+    """Run background job workers in the foreground (per shard)."""
+    started = [jobs.start_workers(path, threads) for _, path in cli_paths(school)]
+    print(f"{threads} job worker(s) per database, {len(started)} database(s), Ctrl+C to stop")
+    try:
+        for _, pool in started:
+            for thread in pool:
+                while thread.is_alive():
+                    thread.join(1)
+    except KeyboardInterrupt:
+        for stop, _ in started:
+            stop.set()
+
+
+@app.cli.command("check-summaries")
+@click.option("--rebuild", is_flag=True, help="Rebuild the summary tables from scratch.")
+@school_option
+def check_summaries_command(rebuild, school):
+    """Compare summary, student progress and latest-record tables with the raw records."""
+    for school, path in cli_paths(school):
+        label = cli_label(school)
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        problems = summary.check(conn)
+        progress_problems = analytics.check(conn)
+        latest_problems = analytics.check_latest(conn)
+
+        for table, key, stored, expected in problems:
+            print(f"{label}{table} {key}: stored {stored}, expected {expected}")
+        for student_id, metric, stored, expected in progress_problems:
+            print(f"{label}student_progress {student_id} {metric}: "
+                  f"stored {stored}, expected {expected}")
+        for student_id, table, stored, expected in latest_problems:
+            print(f"{label}student_latest {student_id} {table}: "
+                  f"stored {stored}, expected {expected}")
+        print(f"{label}{len(problems) + len(progress_problems) + len(latest_problems)} mismatch(es)")
+
+        if rebuild:
+            summary.rebuild(conn)
+            analytics.rebuild(conn)
+            conn.commit()
+            print(f"{label}summary, progress and latest-record tables rebuilt")
+        conn.close()
+
+
+@app.cli.command("restore")
+@click.argument("kind", type=click.Choice(sorted(changes.RESTORE_KINDS)))
+@click.argument("row_id", type=int)
+@school_option
+def restore_command(kind, row_id, school):
+    """Bring back a deleted student, BMI record or SEGAK test."""
+    path = cli_path(school)
+    conn = db.open_connection(path)
+    db.ensure_migrated(conn, path)
+    restored = changes.restore(conn, kind, row_id)
+    conn.commit()
+    conn.close()
+
+    if not restored:
+        raise click.ClickException(f"no deleted {kind} with id {row_id}")
+    for table, count in restored.items():
+        print(f"{table}: {count} row(s) restored")
+
+
+@app.cli.command("prune-changes")
+@click.option("--days", default=365, show_default=True)
+@school_option
+def prune_changes_command(days, school):
+    """Delete change log entries, deleted-row archives and upload ids older than DAYS."""
+    for school, path in cli_paths(school):
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        pruned = changes.prune(conn, days)
+        pruned["client_entry"] = capture.prune(conn, days)
+        conn.commit()
+        conn.close()
+
+        for table, count in pruned.items():
+            print(f"{cli_label(school)}{table}: {count} row(s) deleted")
+
+
+@app.cli.command("backup")
+@school_option
+@click.option("--every", type=float, default=0,
+              help="Keep running and take a snapshot every N minutes.")
+@click.option("--keep-last", default=backup.KEEP_LAST, show_default=True)
+@click.option("--keep-daily", default=backup.KEEP_DAILY, show_default=True,
+              help="Also keep the last snapshot of each of this many days.")
+def backup_command(school, every, keep_last, keep_daily):
+    """Take an online snapshot of segak.db (or every shard) into SEGAK_BACKUP_DIR."""
+    try:
+        while True:
+            # senarai shard dibaca setiap pusingan: sekolah baru turut dibackup
+            for school_code, path in cli_paths(school):
+                start = time.perf_counter()
+                try:
+                    snapshot = backup.snapshot(path, BACKUP_DIR)
+                except backup.BackupCorrupt as e:
+                    raise click.ClickException(f"integrity check failed: {e}")
+                removed = backup.prune(
+                    BACKUP_DIR, backup.snapshot_name(path), keep_last, keep_daily
+                )
+                print(f"{cli_label(school_code)}{snapshot} "
+                      f"({os.path.getsize(snapshot) / 1e6:.1f} MB, "
+                      f"{time.perf_counter() - start:.1f}s), "
+                      f"{len(removed)} old snapshot(s) removed")
+            if not every:
+                break
+            time.sleep(every * 60)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.cli.command("backups")
+@school_option
+def backups_command(school):
+    """List snapshots in SEGAK_BACKUP_DIR, newest first."""
+    for school_code, path in cli_paths(school):
+        for taken, snapshot in backup.snapshots(BACKUP_DIR, backup.snapshot_name(path)):
+            print(f"{cli_label(school_code)}"
+                  f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(taken))}  "
+                  f"{os.path.getsize(snapshot) / 1e6:8.1f} MB  {snapshot}")
+
+
+@app.cli.command("restore-backup")
+@click.argument("snapshot", type=click.Path(exists=True, dir_okay=False))
+@school_option
+@click.option("--no-safety-copy", is_flag=True,
+              help="Do not snapshot the current database before replacing it.")
+@click.confirmation_option(prompt="Replace the live database with this snapshot?")
+def restore_backup_command(snapshot, school, no_safety_copy):
+    """Check a snapshot with PRAGMA integrity_check and copy it into the live database."""
+    path = cli_path(school)
+    try:
+        safety = backup.restore(snapshot, path, None if no_safety_copy else BACKUP_DIR)
+    except backup.BackupCorrupt as e:
+        # salinan keselamatan DB semasa rosak: DB semasa sendiri rosak
+        hint = "" if e.path == snapshot else (
+            "\nthe live database is damaged; use --no-safety-copy to restore anyway"
+        )
+        raise click.ClickException(
+            f"integrity check failed for {e.path}:\n" + "\n".join(e.errors) + hint
+        )
+    if safety:
+        print(f"previous contents saved as {safety}")
+    print(f"restored {snapshot} into {path}; integrity check ok")
+
+
+@app.cli.command("split-shards")
+@click.argument("shard_dir", type=click.Path(file_okay=False))
+@click.option("--default-school", default="SCHOOL", show_default=True,
+              help="Shard for classes without a school code and unassigned students.")
+def split_shards_command(shard_dir, default_school):
+    """Split segak.db into one database per school code in the class names."""
+    try:
+        counts = shards.split(DATABASE, shard_dir, default_school)
+    except (FileExistsError, shards.UnknownSchool) as e:
+        raise click.ClickException(f"cannot create shard {e}")
+    print(f"{len(counts)} shard(s) in {shard_dir}; set SEGAK_SHARD_DIR={shard_dir}")
+
+
+@app.cli.command("set-teacher-school")
+@click.argument("email")
+@click.argument("school")
+def set_teacher_school_command(email, school):
+    """Set a teacher's school code in segak.db, for split-shards and create-shard."""
+    if not shards.SCHOOL_PATTERN.match(school):
+        raise click.ClickException(f"invalid school code {school!r}")
+    conn = db.open_connection(DATABASE)
+    db.ensure_migrated(conn, DATABASE)
+    updated = conn.execute(
+        "UPDATE teacher SET school = ? WHERE email = ?", (school, email.strip())
+    ).rowcount
+    conn.commit()
+    conn.close()
+    if not updated:
+        raise click.ClickException(f"no teacher with email {email!r}")
+    print(f"{email}: {school}")
+
+
+@app.cli.command("create-shard")
+@click.argument("school")
+@click.option("--source", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Database to copy the schema, norms and the school's teachers from [segak.db].")
+def create_shard_command(school, source):
+    """Create an empty shard for a new school."""
+    if not router.sharded:
+        raise click.ClickException("SEGAK_SHARD_DIR is not set")
+    os.makedirs(router.shard_dir, exist_ok=True)
+    try:
+        shards.build_shard(source or DATABASE, router.shard_path(school), school, [])
+    except (FileExistsError, shards.UnknownSchool):
+        raise click.ClickException(f"invalid or existing school {school!r}")
+    print(f"created {router.shard_path(school)}")
 
 
 # =========================
@@ -32,46 +406,67 @@ def get_db_connection():
 @app.route("/", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
-        email = request.form["email"]
+        email = request.form["email"].strip()
         password = request.form["password"]
 
-        conn = get_db_connection()
+        # satu query untuk guru + pelajar (serentak dalam setiap shard);
+        # hash dalam pool terhad; login gagal berulang (IP / email)
+        # disekat sebelum hash
+        try:
+            auth.throttle(request.remote_addr, email)
+            matches = auth.authenticate(
+                shards.find_accounts(router, email, DB_FACTORY),
+                email, password, request.remote_addr
+            )
+        except auth.LoginThrottled as e:
+            minutes = max(1, round(e.retry_after / 60))
+            return render_template(
+                "login.html",
+                error=f"Too many failed attempts. Try again in {minutes} minute(s)."
+            ), 429, {"Retry-After": str(int(e.retry_after) + 1)}
+        except auth.LoginBusy:
+            return render_template(
+                "login.html", error="Too many people are signing in. Please try again."
+            ), 503, {"Retry-After": "5"}
+
+        if not matches:
+            return render_template("login.html", error="Invalid email or password")
+
+        if len(matches) > 1:
+            # satu akaun bagi setiap sekolah: sepadan di beberapa sekolah,
+            # jangan teka, minta pilih
+            session.clear()
+            session["login_choices"] = auth.login_choices(matches)
+            return redirect(url_for("login_school"))
 
-        # ===== CHECK TEACHER =====
-        teacher = conn.execute(
-            "SELECT * FROM teacher WHERE email = ?",
-            (email,)
-        ).fetchone()
+        school, account = matches[0]
+        return finish_login(account, school)
 
-        if teacher and check_password_hash(teacher["password"], password):
-            session.clear()
-            session["user_id"] = teacher["teacher_id"]
-            session["role"] = "teacher"
-            conn.close()
-            return redirect(url_for("dashboard"))
+    return render_template("login.html")
 
-        # ===== CHECK STUDENT =====
-        student = conn.execute(
-            """
-            SELECT su.*, s.name
-            FROM student_user su
-            JOIN student s ON su.student_id = s.student_id
-            WHERE su.email = ?
-            """,
-            (email,)
-        ).fetchone()
 
-        if student and check_password_hash(student["password"], password):
-            session.clear()
-            session["user_id"] = student["student_id"]
-            session["role"] = "student"
-            conn.close()
-            return redirect(url_for("student_dashboard"))
+def finish_login(account, school):
+    auth.remember(session, account, school)
+    if account["role"] == "teacher":
+        return redirect(url_for("dashboard"))
+    return redirect(url_for("student_dashboard"))
 
-        conn.close()
-        return render_template("login.html", error="Invalid email or password")
 
-    return render_template("login.html")
+@app.route("/login/school", methods=["GET", "POST"])
+def login_school():
+    # hanya selepas kata laluan disahkan (session["login_choices"])
+    choices = session.get("login_choices")
+    if not choices:
+        return redirect(url_for("login"))
+
+    if request.method == "POST":
+        picked = request.form.get("choice", type=int)
+        if picked is None or not 0 <= picked < len(choices):
+            return render_template("login.html", choices=choices, error="Choose a school")
+        choice = choices[picked]
+        return finish_login(choice, choice["school"])
+
+    return render_template("login.html", choices=choices)
 
 @app.route("/logout")
 def logout():
@@ -89,26 +484,23 @@ def dashboard():
 
     conn = get_db_connection()
 
-    # ambil nama teacher
-    teacher = conn.execute(
-        "SELECT name FROM teacher WHERE teacher_id = ?",
-        (session.get("user_id"),)
-    ).fetchone()
-
-    total_students = conn.execute("SELECT COUNT(*) FROM student").fetchone()[0]
-    total_bmi = conn.execute("SELECT COUNT(*) FROM bmi_record").fetchone()[0]
-    total_segak = conn.execute("SELECT COUNT(*) FROM segak_record").fetchone()[0]
-    total_classes = conn.execute("SELECT COUNT(*) FROM class").fetchone()[0]
-
-    conn.close()
+    # semua angka dari jadual ringkasan (O(kelas), bukan O(rekod))
+    total_students, total_bmi, total_segak, total_classes = summary.totals(conn)
+    trend = summary.term_trend(conn)
+    term = trend[0]["term"] if trend else None
 
     return render_template(
         "dashboard.html",
-        teacher_name=teacher["name"],
+        teacher_name=(cache.principal(conn, "teacher", session.get("user_id")) or {"name": ""})["name"],
         total_students=total_students,
         total_bmi=total_bmi,
         total_segak=total_segak,
-        total_classes=total_classes
+        total_classes=total_classes,
+        term=term,
+        classes=summary.class_overview(conn, term),
+        trend=trend,
+        bmi_labels=summary.BMI_LABELS,
+        fitness_labels=summary.FITNESS_LABELS
     )
 
 #student dashboard
@@ -120,37 +512,15 @@ def student_dashboard():
     student_id = session.get("user_id")
     conn = get_db_connection()
 
-    # info student
-    student = conn.execute("""
-        SELECT s.name, s.gender, s.age, c.class_name AS class
-        FROM student s
-        JOIN class c ON s.class_id = c.class_id
-        WHERE s.student_id = ?
-    """, (student_id,)).fetchone()
-
-    # BMI records (student sendiri)
-    bmi_records = conn.execute("""
-        SELECT record_date, height, weight, bmi_value, bmi_status
-        FROM bmi_record
-        WHERE student_id = ?
-        ORDER BY record_date DESC
-    """, (student_id,)).fetchall()
-
-    # SEGAK records (student sendiri)
-    segak_records = conn.execute("""
-        SELECT test_date, step_test, push_up, sit_up, sit_reach, fitness_level
-        FROM segak_record
-        WHERE student_id = ?
-        ORDER BY test_date DESC
-    """, (student_id,)).fetchall()
-
-    conn.close()
+    # info student + rekod BMI/SEGAK sendiri (dicache)
+    bundle = cache.student_results(conn, student_id)
 
     return render_template(
         "student_dashboard.html",
-        student=student,
-        bmi_records=bmi_records,
-        segak_records=segak_records
+        student=bundle["student"],
+        bmi_records=bundle["bmi"],
+        segak_records=bundle["segak"],
+        progress=analytics.student_progress(conn, student_id)
     )
 
 
@@ -164,9 +534,7 @@ def add_student():
 
     conn = get_db_connection()
 
-    classes = conn.execute(
-        "SELECT class_id, class_name FROM class ORDER BY class_name"
-    ).fetchall()
+    classes = cache.class_list(conn)
 
     if request.method == "POST":
         conn.execute(
@@ -182,7 +550,6 @@ def add_student():
             )
         )
         conn.commit()
-        conn.close()
 
         return render_template(
             "add_student.html",
@@ -190,7 +557,6 @@ def add_student():
             classes=classes
         )
 
-    conn.close()
     return render_template("add_student.html", classes=classes)
 
 
@@ -203,40 +569,44 @@ def students():
         return redirect(url_for("login"))
 
     selected_class = request.args.get("class")
+    per_page, after, start = page_args(request.args, key_size=3)
     conn = get_db_connection()
 
-    classes = conn.execute(
-        "SELECT class_name AS class FROM class ORDER BY class_name"
-    ).fetchall()
+    classes = cache.class_list(conn)
 
+    # keyset: (class_name, name, student_id) selepas baris terakhir
+    where = []
+    params = {"limit": per_page + 1}
     if selected_class:
-        students = conn.execute(
-            """
-            SELECT s.student_id, s.name, s.gender, s.age,
-                   c.class_name AS class
-            FROM student s
-            JOIN class c ON s.class_id = c.class_id
-            WHERE c.class_name = ?
-            ORDER BY s.name
-            """,
-            (selected_class,)
-        ).fetchall()
-    else:
-        students = conn.execute(
-            """
-            SELECT s.student_id, s.name, s.gender, s.age,
-                   c.class_name AS class
-            FROM student s
-            JOIN class c ON s.class_id = c.class_id
-            ORDER BY c.class_name, s.name
-            """
-        ).fetchall()
-
-    conn.close()
+        where.append("c.class_name = :class")
+        params["class"] = selected_class
+    if after:
+        where.append("""
+            c.class_name >= :after_class
+            AND (c.class_name, s.name, s.student_id) > (:after_class, :after_name, :after_id)
+        """)
+        params.update(zip(("after_class", "after_name", "after_id"), after))
+
+    rows = conn.execute(f"""
+        SELECT s.student_id, s.name, s.gender, s.age,
+               c.class_name AS class
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY c.class_name, s.name, s.student_id
+        LIMIT :limit
+    """, params).fetchall()
+
+    page = Page(
+        rows, per_page,
+        key=lambda r: (r["class"], r["name"], r["student_id"]),
+        start=start
+    )
 
     return render_template(
         "student.html",
-        students=students,
+        students=page,
+        page=page,
         classes=classes,
         selected_class=selected_class
     )
@@ -247,12 +617,11 @@ def edit_student(student_id):
     if session.get("role") != "teacher":
         return redirect(url_for("login"))
 
-
     conn = get_db_connection()
     student = conn.execute(
         "SELECT * FROM student WHERE student_id=?",(student_id,)
     ).fetchone()
-    classes = conn.execute("SELECT * FROM class").fetchall()
+    classes = cache.class_list(conn)
 
     if request.method=="POST":
         conn.execute("""
@@ -266,23 +635,19 @@ def edit_student(student_id):
             student_id
         ))
         conn.commit()
-        conn.close()
         return redirect(url_for("students"))
 
-    conn.close()
     return render_template("edit_student.html",student=student,classes=classes)
 
-#delete student
-@app.route("/delete_student/<int:student_id>")
+#delete student (soft delete: disalin ke student_deleted oleh trigger)
+@app.route("/delete_student/<int:student_id>", methods=["POST"])
 def delete_student(student_id):
     if session.get("role") != "teacher":
         return redirect(url_for("login"))
 
-
     conn = get_db_connection()
     conn.execute("DELETE FROM student WHERE student_id=?",(student_id,))
     conn.commit()
-    conn.close()
     return redirect(url_for("students"))
 
 
@@ -297,59 +662,41 @@ def add_bmi():
 
     conn = get_db_connection()
 
-    # Ambil semua class (UNIQUE)
-    classes = conn.execute(
-        "SELECT class_name FROM class ORDER BY class_name"
-    ).fetchall()
-
-    # Ambil semua student (untuk JS filter)
-    students = conn.execute(
-        """
-        SELECT s.student_id, s.name, s.gender,
-               c.class_name AS class
-        FROM student s
-        JOIN class c ON s.class_id = c.class_id
-        ORDER BY c.class_name, s.name
-        """
-    ).fetchall()
+    # roster dimuat ikut kelas oleh JS (/api/classes/<id>/students)
+    classes = cache.class_list(conn)
 
     if request.method == "POST":
         student_id = request.form["student_id"]
-        height_cm = float(request.form["height"])
+        # form dalam cm, disimpan dalam meter
+        height_m = to_metres(request.form["height"])
         weight = float(request.form["weight"])
         record_date = request.form["record_date"]
 
-        height_m = height_cm / 100
-        bmi = round(weight / (height_m * height_m), 2)
+        bmi = calculate_bmi(height_m, weight)
+        status = bmi_status(bmi)
 
-        if bmi < 18.5:
-            status = "Underweight"
-        elif bmi < 25:
-            status = "Normal"
-        elif bmi < 30:
-            status = "Overweight"
-        else:
-            status = "Obese"
-
-        conn.execute(
+        bmi_id = conn.execute(
             """
             INSERT INTO bmi_record
             (student_id, height, weight, bmi_value, bmi_status, record_date)
             VALUES (?, ?, ?, ?, ?, ?)
             """,
             (student_id, height_m, weight, bmi, status, record_date)
-        )
-        conn.commit()
-        conn.close()
+        ).lastrowid
+
+        # form dihantar semula (refresh, rangkaian putus selepas simpan):
+        # rekod kali kedua dibatalkan
+        client_id = request.form.get("client_id")
+        if client_id and not capture.claim(
+            conn, client_id, "bmi", bmi_id, student_id, session.get("user_id")
+        ):
+            conn.rollback()
+        else:
+            conn.commit()
 
         return redirect(url_for("bmi_records"))
 
-    conn.close()
-    return render_template(
-        "add_bmi.html",
-        classes=classes,
-        students=students
-    )
+    return render_template("add_bmi.html", classes=classes, client_id=uuid.uuid4().hex)
 
 
 # =========================
@@ -361,52 +708,60 @@ def bmi_records():
         return redirect(url_for("login"))
 
     selected_class = request.args.get("class")
+    per_page, after, start = page_args(request.args, key_size=5)
 
     conn = get_db_connection()
 
-    classes = conn.execute(
-        "SELECT class_name FROM class ORDER BY class_name"
-    ).fetchall()
+    classes = cache.class_list(conn)
 
+    # keyset: (class_name, name, student_id, record_date DESC, bmi_id)
+    where = []
+    params = {"limit": per_page + 1}
     if selected_class:
-        records = conn.execute("""
-            SELECT 
-                b.rowid AS bmi_id,
-                s.name,
-                c.class_name AS class,
-                b.height,
-                b.weight,
-                b.bmi_value,
-                b.bmi_status,
-                b.record_date
-            FROM bmi_record b
-            JOIN student s ON b.student_id = s.student_id
-            JOIN class c ON s.class_id = c.class_id
-            WHERE c.class_name = ?
-            ORDER BY s.name, b.record_date DESC
-        """, (selected_class,)).fetchall()
-    else:
-        records = conn.execute("""
-            SELECT 
-                b.rowid AS bmi_id,
-                s.name,
-                c.class_name AS class,
-                b.height,
-                b.weight,
-                b.bmi_value,
-                b.bmi_status,
-                b.record_date
-            FROM bmi_record b
-            JOIN student s ON b.student_id = s.student_id
-            JOIN class c ON s.class_id = c.class_id
-            ORDER BY c.class_name, s.name, b.record_date DESC
-        """).fetchall()
+        where.append("c.class_name = :class")
+        params["class"] = selected_class
+    if after:
+        where.append("""
+            c.class_name >= :after_class
+            AND (c.class_name, s.name, s.student_id) >= (:after_class, :after_name, :after_student)
+            AND ((c.class_name, s.name, s.student_id) > (:after_class, :after_name, :after_student)
+                 OR b.record_date < :after_date
+                 OR (b.record_date = :after_date AND b.bmi_id > :after_id))
+        """)
+        params.update(zip(
+            ("after_class", "after_name", "after_student", "after_date", "after_id"),
+            after
+        ))
 
-    conn.close()
+    rows = conn.execute(f"""
+        SELECT 
+            b.bmi_id,
+            s.student_id,
+            s.name,
+            c.class_name AS class,
+            b.height,
+            b.weight,
+            b.bmi_value,
+            b.bmi_status,
+            b.record_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN bmi_record b ON b.student_id = s.student_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY c.class_name, s.name, s.student_id, b.record_date DESC, b.bmi_id
+        LIMIT :limit
+    """, params).fetchall()
+
+    page = Page(
+        rows, per_page,
+        key=lambda r: (r["class"], r["name"], r["student_id"], r["record_date"], r["bmi_id"]),
+        start=start
+    )
 
     return render_template(
         "bmi_record.html",
-        records=records,
+        records=page,
+        page=page,
         classes=classes,
         selected_class=selected_class
     )
@@ -418,7 +773,6 @@ def edit_bmi(bmi_id):
     if session.get("role") != "teacher":
         return redirect(url_for("login"))
 
-
     conn = get_db_connection()
 
     record = conn.execute(
@@ -427,25 +781,16 @@ def edit_bmi(bmi_id):
     ).fetchone()
 
     if record is None:
-        conn.close()
         return "BMI record not found", 404
 
     if request.method == "POST":
-        height = float(request.form["height"])
+        # form edit dalam meter; nilai dalam cm pun diterima
+        height = to_metres(request.form["height"])
         weight = float(request.form["weight"])
         record_date = request.form["record_date"]
 
-        bmi = round(weight / (height * height), 2)
-
-
-        if bmi < 18.5:
-            status = "Underweight"
-        elif bmi < 25:
-            status = "Normal"
-        elif bmi < 30:
-            status = "Overweight"
-        else:
-            status = "Obese"
+        bmi = calculate_bmi(height, weight)
+        status = bmi_status(bmi)
 
         conn.execute("""
             UPDATE bmi_record
@@ -454,14 +799,12 @@ def edit_bmi(bmi_id):
         """, (height, weight, bmi, status, record_date, bmi_id))
 
         conn.commit()
-        conn.close()
         return redirect(url_for("bmi_records"))
 
-    conn.close()
     return render_template("edit_bmi.html", record=record)
 
 #delete bmi
-@app.route("/delete_bmi/<int:bmi_id>")
+@app.route("/delete_bmi/<int:bmi_id>", methods=["POST"])
 def delete_bmi(bmi_id):
     if session.get("role") != "teacher":
         return redirect(url_for("login"))
@@ -469,7 +812,6 @@ def delete_bmi(bmi_id):
     conn = get_db_connection()
     conn.execute("DELETE FROM bmi_record WHERE rowid = ?", (bmi_id,))
     conn.commit()
-    conn.close()
 
     return redirect(url_for("bmi_records"))
 
@@ -483,9 +825,7 @@ def add_segak():
         return redirect(url_for("login"))
 
     conn = get_db_connection()
-    students = conn.execute(
-        "SELECT student_id, name FROM student ORDER BY name"
-    ).fetchall()
+    classes = cache.class_list(conn)
 
     if request.method == "POST":
         student_id = request.form["student_id"]
@@ -494,52 +834,44 @@ def add_segak():
         step_test = int(request.form["step_test"])
         push_up = int(request.form["push_up"])
         sit_up = int(request.form["sit_up"])
-        sit_reach = int(request.form["sit_reach"])
-
-        # =========================
-        # SEGAK FITNESS LOGIC (BETUL)
-        # =========================
-
-        # PRIORITY: POOR
-        if push_up < 10 or sit_up < 10 or sit_reach < 2:
-            fitness_level = "Poor"
+        sit_reach = float(request.form["sit_reach"])
 
-        # AVERAGE
-        elif push_up < 20 or sit_up < 20:
-            fitness_level = "Average"
-
-        # GOOD
-        elif push_up < 25 or sit_up < 25:
-            fitness_level = "Good"
-
-        # EXCELLENT
-        else:
-            fitness_level = "Excellent"
+        # skor ikut norma SEGAK (jantina & umur pelajar)
+        student = conn.execute(
+            "SELECT gender, age FROM student WHERE student_id = ?",
+            (student_id,)
+        ).fetchone()
+        if student is None:
+            # pelajar sudah dipadam / id dalam form diubah
+            return "Student not found", 400
+        scores, total, level = norms.score_one(
+            norms.get_index(conn), student["gender"], student["age"],
+            step_test, push_up, sit_up, sit_reach
+        )
 
         # =========================
         # INSERT DATABASE
         # =========================
-        conn.execute("""
-            INSERT INTO segak_record
-            (student_id, test_date, step_test, push_up, sit_up, sit_reach, fitness_level)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            student_id,
-            test_date,
-            step_test,
-            push_up,
-            sit_up,
-            sit_reach,
-            fitness_level
-        ))
-
-        conn.commit()
-        conn.close()
+        test_id, = fitness.insert_tests(conn, [(
+            None, student_id, test_date, level, total,
+            fitness.details(
+                norms.get_index(conn).activity_ids,
+                (step_test, push_up, sit_up, sit_reach), scores
+            )
+        )], teacher_id=session.get("user_id"))
+
+        # sama seperti Add BMI: hantaran semula form tidak mencipta ujian kedua
+        client_id = request.form.get("client_id")
+        if client_id and not capture.claim(
+            conn, client_id, "segak", test_id, student_id, session.get("user_id")
+        ):
+            conn.rollback()
+        else:
+            conn.commit()
 
         return redirect(url_for("segak_records"))
 
-    conn.close()
-    return render_template("add_segak.html", students=students)
+    return render_template("add_segak.html", classes=classes, client_id=uuid.uuid4().hex)
 
 
 # =========================
@@ -551,54 +883,61 @@ def segak_records():
         return redirect(url_for("login"))
 
     selected_class = request.args.get("class")
+    per_page, after, start = page_args(request.args, key_size=5)
 
     conn = get_db_connection()
 
-    classes = conn.execute(
-        "SELECT class_name FROM class ORDER BY class_name"
-    ).fetchall()
+    classes = cache.class_list(conn)
 
+    # keyset: (class_name, name, student_id, test_date DESC, segak_id)
+    where = []
+    params = {"limit": per_page + 1}
     if selected_class:
-        records = conn.execute("""
-            SELECT 
-                r.segak_id,
-                s.name,
-                c.class_name AS class,
-                r.step_test,
-                r.push_up,
-                r.sit_up,
-                r.sit_reach,
-                r.fitness_level,
-                r.test_date
-            FROM segak_record r
-            JOIN student s ON r.student_id = s.student_id
-            JOIN class c ON s.class_id = c.class_id
-            WHERE c.class_name = ?
-            ORDER BY s.name, r.test_date DESC
-        """, (selected_class,)).fetchall()
-    else:
-        records = conn.execute("""
-            SELECT 
-                r.segak_id,
-                s.name,
-                c.class_name AS class,
-                r.step_test,
-                r.push_up,
-                r.sit_up,
-                r.sit_reach,
-                r.fitness_level,
-                r.test_date
-            FROM segak_record r
-            JOIN student s ON r.student_id = s.student_id
-            JOIN class c ON s.class_id = c.class_id
-            ORDER BY c.class_name, s.name, r.test_date DESC
-        """).fetchall()
+        where.append("c.class_name = :class")
+        params["class"] = selected_class
+    if after:
+        where.append("""
+            c.class_name >= :after_class
+            AND (c.class_name, s.name, s.student_id) >= (:after_class, :after_name, :after_student)
+            AND ((c.class_name, s.name, s.student_id) > (:after_class, :after_name, :after_student)
+                 OR r.test_date < :after_date
+                 OR (r.test_date = :after_date AND r.segak_id > :after_id))
+        """)
+        params.update(zip(
+            ("after_class", "after_name", "after_student", "after_date", "after_id"),
+            after
+        ))
 
-    conn.close()
+    rows = conn.execute(f"""
+        SELECT 
+            r.segak_id,
+            s.student_id,
+            s.name,
+            c.class_name AS class,
+            r.step_test,
+            r.push_up,
+            r.sit_up,
+            r.sit_reach,
+            r.fitness_level,
+            r.test_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN segak_record r ON r.student_id = s.student_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY c.class_name, s.name, s.student_id, r.test_date DESC, r.segak_id
+        LIMIT :limit
+    """, params).fetchall()
+
+    page = Page(
+        rows, per_page,
+        key=lambda r: (r["class"], r["name"], r["student_id"], r["test_date"], r["segak_id"]),
+        start=start
+    )
 
     return render_template(
         "segak_records.html",
-        records=records,
+        records=page,
+        page=page,
         classes=classes,
         selected_class=selected_class
     )
@@ -616,6 +955,9 @@ def edit_segak(segak_id):
         (segak_id,)
     ).fetchone()
 
+    if record is None:
+        return "SEGAK record not found", 404
+
     if request.method == "POST":
         step = int(request.form["step_test"])
         push = int(request.form["push_up"])
@@ -623,50 +965,365 @@ def edit_segak(segak_id):
         reach = float(request.form["sit_reach"])
         test_date = request.form["test_date"]
 
-        # =========================
-        # SEGAK FITNESS LOGIC (SAMA DENGAN ADD)
-        # =========================
-        if push < 10 or sit < 10 or reach < 2:
-            fitness_level = "Poor"
-        elif push < 20 or sit < 20:
-            fitness_level = "Average"
-        elif push < 25 or sit < 25:
-            fitness_level = "Good"
-        else:
-            fitness_level = "Excellent"
+        student = conn.execute(
+            "SELECT gender, age FROM student WHERE student_id = ?",
+            (record["student_id"],)
+        ).fetchone()
+        scores, total, level = norms.score_one(
+            norms.get_index(conn), student["gender"], student["age"],
+            step, push, sit, reach
+        )
 
-        conn.execute(
-            """
-            UPDATE segak_record
-            SET step_test=?, push_up=?, sit_up=?, sit_reach=?,
-                fitness_level=?, test_date=?
-            WHERE segak_id=?
-            """,
-            (step, push, sit, reach, fitness_level, test_date, segak_id)
+        fitness.update_test(
+            conn, segak_id, test_date, level, total,
+            fitness.details(
+                norms.get_index(conn).activity_ids, (step, push, sit, reach), scores
+            )
         )
         conn.commit()
-        conn.close()
         return redirect(url_for("segak_records"))
 
-    conn.close()
     return render_template("edit_segak.html", record=record)
 
 
 #delete segak
-@app.route("/delete_segak/<int:segak_id>")
+@app.route("/delete_segak/<int:segak_id>", methods=["POST"])
 def delete_segak(segak_id):
     if session.get("role") != "teacher":
         return redirect(url_for("login"))
 
     conn = get_db_connection()
-    conn.execute("DELETE FROM segak_record WHERE segak_id=?", (segak_id,))
+    conn.execute("DELETE FROM segak_test WHERE test_id=?", (segak_id,))
     conn.commit()
-    conn.close()
 
     return redirect(url_for("segak_records"))
 
 
 
+# =========================
+# CLASS ENTRY (GRID)
+# =========================
+# Hari ujian: seluruh roster kelas dalam satu borang. Semua baris
+# disemak dahulu; jika ada ralat tiada apa yang disimpan. Jika tiada,
+# semuanya diklasifikasi sekali (batch) dan ditulis dalam satu transaction.
+ENTRY_FIELDS = {
+    "bmi": (("height", "Height (cm)"), ("weight", "Weight (kg)")),
+    "segak": (
+        ("step_test", "Step Test"),
+        ("push_up", "Push Up"),
+        ("sit_up", "Sit Up"),
+        ("sit_reach", "Sit & Reach (cm)"),
+    ),
+}
+
+ENTRY_DATE_FIELD = {"bmi": "record_date", "segak": "test_date"}
+ENTRY_RESULTS = {"bmi": "bmi_records", "segak": "segak_records"}
+
+
+def entry_rows(kind, roster, form):
+    # satu dict setiap pelajar yang ada nilai; baris kosong diabaikan
+    date = form.get("entry_date", "")
+    for s in roster:
+        row = {
+            field: form.get(f"{field}_{s['student_id']}", "").strip()
+            for field, _ in ENTRY_FIELDS[kind]
+        }
+        if not any(row.values()):
+            continue
+        row["student_id"] = str(s["student_id"])
+        row[ENTRY_DATE_FIELD[kind]] = date
+        yield s["student_id"], row
+
+
+@app.route("/class_entry/<kind>", methods=["GET", "POST"])
+def class_entry(kind):
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+    if kind not in ENTRY_FIELDS:
+        return "Unknown entry type", 404
+
+    conn = get_db_connection()
+    classes = cache.class_list(conn)
+    class_id = request.values.get("class_id", type=int)
+    selected = next((c for c in classes if c["class_id"] == class_id), None)
+    roster = cache.class_roster(conn, class_id) if selected else []
+    errors = {}
+
+    if request.method == "POST" and selected:
+        # lookup dari roster kelas sahaja: pelajar kelas lain ditolak
+        lookups = {"students": {s["student_id"]: (s["gender"], s["age"]) for s in roster}}
+        result = importer.ImportResult(kind)
+        chunk = list(importer.parse_rows(
+            kind, entry_rows(kind, roster, request.form), lookups, result
+        ))
+        errors = dict(result.errors)
+
+        if not chunk and not errors:
+            errors[None] = "Enter results for at least one student"
+
+        if not errors:
+            # IntegrityError di sini hanya jika pelajar dipadam serentak;
+            # baris lain tetap disimpan, jadi terus ke keputusan kelas
+            importer.insert_chunk(
+                conn, kind, chunk, result, lookups,
+                teacher_id=session.get("user_id")
+            )
+            return redirect(url_for(ENTRY_RESULTS[kind], **{"class": selected["class_name"]}))
+
+    return render_template(
+        "class_entry.html",
+        kind=kind,
+        fields=ENTRY_FIELDS[kind],
+        classes=classes,
+        selected=selected,
+        roster=roster,
+        errors=errors,
+        form=request.form
+    )
+
+
+# =========================
+# IMPORT (CSV)
+# =========================
+@app.route("/import", methods=["GET", "POST"])
+def import_data():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    kind = request.form.get("kind", "student")
+    conn = get_db_connection()
+
+    if request.method == "POST":
+        if kind not in importer.KINDS:
+            abort(400)
+        # fail disimpan dahulu; import dijalankan oleh job queue
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        path = os.path.join(IMPORT_DIR, f"{uuid.uuid4().hex}.csv")
+        request.files["file"].save(path)
+        # tidak diulang automatik: chunk yang sudah commit akan dimasukkan dua kali
+        job_id = jobs.enqueue(
+            conn, "import", {"kind": kind, "path": path}, max_attempts=1
+        )
+        return redirect(url_for("import_data", job=job_id))
+
+    job = None
+    if request.args.get("job", "").isdigit():
+        job = jobs.get(conn, int(request.args["job"]))
+        if job is None or job["kind"] != "import":
+            abort(404)
+        job = jobs.as_dict(job)
+        kind = job["payload"]["kind"]
+
+    return render_template(
+        "import_csv.html",
+        kind=kind,
+        job=job,
+        result=job["result"] if job else None,
+        columns=importer.COLUMNS
+    )
+
+
+@app.cli.command("import-csv")
+@click.argument("kind", type=click.Choice(importer.KINDS))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@school_option
+def import_csv_command(kind, path, school):
+    """Import students, BMI or SEGAK rows from a CSV file."""
+    db_path = cli_path(school)
+    conn = db.open_connection(db_path)
+    db.ensure_migrated(conn, db_path)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        result = importer.import_csv(conn, kind, f)
+    conn.close()
+
+    for line, message in result.errors:
+        print(f"line {line}: {message}")
+    print(f"{result.inserted} row(s) imported, {len(result.errors)} skipped")
+
+
+# =========================
+# EXPORT (CSV)
+# =========================
+def export_response(filename, query, columns):
+    sql, params = query(
+        class_name=request.args.get("class") or None,
+        date_from=request.args.get("from") or None,
+        date_to=request.args.get("to") or None
+    )
+    return Response(
+        export.stream_csv(current_db_path(), sql, params, columns),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@app.route("/export/bmi")
+def export_bmi():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    return export_response("bmi_records.csv", export.bmi_export_query, export.BMI_COLUMNS)
+
+
+@app.route("/export/segak")
+def export_segak():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    return export_response("segak_records.csv", export.segak_export_query, export.SEGAK_COLUMNS)
+
+
+
+# =========================
+# JSON API
+# =========================
+# Data kecil untuk borang (roster ikut kelas, carian nama). ETag ialah
+# versi cache_version, jadi browser dapat 304 tanpa query bila tiada
+# perubahan.
+def api_response(conn, scopes, loader):
+    etag = "v" + "-".join(str(v) for v in cache.versions(conn, scopes))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify([dict(row) for row in loader()])
+    response.set_etag(etag)
+    # sentiasa revalidate; data boleh berubah bila-bila masa
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@app.route("/api/classes")
+def api_classes():
+    if session.get("role") != "teacher":
+        return {"error": "login required"}, 401
+
+    conn = get_db_connection()
+    return api_response(conn, ("classes",), lambda: cache.class_list(conn))
+
+
+@app.route("/api/classes/<int:class_id>/students")
+def api_class_students(class_id):
+    if session.get("role") != "teacher":
+        return {"error": "login required"}, 401
+
+    conn = get_db_connection()
+    return api_response(
+        conn, ("roster",), lambda: cache.class_roster(conn, class_id)
+    )
+
+
+@app.route("/api/students")
+def api_student_search():
+    if session.get("role") != "teacher":
+        return {"error": "login required"}, 401
+
+    # nama dan/atau kelas, awalan dan ejaan hampir (search.py)
+    text = request.args.get("q", "").strip()
+    if not text:
+        return jsonify([])
+
+    conn = get_db_connection()
+    return api_response(
+        conn, ("roster",), lambda: search.search_students(conn, text)
+    )
+
+
+# =========================
+# RAKAMAN LUAR TALIAN (capture.py)
+# =========================
+# /capture/ simpan rekod dalam browser (IndexedDB) dan muat naik secara
+# berkumpulan ke /api/entries. Service worker (skop /capture/) simpan
+# salinan halaman, roster kelas dan fail statik, jadi halaman boleh
+# dibuka semula tanpa rangkaian.
+@app.route("/capture/")
+def capture_page():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    conn = get_db_connection()
+    return render_template(
+        "capture.html",
+        classes=cache.class_list(conn),
+        fields={kind: ENTRY_FIELDS[kind] for kind in capture.KINDS},
+        date_fields=ENTRY_DATE_FIELD,
+        max_entries=capture.MAX_ENTRIES
+    )
+
+
+@app.route("/capture/sw.js")
+def capture_worker():
+    # bukan URL statik bertanda: browser mesti sentiasa semak versi baru
+    response = send_from_directory(app.static_folder, "capture_sw.js", max_age=0)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route("/api/entries", methods=["POST"])
+def api_entries():
+    if session.get("role") != "teacher":
+        return {"error": "login required"}, 401
+    if (request.content_length or 0) > capture.MAX_BODY_BYTES:
+        return {"error": f"body larger than {capture.MAX_BODY_BYTES} bytes"}, 413
+
+    try:
+        entries = capture.read_body(request.get_data(), request.content_encoding)
+    except capture.BatchRejected as e:
+        return {"error": str(e)}, e.status
+
+    conn = get_db_connection()
+    return jsonify({"results": capture.apply_batch(conn, entries, session.get("user_id"))})
+
+
+# =========================
+# CHANGE FEED (SYNC HILIRAN)
+# =========================
+# GET /changes?since=<seq>[&limit=n]: satu baris JSON bagi setiap
+# perubahan selepas seq. Header X-Change-Seq = seq terakhir dalam
+# response; guna sebagai since untuk panggilan seterusnya.
+def sync_allowed():
+    if session.get("role") == "teacher":
+        return True
+    # "Authorization: Bearer <SEGAK_SYNC_TOKEN>"
+    if SYNC_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(supplied, SYNC_TOKEN)
+    return False
+
+
+def sync_path():
+    # guru: shard sendiri; token: ?school=<kod> (wajib dengan shard)
+    if session.get("role") == "teacher":
+        return current_db_path()
+    return router.path(request.args.get("school"))
+
+
+@app.route("/changes")
+def change_feed():
+    if not sync_allowed():
+        abort(403)
+    try:
+        path = sync_path()
+    except shards.UnknownSchool:
+        return {"error": "unknown school"}, 404
+
+    since = request.args.get("since", 0, type=int)
+    limit = request.args.get("limit", None, type=int)
+    if since < 0 or (limit is not None and limit < 1):
+        return {"error": "since must be >= 0 and limit >= 1"}, 400
+
+    try:
+        since, head = changes.feed_range(db.get_db(path, DB_FACTORY), since, limit)
+    except changes.ChangesPruned as e:
+        # log sudah dibuang: sistem hiliran perlu salinan penuh semula
+        return {"error": "changes before this seq were pruned", "oldest": e.args[0]}, 410
+
+    return Response(
+        changes.stream_changes(path, since, head),
+        mimetype="application/x-ndjson",
+        headers={"X-Change-Seq": str(head), "Cache-Control": "no-store"}
+    )
+
+
 # =========================
 # RESULT (teacher)
 # =========================
@@ -681,49 +1338,33 @@ def results():
     conn = get_db_connection()
 
     # semua class
-    classes = conn.execute(
-        "SELECT class_name FROM class ORDER BY class_name"
-    ).fetchall()
+    classes = cache.class_list(conn)
 
     students = []
     student_info = None
     bmi_results = []
     segak_results = []
+    progress = []
+    averages = None
+    student_progress = None
 
-    # bila class dipilih → load student
+    # bila class dipilih → load student + progress kelas
     if selected_class:
-        students = conn.execute("""
-            SELECT s.student_id, s.name
-            FROM student s
-            JOIN class c ON s.class_id = c.class_id
-            WHERE c.class_name = ?
-            ORDER BY s.name
-        """, (selected_class,)).fetchall()
+        class_ids = {c["class_name"]: c["class_id"] for c in classes}
+        if selected_class in class_ids:
+            students = cache.class_roster(conn, class_ids[selected_class])
+            progress = analytics.class_progress(conn, class_ids[selected_class])
+            averages = analytics.class_averages(progress)
 
     # bila student dipilih → load result
-    if selected_student:
-        student_info = conn.execute("""
-            SELECT s.name, c.class_name AS class
-            FROM student s
-            JOIN class c ON s.class_id = c.class_id
-            WHERE s.student_id = ?
-        """, (selected_student,)).fetchone()
-
-        bmi_results = conn.execute("""
-            SELECT record_date, height, weight, bmi_value, bmi_status
-            FROM bmi_record
-            WHERE student_id = ?
-            ORDER BY record_date DESC
-        """, (selected_student,)).fetchall()
-
-        segak_results = conn.execute("""
-            SELECT test_date, step_test, push_up, sit_up, sit_reach, fitness_level
-            FROM segak_record
-            WHERE student_id = ?
-            ORDER BY test_date DESC
-        """, (selected_student,)).fetchall()
-
-    conn.close()
+    if selected_student and selected_student.isdigit():
+        bundle = cache.student_results(conn, selected_student)
+        student_info = bundle["student"]
+        bmi_results = bundle["bmi"]
+        segak_results = bundle["segak"]
+        student_progress = next(
+            (p for p in progress if p["student_id"] == int(selected_student)), None
+        ) or analytics.student_progress(conn, selected_student)
 
     return render_template(
         "result.html",
@@ -733,8 +1374,121 @@ def results():
         selected_student=selected_student,
         student_info=student_info,
         bmi_results=bmi_results,
-        segak_results=segak_results
+        segak_results=segak_results,
+        progress=progress,
+        averages=averages,
+        student_progress=student_progress
     )
+
+
+# =========================
+# DISTRICT REPORT (semua shard)
+# =========================
+@app.route("/district")
+def district_report():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    # jadual ringkasan setiap sekolah dibaca serentak, dijumlah di sini
+    found = shards.fan_out(router, shards.school_summary, DB_FACTORY)
+    terms = shards.district_terms(found)
+    term = request.args.get("term")
+    if term not in terms:
+        term = terms[0] if terms else None
+    rows, total = shards.district_rows(found, term)
+
+    return render_template(
+        "district.html",
+        rows=rows,
+        total=total,
+        terms=terms,
+        term=term,
+        bmi_labels=summary.BMI_LABELS,
+        fitness_labels=summary.FITNESS_LABELS
+    )
+
+
+# =========================
+# REPORT CARDS (teacher)
+# =========================
+@app.route("/reports", methods=["GET", "POST"])
+def class_reports():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    conn = get_db_connection()
+    classes = cache.class_list(conn)
+    years = sorted({reports.year_of(c["class_name"]) for c in classes})
+    error = None
+
+    if request.method == "POST":
+        fmt = request.form.get("format", "html")
+        scope = request.form.get("scope", "")
+        # scope: "class:<id>" atau "year:<tingkatan>"
+        kind, _, value = scope.partition(":")
+        if kind == "class" and value.isdigit():
+            selected = reports.scope_classes(conn, class_id=int(value))
+            title = selected[0]["class_name"] if selected else ""
+        else:
+            selected = reports.scope_classes(conn, year=value)
+            title = f"Year {value}"
+
+        if fmt not in reports.FORMATS or not selected:
+            error = "Choose a class or year and a format"
+        else:
+            key = reports.report_key(conn, selected, fmt)
+            if reports.status(report_dir(session.get("school")), key, None) is None:
+                jobs.enqueue(conn, "report", {
+                    "school": session.get("school"),
+                    "key": key,
+                    "class_ids": [c["class_id"] for c in selected],
+                    "title": f"Report Cards - {title}",
+                }, dedupe_key=reports.job_key(key))
+            return redirect(url_for("report_status", key=key, title=title))
+
+    return render_template(
+        "reports.html", classes=classes, years=years, error=error, status=None
+    )
+
+
+@app.route("/reports/<key>")
+def report_status(key):
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+    if not reports.KEY_PATTERN.match(key):
+        abort(404)
+
+    conn = get_db_connection()
+    classes = cache.class_list(conn)
+    return render_template(
+        "reports.html",
+        classes=classes,
+        years=sorted({reports.year_of(c["class_name"]) for c in classes}),
+        error=None,
+        key=key,
+        title=request.args.get("title", ""),
+        status=reports.status(
+            report_dir(session.get("school")), key, jobs.latest(conn, reports.job_key(key))
+        ) or ("missing", None, None)
+    )
+
+
+@app.route("/reports/<key>/download")
+def report_download(key):
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+    directory = report_dir(session.get("school"))
+    if not reports.KEY_PATTERN.match(key) or reports.status(directory, key, None) != ("done", None, None):
+        abort(404)
+
+    title = reports.safe_name(request.args.get("title") or "report_cards")
+    return send_file(
+        reports.output_path(directory, key),
+        as_attachment=key.endswith(".zip"),
+        download_name=f"{title}.{key.split('.')[1]}"
+    )
+
+
 #stdent print
 @app.route("/student/print")
 def student_print():
@@ -743,36 +1497,206 @@ def student_print():
 
     conn = get_db_connection()
 
-    student = conn.execute("""
-    SELECT student.*, class.class_name AS class
-    FROM student
-    LEFT JOIN class ON student.class_id = class.class_id
-    WHERE student.student_id = ?
-""", (session.get("user_id"),)).fetchone()
+    # rekod terkini dari student_latest: satu query ikut primary key
+    report = reports.student_report(conn, session.get("user_id"))
+    if report is None:
+        return redirect(url_for("login"))
 
+    return render_template("student_print.html", **report)
 
-    bmi = conn.execute(
-        "SELECT * FROM bmi_record WHERE student_id = ? ORDER BY record_date DESC LIMIT 1",
-        (session.get("user_id"),)
-    ).fetchone()
 
-    segak = conn.execute(
-        "SELECT * FROM segak_record WHERE student_id = ? ORDER BY test_date DESC LIMIT 1",
-        (session.get("user_id"),)
-    ).fetchone()
+# =========================
+# BACKGROUND JOBS
+# =========================
+# Handler dijalankan oleh worker thread (jobs.py) dengan connection
+# sendiri; nilai pulangan disimpan sebagai hasil job (JSON).
+@jobs.handler("rescore")
+def rescore_job(job, conn):
+    job.progress(0, 2)
+    bmi_changed = reclassify_bmi(conn)
+    conn.commit()
+    job.progress(1, 2)
+    segak_changed = fitness.rescore_all(conn)
+    conn.commit()
+    job.progress(2, 2)
+    return {"bmi": bmi_changed, "segak": segak_changed}
+
+
+@jobs.handler("import")
+def import_job(job, conn):
+    path = job.payload["path"]
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            total = max(sum(1 for _ in f) - 1, 0)
+            f.seek(0)
+            job.progress(0, total)
+            # line_num termasuk header
+            result = importer.import_csv(
+                conn, job.payload["kind"], f,
+                progress=lambda line: job.progress(line - 1)
+            )
+    finally:
+        # import tidak diulang, jadi fail tidak diperlukan lagi
+        os.remove(path)
+    job.progress(total)
+    return {
+        "inserted": result.inserted,
+        "skipped": len(result.errors),
+        "errors": result.errors[:jobs.MAX_RESULT_ERRORS],
+    }
+
+
+@jobs.handler("report")
+def report_job(job, conn):
+    p = job.payload
+    cards = reports.build(
+        conn, report_dir(p.get("school")), app.template_folder, p["key"], p["class_ids"], p["title"],
+        job.progress
+    )
+    return {"cards": cards}
 
-    conn.close()
 
+JOB_LABELS = {
+    "rescore": "Recalculate BMI status and fitness levels",
+    "import": "CSV import",
+    "report": "Report cards",
+}
+
+
+@app.route("/jobs")
+def job_list():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    rows = [jobs.as_dict(r) for r in jobs.recent(get_db_connection())]
     return render_template(
-        "student_print.html",
-        student=student,
-        bmi=bmi,
-        segak=segak
+        "jobs.html",
+        jobs=rows,
+        labels=JOB_LABELS,
+        active=any(j["status"] in ("queued", "running") for j in rows)
+    )
+
+
+@app.route("/jobs/<int:job_id>")
+def job_status(job_id):
+    if session.get("role") != "teacher":
+        return jsonify(error="login required"), 401
+
+    row = jobs.get(get_db_connection(), job_id)
+    if row is None:
+        abort(404)
+    return jsonify(jobs.as_dict(row))
+
+
+@app.route("/jobs/rescore", methods=["POST"])
+def job_rescore():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    jobs.enqueue(get_db_connection(), "rescore", {}, dedupe_key="rescore")
+    return redirect(url_for("job_list"))
+
+
+@app.route("/jobs/<int:job_id>/retry", methods=["POST"])
+def job_retry(job_id):
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    conn = get_db_connection()
+    job = jobs.get(conn, job_id)
+    # import: fail CSV dibuang selepas cubaan pertama, dan chunk yang sudah
+    # commit akan dimasukkan dua kali; guru muat naik semula
+    if job is None:
+        abort(404)
+    if job["kind"] == "import":
+        abort(400)
+    jobs.retry(conn, job_id)
+    return redirect(url_for("job_list"))
+
+
+# =========================
+# CACHE STATS
+# =========================
+@app.route("/cache_stats")
+def cache_stats():
+    if session.get("role") != "teacher":
+        return redirect(url_for("login"))
+
+    # kiraan untuk process (worker) ini sahaja
+    return cache.stats()
+
+
+# =========================
+# METRICS
+# =========================
+def metrics_allowed():
+    if session.get("role") == "teacher":
+        return True
+    # Prometheus: "Authorization: Bearer <SEGAK_METRICS_TOKEN>"
+    if METRICS_TOKEN:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(supplied, METRICS_TOKEN)
+    # tanpa token, scrape dari mesin yang sama sahaja
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not METRICS_ENABLED:
+        abort(404)
+    if not metrics_allowed():
+        abort(403)
+
+    stats = cache.stats()
+    # semua shard (bukan shard session sahaja)
+    queued = sum(count for _, count in shards.fan_out(router, lambda conn: conn.execute(
+        "SELECT COUNT(*) FROM job WHERE status = 'queued'"
+    ).fetchone()[0], DB_FACTORY))
+    extra = [
+        ("segak_cache_entries", "gauge", "Entries in the read cache.", stats["entries"]),
+        ("segak_cache_hits_total", "counter", "Read cache hits.", stats["hits"]),
+        ("segak_cache_misses_total", "counter", "Read cache misses.", stats["misses"]),
+        ("segak_cache_evictions_total", "counter", "Read cache evictions.", stats["evictions"]),
+        ("segak_jobs_queued", "gauge", "Background jobs waiting to run.", queued),
+    ]
+    return Response(metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/metrics/slow_queries")
+def slow_queries():
+    if not METRICS_ENABLED:
+        abort(404)
+    if not metrics_allowed():
+        abort(403)
+
+    # terbaru dahulu
+    return jsonify(
+        threshold_ms=SLOW_QUERY_MS,
+        queries=list(reversed(metrics.recent_slow))
     )
 
 
 # =========================
 # RUN
 # =========================
+def create_app():
+    # titik masuk WSGI (wsgi.py, gunicorn.conf.py); tetapan dari environment
+    if app.secret_key == DEV_SECRET_KEY and not env_setting("SEGAK_DEBUG", False, env_flag):
+        raise RuntimeError("SEGAK_SECRET_KEY must be set when serving outside debug mode")
+
+    app.config.update(
+        SESSION_COOKIE_HTTPONLY=True,
+        SESSION_COOKIE_SAMESITE="Lax",
+        SESSION_COOKIE_SECURE=env_setting("SEGAK_SECURE_COOKIES", False, env_flag),
+    )
+    return app
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    # server dev sahaja; production guna gunicorn (lihat gunicorn.conf.py)
+    app.run(
+        host=env_setting("SEGAK_HOST", "127.0.0.1"),
+        port=env_setting("SEGAK_PORT", 5000, int),
+        debug=env_setting("SEGAK_DEBUG", False, env_flag),
+        threaded=True
+    )
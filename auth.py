@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash
+
+# =========================
+# LOOKUP PENGGUNA (SATU QUERY)
+# =========================
+# Guru dan akaun pelajar dicari sekali gus melalui index UNIQUE email.
+# Guru didahulukan (sama seperti login() asal): jika kata laluan guru
+# salah, akaun pelajar dengan email sama masih disemak.
+PRINCIPAL_SQL = """
+    SELECT 'teacher' AS role, t.teacher_id AS user_id, t.name,
+           NULL AS class_id, NULL AS class_name, t.password
+    FROM teacher t
+    WHERE t.email = :email
+    UNION ALL
+    SELECT 'student', su.student_id, s.name, s.class_id, c.class_name, su.password
+    FROM student_user su
+    JOIN student s ON s.student_id = su.student_id
+    LEFT JOIN class c ON c.class_id = s.class_id
+    WHERE su.email = :email
+"""
+
+
+def find_accounts(conn, email):
+    # paling banyak dua baris: guru dahulu, kemudian pelajar
+    rows = conn.execute(PRINCIPAL_SQL, {"email": email}).fetchall()
+    return sorted(rows, key=lambda r: r["role"] != "teacher")
+
+
+# =========================
+# HASH DALAM THREAD POOL TERHAD
+# =========================
+# scrypt (werkzeug) guna ~32 MB dan puluhan ms CPU setiap semakan, dan
+# melepaskan GIL. 40 pelajar login serentak = 40 semakan selari yang
+# berebut CPU dan memori; pool ini hadkan kepada HASH_THREADS serentak,
+# selebihnya beratur. Jika baris gilir terlalu panjang, login ditolak
+# segera (503) daripada menunggu sehingga timeout. Pool ada dalam SETIAP
+# worker process: had seluruh server = worker x HASH_THREADS.
+HASH_THREADS = max(1, os.cpu_count() or 1)
+HASH_QUEUE_LIMIT = 64
+HASH_TIMEOUT_SECONDS = 15
+
+
+class LoginBusy(Exception):
+    pass
+
+
+class HashPool:
+    def __init__(self, threads=HASH_THREADS, queue_limit=HASH_QUEUE_LIMIT):
+        self.threads = threads
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="password-hash")
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    def check(self, password_hash, password):
+        with self.lock:
+            if self.pending >= self.queue_limit:
+                raise LoginBusy()
+            self.pending += 1
+        try:
+            future = self.executor.submit(check_password_hash, password_hash, password)
+            try:
+                return future.result(timeout=HASH_TIMEOUT_SECONDS)
+            except FutureTimeout:
+                future.cancel()
+                raise LoginBusy()
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def threads_per_worker(workers):
+    # CPU dibahagi antara worker gunicorn, sekurang-kurangnya satu
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def configure(threads):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.executor.shutdown(wait=False)
+        _pool = HashPool(threads)
+
+
+def hash_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashPool()
+    return _pool
+
+
+# =========================
+# RATE LIMIT (PER IP / PER EMAIL)
+# =========================
+# Hanya login GAGAL dikira, jadi satu kelas di belakang satu IP sekolah
+# (NAT) tidak tersekat. Semakan had dibuat SEBELUM hash, jadi cubaan
+# brute-force yang disekat tidak guna CPU. Kiraan dalam memori process
+# (seperti cache.py): dengan N worker gunicorn, had sebenar <= N x had.
+WINDOW_SECONDS = 300
+MAX_FAILURES_PER_EMAIL = 5
+MAX_FAILURES_PER_IP = 30
+MAX_TRACKED_KEYS = 10000
+
+
+class FailureLimiter:
+    def __init__(self, window=WINDOW_SECONDS, max_keys=MAX_TRACKED_KEYS):
+        self.window = window
+        self.max_keys = max_keys
+        self.failures = OrderedDict()
+        self.lock = threading.Lock()
+        self.blocked = 0
+
+    def _recent(self, key, now):
+        times = self.failures.get(key)
+        if times is None:
+            return None
+        while times and times[0] <= now - self.window:
+            times.popleft()
+        if not times:
+            del self.failures[key]
+            return None
+        return times
+
+    def retry_after(self, limits):
+        # limits: [(kunci, had)]; pulang saat hingga boleh cuba lagi, atau 0
+        now = time.monotonic()
+        with self.lock:
+            wait = 0
+            for key, limit in limits:
+                times = self._recent(key, now)
+                if times is not None and len(times) >= limit:
+                    wait = max(wait, times[0] + self.window - now)
+            if wait:
+                self.blocked += 1
+            return wait
+
+    def fail(self, keys):
+        now = time.monotonic()
+        with self.lock:
+            for key in keys:
+                times = self.failures.get(key)
+                if times is None:
+                    times = self.failures[key] = deque()
+                times.append(now)
+                self.failures.move_to_end(key)
+            while len(self.failures) > self.max_keys:
+                self.failures.popitem(last=False)
+
+    def clear(self, key):
+        with self.lock:
+            self.failures.pop(key, None)
+
+
+limiter = FailureLimiter()
+
+
+def limit_keys(ip, email):
+    return [(("ip", ip), MAX_FAILURES_PER_IP), (("email", email.lower()), MAX_FAILURES_PER_EMAIL)]
+
+
+# =========================
+# LOGIN
+# =========================
+class LoginThrottled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def throttle(ip, email):
+    # dipanggil sebelum buka connection DB: request yang disekat sangat murah
+    wait = limiter.retry_after(limit_keys(ip, email))
+    if wait:
+        raise LoginThrottled(wait)
+
+
+def authenticate(accounts, email, password, ip):
+    # accounts: [(sekolah, akaun)] dari shards.find_accounts, guru dahulu
+    # dalam setiap sekolah. Pulang satu (sekolah, akaun) bagi setiap
+    # sekolah yang sepadan, [] jika gagal; boleh raise LoginBusy
+    keys = [key for key, _ in limit_keys(ip, email)]
+    pool = hash_pool()
+    # akaun guru yang sama dalam beberapa shard: hash yang sama disemak sekali
+    checked = {}
+    matches = []
+    matched_schools = set()
+    for school, account in accounts:
+        if school in matched_schools:
+            # guru sudah sepadan di sekolah ini: akaun pelajar tidak disemak
+            continue
+        password_hash = account["password"]
+        if password_hash not in checked:
+            checked[password_hash] = pool.check(password_hash, password)
+        if checked[password_hash]:
+            matches.append((school, account))
+            matched_schools.add(school)
+
+    if matches:
+        # login berjaya: kiraan gagal untuk email ini dibuang
+        limiter.clear(keys[1])
+    else:
+        limiter.fail(keys)
+    return matches
+
+
+def login_choices(matches):
+    # lebih dari satu akaun sepadan (guru di beberapa sekolah): disimpan
+    # dalam session tanpa hash, pengguna pilih sekolah selepas itu
+    return [
+        {"school": school, **{k: account[k] for k in account.keys() if k != "password"}}
+        for school, account in matches
+    ]
+
+
+def remember(session, account, school=None):
+    # id sahaja dalam cookie session; nama & kelas dibaca semasa render
+    # (cache.principal), jadi tidak basi selepas edit_student;
+    # school = shard akaun (None tanpa shard)
+    session.clear()
+    if school is not None:
+        session["school"] = school
+    session["user_id"] = account["user_id"]
+    session["role"] = account["role"]
@@ -0,0 +1,205 @@
+import os
+import re
+import sqlite3
+import time
+
+import db
+import migrations
+
+# =========================
+# SNAPSHOT DALAM TALIAN (BACKUP API)
+# =========================
+# Salin fail DB semasa app berjalan boleh menghasilkan salinan separuh
+# (halaman dari dua transaksi berbeza). Snapshot di sini guna backup API
+# SQLite, PAGES_PER_STEP halaman setiap langkah dengan rehat antara
+# langkah supaya penulis dapat masa CPU dan I/O.
+#
+# Satu transaksi baca dibuka pada connection sumber sepanjang backup.
+# Dalam mod WAL, penulis tidak menunggu pembaca, jadi tulisan berjalan
+# seperti biasa. Snapshot pula kekal pada satu titik masa: tanpa
+# transaksi itu, setiap commit dari connection lain memaksa backup
+# bermula semula dan backup tidak pernah selesai semasa sekolah sibuk.
+PAGES_PER_STEP = 1024
+STEP_SLEEP_SECONDS = 0.001
+# retensi: N snapshot terbaru + snapshot terakhir setiap hari untuk D hari
+KEEP_LAST = 24
+KEEP_DAILY = 30
+# baris ralat integrity_check yang dilaporkan
+MAX_ERRORS = 20
+
+SUFFIX = ".db"
+PARTIAL = ".partial"
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+SNAPSHOT_PATTERN = re.compile(r"^(?P<name>.+)-(?P<stamp>\d{8}-\d{6})(?:-(?P<n>\d+))?\.db$")
+
+
+class BackupCorrupt(Exception):
+    def __init__(self, path, errors):
+        super().__init__(f"{path}: {errors[0]}")
+        self.path = path
+        self.errors = errors
+
+
+def snapshot_name(path):
+    # segak.db -> "segak"; shard SMK001.db -> "SMK001"
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def integrity_errors(path, max_errors=MAX_ERRORS):
+    # [] jika fail sihat; fail yang bukan DB / skema rosak juga dilaporkan
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [r[0] for r in conn.execute(f"PRAGMA integrity_check({int(max_errors)})")]
+    except sqlite3.DatabaseError as e:
+        rows = [str(e)]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+
+def copy_pages(source, target, pages=PAGES_PER_STEP, sleep=STEP_SLEEP_SECONDS, progress=None):
+    # source: connection dengan transaksi baca terbuka (titik masa snapshot)
+    def step(status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+
+    source.backup(target, pages=pages, progress=step, sleep=sleep)
+
+
+def snapshot(path, backup_dir, pages=PAGES_PER_STEP, sleep=STEP_SLEEP_SECONDS,
+             verify=True, progress=None):
+    # pulang path snapshot baru; fail .partial tidak pernah dianggap snapshot
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = time.strftime(STAMP_FORMAT)
+    target_path = os.path.join(backup_dir, f"{snapshot_name(path)}-{stamp}{SUFFIX}")
+    n = 1
+    while os.path.exists(target_path):
+        target_path = os.path.join(backup_dir, f"{snapshot_name(path)}-{stamp}-{n}{SUFFIX}")
+        n += 1
+    partial = target_path + PARTIAL
+
+    source = db.open_connection(path)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        copy_pages(source, target, pages, sleep, progress)
+        source.rollback()
+        # salinan dalam mod rollback journal: satu fail sahaja, boleh dibuka read-only
+        target.execute("PRAGMA journal_mode = DELETE")
+        target.close()
+        if verify:
+            errors = integrity_errors(partial)
+            if errors:
+                raise BackupCorrupt(partial, errors)
+        os.replace(partial, target_path)
+    except BaseException:
+        target.close()
+        for leftover in (partial, partial + "-journal", partial + "-wal", partial + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    finally:
+        source.close()
+    return target_path
+
+
+# =========================
+# SENARAI & RETENSI
+# =========================
+def snapshots(backup_dir, name=None):
+    # [(masa, path)] terbaru dahulu; name = hanya snapshot DB ini.
+    # Dua snapshot dalam saat yang sama: "-1", "-2" ... lebih baru
+    found = []
+    if not os.path.isdir(backup_dir):
+        return found
+    for filename in os.listdir(backup_dir):
+        match = SNAPSHOT_PATTERN.match(filename)
+        if match is None or (name is not None and match.group("name") != name):
+            continue
+        taken = time.mktime(time.strptime(match.group("stamp"), STAMP_FORMAT))
+        found.append((taken, int(match.group("n") or 0), os.path.join(backup_dir, filename)))
+    return [(taken, path) for taken, _, path in sorted(found, reverse=True)]
+
+
+def prune(backup_dir, name, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY):
+    # pulang senarai path yang dibuang
+    found = snapshots(backup_dir, name)
+    keep = {path for _, path in found[:keep_last]}
+    days = []
+    for taken, path in found:
+        day = time.strftime("%Y-%m-%d", time.localtime(taken))
+        if day not in days:
+            days.append(day)
+            if len(days) <= keep_daily:
+                keep.add(path)
+
+    removed = []
+    for _, path in found:
+        if path not in keep:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+# =========================
+# RESTORE & SEMAK
+# =========================
+# Snapshot disemak (integrity_check) dahulu, kemudian disalin KE DALAM
+# fail DB yang sedang diguna melalui backup API: SQLite ambil kunci tulis
+# dan gantikan kandungan dalam satu transaksi, jadi connection lain tidak
+# pernah nampak fail separuh ditulis. Selepas itu:
+# - migration dijalankan (snapshot lama mungkin skema lama);
+# - versi cache dinaikkan melepasi versi sebelum restore, supaya cache
+#   process app tidak pulangkan data selepas snapshot;
+# - change_log dikosongkan dan seq diteruskan, jadi /changes pulang 410
+#   dan sistem hiliran ambil salinan penuh semula.
+def _cache_versions(conn):
+    return dict(conn.execute("SELECT name, version FROM cache_version"))
+
+
+def restore(snapshot_path, path, backup_dir=None, progress=None):
+    # backup_dir: simpan snapshot keadaan semasa dahulu (boleh undur)
+    errors = integrity_errors(snapshot_path)
+    if errors:
+        raise BackupCorrupt(snapshot_path, errors)
+
+    # salinan keselamatan juga disemak: itu satu-satunya jalan untuk undur
+    safety = snapshot(path, backup_dir) if backup_dir else None
+
+    conn = db.open_connection(path)
+    try:
+        migrations.migrate(conn)
+        before = _cache_versions(conn)
+        head = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'change_log'"
+        ).fetchone()[0]
+
+        source = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+        try:
+            copy_pages(source, conn, pages=-1, sleep=0, progress=progress)
+        finally:
+            source.close()
+
+        migrations.migrate(conn)
+        offset = max(before.values(), default=0) + 1
+        conn.execute("UPDATE cache_version SET version = version + ?", (offset,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO cache_version (name, version) VALUES (?, ?)",
+            ((name, offset) for name in set(before) | {"classes", "roster"})
+        )
+        conn.execute("DELETE FROM change_log")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'change_log'")
+        conn.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)", (head + 1,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    # connection terbiar dalam pool process ini dibuka semula
+    db.close_pools(path)
+    errors = integrity_errors(path)
+    if errors:
+        raise BackupCorrupt(path, errors)
+    return safety
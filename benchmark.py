@@ -0,0 +1,2525 @@
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+import db
+from pagination import encode_cursor
+
+try:
+    import resource
+except ImportError:
+    # Windows: tiada ru_maxrss
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.path.join(BASE_DIR, "segak.db")
+
+
+# =========================
+# HELPERS
+# =========================
+def copy_database(src=DATABASE):
+    # benchmark sentiasa guna salinan, segak.db asal tak disentuh
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    shutil.copyfile(src, path)
+    return workdir, path
+
+
+def report(title, rows):
+    print(f"\n== {title} ==")
+    for label, value in rows:
+        print(f"  {label:<28} {value}")
+
+
+# =========================
+# LOAD: CONNECT-PER-CALL VS PER-SESSION WAL
+# =========================
+READ_SQL = """
+    SELECT b.bmi_id, s.name, c.class_name, b.bmi_value, b.record_date
+    FROM bmi_record b
+    JOIN student s ON b.student_id = s.student_id
+    JOIN class c ON s.class_id = c.class_id
+    ORDER BY c.class_name, s.name, b.record_date DESC
+"""
+
+WRITE_SQL = """
+    INSERT INTO bmi_record
+    (student_id, height, weight, bmi_value, bmi_status, record_date)
+    VALUES (1, 1.6, 55, 21.48, 'Normal', '2026-01-01')
+"""
+
+
+def legacy_connect(path):
+    # sama macam get_db_connection() lama: tiada pragma, rollback journal
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def teacher_session(path, mode, ops, write_every, stats, lock):
+    reads = writes = errors = 0
+    conn = db.open_connection(path) if mode == "wal" else None
+
+    for i in range(ops):
+        # legacy buka connection baru setiap klik
+        c = conn if conn is not None else legacy_connect(path)
+        try:
+            if i % write_every == 0:
+                c.execute(WRITE_SQL)
+                c.commit()
+                writes += 1
+            else:
+                c.execute(READ_SQL).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        finally:
+            if conn is None:
+                c.close()
+
+    if conn is not None:
+        conn.close()
+
+    with lock:
+        stats["reads"] += reads
+        stats["writes"] += writes
+        stats["errors"] += errors
+
+
+def run_load(path, mode, sessions, ops, write_every):
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=teacher_session,
+            args=(path, mode, ops, write_every, stats, lock)
+        )
+        for _ in range(sessions)
+    ]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return stats, elapsed
+
+
+def bench_load(args):
+    for mode in ("legacy", "wal"):
+        workdir, path = copy_database()
+        try:
+            stats, elapsed = run_load(
+                path, mode, args.sessions, args.ops, args.write_every
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        report(f"load ({mode})", [
+            ("sessions x ops", f"{args.sessions} x {args.ops}"),
+            ("elapsed (s)", f"{elapsed:.3f}"),
+            ("reads/sec", f"{stats['reads'] / elapsed:.0f}"),
+            ("writes/sec", f"{stats['writes'] / elapsed:.0f}"),
+            ("locked errors", stats["errors"]),
+        ])
+
+
+# =========================
+# QUERY PLANS: SETIAP QUERY ROUTE MESTI GUNA INDEX
+# =========================
+def route_client(path):
+    # app diimport di sini supaya subcommand lain tak perlukan Flask
+    import app as segak_app
+    from flask import request
+
+    segak_app.DATABASE = path
+    # router dibina semasa import app: arahkan juga ke salinan ini
+    segak_app.router.database = path
+    segak_app.app.testing = True
+    captured = []
+
+    @segak_app.app.before_request
+    def trace_queries():
+        url = request.full_path.rstrip("?")
+        segak_app.get_db_connection().set_trace_callback(
+            lambda sql: captured.append((url, sql))
+        )
+
+    return segak_app.app.test_client(), captured
+
+
+def login_as(client, role, user_id):
+    with client.session_transaction() as sess:
+        sess["role"] = role
+        sess["user_id"] = user_id
+
+
+def sample_ids(path):
+    conn = db.open_connection(path)
+    db.ensure_migrated(conn, path)
+    row = conn.execute("""
+        SELECT s.student_id, s.name, c.class_id, c.class_name,
+               (SELECT bmi_id FROM bmi_record WHERE student_id = s.student_id LIMIT 1) AS bmi_id,
+               (SELECT segak_id FROM segak_record WHERE student_id = s.student_id LIMIT 1) AS segak_id,
+               (SELECT teacher_id FROM teacher LIMIT 1) AS teacher_id
+        FROM student s
+        JOIN class c ON s.class_id = c.class_id
+        WHERE EXISTS (SELECT 1 FROM bmi_record WHERE student_id = s.student_id)
+          AND EXISTS (SELECT 1 FROM segak_record WHERE student_id = s.student_id)
+        LIMIT 1
+    """).fetchone()
+    conn.close()
+    return row
+
+
+def teacher_urls(ids):
+    # halaman kedua: cursor bermula dari student sampel
+    student_key = (ids["class_name"], ids["name"], ids["student_id"])
+    after_student = encode_cursor(student_key, 1)
+    after_record = encode_cursor(student_key + ("9999-12-31", 0), 1)
+
+    return [
+        "/dashboard",
+        "/students",
+        f"/students?class={ids['class_name']}",
+        f"/students?after={after_student}",
+        "/add_student",
+        f"/edit_student/{ids['student_id']}",
+        "/add_bmi",
+        "/bmi_records",
+        f"/bmi_records?class={ids['class_name']}",
+        f"/bmi_records?after={after_record}",
+        f"/edit_bmi/{ids['bmi_id']}",
+        "/add_segak",
+        "/segak_records",
+        f"/segak_records?class={ids['class_name']}",
+        f"/segak_records?class={ids['class_name']}&after={after_record}",
+        f"/edit_segak/{ids['segak_id']}",
+        f"/results?class={ids['class_name']}&student={ids['student_id']}",
+        "/api/classes",
+        f"/api/classes/{ids['class_id']}/students",
+        f"/api/students?q={ids['name'][:3]}",
+        "/jobs",
+    ]
+
+
+def student_urls(ids):
+    return ["/student_dashboard", "/student/print"]
+
+
+def get_all(client, urls):
+    for url in urls:
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f"{url} returned {response.status_code}")
+
+
+# jadual rujukan kecil yang memang dibaca sepenuhnya (dropdown kelas)
+# jadual kecil: saiz ikut bilangan kelas / penggal, bukan bilangan rekod
+REFERENCE_TABLES = {
+    "class", "class_summary", "class_bmi_summary", "class_segak_summary",
+}
+
+
+def full_scans(conn, sql):
+    # SCAN tanpa index = full table scan; "USE TEMP B-TREE" = sort tanpa index
+    problems = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        detail = row[3]
+        words = detail.split()
+        if words[0] == "SCAN" and words[1] in REFERENCE_TABLES:
+            continue
+        # SELECT tanpa FROM (subquery skalar sahaja)
+        if detail == "SCAN CONSTANT ROW":
+            continue
+        # jadual _config FTS5 (beberapa baris, dibaca oleh FTS5 sendiri) dan
+        # sort selepas MATCH (hanya baris yang padan dengan carian)
+        if words[0] == "SCAN" and words[1].endswith("_config"):
+            continue
+        if "TEMP B-TREE" in detail and " MATCH " in sql:
+            continue
+        if words[0] == "SCAN" and "INDEX" not in detail:
+            problems.append(detail)
+        if "TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def bench_plans(args):
+    workdir, path = copy_database()
+    try:
+        ids = sample_ids(path)
+        client, captured = route_client(path)
+
+        login_as(client, "teacher", ids["teacher_id"])
+        get_all(client, teacher_urls(ids))
+        login_as(client, "student", ids["student_id"])
+        get_all(client, student_urls(ids))
+
+        conn = db.open_connection(path)
+        failures = 0
+        seen = set()
+        for url, sql in captured:
+            statement = sql.strip()
+            if not statement.upper().startswith("SELECT") or statement in seen:
+                continue
+            seen.add(statement)
+
+            problems = full_scans(conn, statement)
+            if problems:
+                failures += 1
+                print(f"\n[FULL SCAN] {url}")
+                print("  " + " ".join(statement.split()))
+                for detail in problems:
+                    print(f"    -> {detail}")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report("query plans", [
+        ("route queries checked", len(seen)),
+        ("queries without index", failures),
+    ])
+    if failures:
+        raise SystemExit(1)
+
+
+# =========================
+# EXPORT: ROWS/SEC DAN PEAK MEMORY
+# =========================
+def seed_bmi_rows(path, rows):
+    conn = db.open_connection(path)
+    db.ensure_migrated(conn, path)
+    students = [r[0] for r in conn.execute("SELECT student_id FROM student")]
+    conn.executemany(
+        """
+        INSERT INTO bmi_record
+        (student_id, height, weight, bmi_value, bmi_status, record_date)
+        VALUES (?, 1.55, 50, 20.81, 'Normal', ?)
+        """,
+        (
+            (students[i % len(students)], f"20{10 + i % 17}-{1 + i % 12:02d}-{1 + i % 28:02d}")
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench_export(args):
+    import resource
+    import tracemalloc
+
+    workdir, path = copy_database()
+    try:
+        seed_bmi_rows(path, args.rows)
+        client, _ = route_client(path)
+        login_as(client, "teacher", 1)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get("/export/bmi", buffered=False)
+        size = lines = 0
+        for chunk in response.response:
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+        response.close()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    rows = lines - 1
+    report("export /export/bmi", [
+        ("rows exported", rows),
+        ("csv size (MB)", f"{size / 1e6:.1f}"),
+        ("elapsed (s)", f"{elapsed:.3f}"),
+        ("rows/sec", f"{rows / elapsed:.0f}"),
+        ("peak python heap (MB)", f"{peak / 1e6:.2f}"),
+        ("peak RSS (MB)", f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}"),
+    ])
+
+
+# =========================
+# IMPORT: CSV KE DALAM DB
+# =========================
+def bench_import(args):
+    import io
+    import importer
+
+    workdir, path = copy_database()
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        students = [r[0] for r in conn.execute("SELECT student_id FROM student")]
+
+        lines = ["student_id,test_date,step_test,push_up,sit_up,sit_reach"]
+        for i in range(args.rows):
+            lines.append(
+                f"{students[i % len(students)]},2026-03-{1 + i % 28:02d},"
+                f"{90 + i % 40},{i % 35},{i % 30},{i % 40}"
+            )
+        stream = io.StringIO("\n".join(lines))
+
+        start = time.perf_counter()
+        result = importer.import_csv(conn, "segak", stream)
+        elapsed = time.perf_counter() - start
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report("import segak csv", [
+        ("rows imported", result.inserted),
+        ("row errors", len(result.errors)),
+        ("elapsed (s)", f"{elapsed:.3f}"),
+        ("rows/sec", f"{result.inserted / elapsed:.0f}"),
+    ])
+
+
+# =========================
+# RECLASSIFY / RESCORE: BATCH VS PER-ROW
+# =========================
+def insert_segak_values(conn, rows):
+    # rows: (student_id, test_date, step, push, sit, reach, fitness_level), tanpa skor
+    import fitness
+    import norms
+    from importer import next_segak_id
+
+    conn.execute("BEGIN IMMEDIATE")
+    first_id = next_segak_id(conn)
+    activity_ids = norms.get_index(conn).activity_ids
+    fitness.insert_tests(conn, (
+        (first_id + i, row[0], row[1], row[6], None,
+         fitness.details(activity_ids, row[2:6], (None,) * len(activity_ids)))
+        for i, row in enumerate(rows)
+    ))
+
+
+def seed_segak_rows(path, rows):
+    conn = db.open_connection(path)
+    db.ensure_migrated(conn, path)
+    students = [r[0] for r in conn.execute("SELECT student_id FROM student")]
+    insert_segak_values(conn, (
+        (students[i % len(students)], f"20{10 + i % 17}-0{1 + i % 9}-15",
+         90 + i % 50, i % 35, i % 30, i % 45, None)
+        for i in range(rows)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def bench_reclassify(args):
+    import fitness
+    from classification import bmi_status, calculate_bmi, reclassify_bmi
+
+    workdir, path = copy_database()
+    try:
+        seed_bmi_rows(path, args.rows)
+        seed_segak_rows(path, args.rows)
+        conn = db.open_connection(path)
+        rows = conn.execute("SELECT bmi_id, height, weight FROM bmi_record").fetchall()
+
+        # cara lama: satu rekod pada satu masa dalam Python
+        start = time.perf_counter()
+        for row in rows:
+            bmi_status(calculate_bmi(row["height"], row["weight"]))
+        per_row = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bmi_changed = reclassify_bmi(conn)
+        conn.commit()
+        bmi_batch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        segak_changed = fitness.rescore_all(conn)
+        conn.commit()
+        segak_batch = time.perf_counter() - start
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report("reclassify / rescore all records", [
+        ("records per table", args.rows),
+        ("bmi per-row classify (s)", f"{per_row:.3f}"),
+        ("bmi batch + write (s)", f"{bmi_batch:.3f}"),
+        ("segak norm rescore + write (s)", f"{segak_batch:.3f}"),
+        ("records updated", bmi_changed + segak_changed),
+    ])
+
+
+# =========================
+# DASHBOARD: COUNT(*) VS JADUAL RINGKASAN
+# =========================
+LEGACY_DASHBOARD_SQL = (
+    "SELECT COUNT(*) FROM student",
+    "SELECT COUNT(*) FROM bmi_record",
+    "SELECT COUNT(*) FROM segak_record",
+    "SELECT COUNT(*) FROM class",
+)
+
+
+def seed_school(conn, students, classes):
+    # kelas tambahan + pelajar + satu rekod BMI dan SEGAK setiap pelajar
+    existing = conn.execute("SELECT COUNT(*) FROM class").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO class (class_name) VALUES (?)",
+        ((f"Bench {i}",) for i in range(existing, classes))
+    )
+    class_ids = [r[0] for r in conn.execute("SELECT class_id FROM class")]
+    first = conn.execute("SELECT COALESCE(MAX(student_id), 0) + 1 FROM student").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO student (name, gender, age, class_id) VALUES (?, ?, ?, ?)",
+        (
+            (f"Student {i}", ("Male", "Female")[i % 2], 13 + i % 5, class_ids[i % len(class_ids)])
+            for i in range(students)
+        )
+    )
+    conn.commit()
+    return list(range(first, first + students))
+
+
+def timed_inserts(conn, student_ids):
+    start = time.perf_counter()
+    conn.executemany(
+        """
+        INSERT INTO bmi_record
+        (student_id, height, weight, bmi_value, bmi_status, record_date)
+        VALUES (?, 1.55, ?, ?, ?, ?)
+        """,
+        (
+            (sid, 40 + i % 40, 16.6 + i % 17, ("Underweight", "Normal", "Overweight", "Obese")[i % 4],
+             f"202{3 + i % 3}-{1 + i % 12:02d}-15")
+            for i, sid in enumerate(student_ids)
+        )
+    )
+    conn.commit()
+    insert_segak_values(conn, (
+        (sid, f"202{3 + i % 3}-{1 + i % 12:02d}-20", 90 + i % 50, i % 35, i % 30, i % 45,
+         ("Poor", "Average", "Good", "Excellent")[i % 4])
+        for i, sid in enumerate(student_ids)
+    ))
+    conn.commit()
+    return time.perf_counter() - start
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_dashboard(args):
+    import summary
+
+    workdir, path = copy_database()
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        student_ids = seed_school(conn, args.students, args.classes)
+
+        # kos trigger: insert sama ke dalam DB tanpa trigger ringkasan
+        plain_dir, plain_path = copy_database(path)
+        plain = db.open_connection(plain_path)
+        for (name,) in plain.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%summary%'"
+        ).fetchall():
+            plain.execute(f'DROP TRIGGER "{name}"')
+        plain_insert = timed_inserts(plain, student_ids)
+        plain.close()
+        shutil.rmtree(plain_dir, ignore_errors=True)
+
+        trigger_insert = timed_inserts(conn, student_ids)
+
+        def legacy():
+            for sql in LEGACY_DASHBOARD_SQL:
+                conn.execute(sql).fetchone()
+
+        def summarised():
+            summary.totals(conn)
+            trend = summary.term_trend(conn)
+            summary.class_overview(conn, trend[0]["term"] if trend else None)
+
+        def raw_overview():
+            # taburan yang sama dikira terus dari rekod asal
+            for _, _, select_sql in summary.SUMMARY_TABLES.values():
+                conn.execute(select_sql).fetchall()
+
+        legacy_time = best_of(args.repeat, legacy)
+        raw_time = best_of(max(1, args.repeat // 10), raw_overview)
+        summary_time = best_of(args.repeat, summarised)
+
+        start = time.perf_counter()
+        problems = summary.check(conn)
+        check_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary.rebuild(conn)
+        conn.commit()
+        rebuild_time = time.perf_counter() - start
+
+        summary_rows = sum(
+            conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in summary.SUMMARY_TABLES
+        )
+        conn.close()
+
+        client, _ = route_client(path)
+        login_as(client, "teacher", 1)
+        client.get("/dashboard")
+        route_time = best_of(args.repeat, lambda: client.get("/dashboard"))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    records = len(student_ids) * 2
+    report("dashboard counts", [
+        ("students", args.students),
+        ("classes", args.classes),
+        ("summary rows", summary_rows),
+        ("legacy 4x COUNT(*) (ms)", f"{legacy_time * 1000:.2f}"),
+        ("raw GROUP BY per class (ms)", f"{raw_time * 1000:.2f}"),
+        ("summary totals+overview (ms)", f"{summary_time * 1000:.2f}"),
+        ("GET /dashboard (ms)", f"{route_time * 1000:.2f}"),
+        ("insert no trigger (rec/s)", f"{records / plain_insert:.0f}"),
+        ("insert with trigger (rec/s)", f"{records / trigger_insert:.0f}"),
+        ("consistency check (s)", f"{check_time:.3f}"),
+        ("mismatches", len(problems)),
+        ("full rebuild (s)", f"{rebuild_time:.3f}"),
+    ])
+
+
+# =========================
+# PAYLOAD: ROSTER DALAM HTML VS JSON API
+# =========================
+def bench_payload(args):
+    workdir, path = copy_database()
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        seed_school(conn, args.students, args.classes)
+        class_id = conn.execute(
+            "SELECT class_id FROM class ORDER BY class_name LIMIT 1"
+        ).fetchone()[0]
+        conn.close()
+
+        client, _ = route_client(path)
+        login_as(client, "teacher", 1)
+
+        rows = []
+        for url in ("/add_bmi", "/add_segak"):
+            client.get(url)
+            start = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - start
+            rows.append((f"{url} html (KB)", f"{len(response.data) / 1024:.1f}"))
+            rows.append((f"{url} server (ms)", f"{elapsed * 1000:.2f}"))
+
+        # borang boleh diguna selepas HTML + roster satu kelas dimuat
+        roster_url = f"/api/classes/{class_id}/students"
+        response = client.get(roster_url)
+        if response.status_code == 200:
+            start = time.perf_counter()
+            page = client.get("/add_bmi")
+            roster = client.get(roster_url)
+            interactive = time.perf_counter() - start
+
+            revalidate = client.get(roster_url, headers={"If-None-Match": roster.headers["ETag"]})
+            search = client.get("/api/students?q=Student%2012")
+            rows += [
+                ("roster json, 1 class (KB)", f"{len(roster.data) / 1024:.1f}"),
+                ("html + roster (KB)", f"{(len(page.data) + len(roster.data)) / 1024:.1f}"),
+                ("html + roster (ms)", f"{interactive * 1000:.2f}"),
+                ("roster revalidate status", revalidate.status_code),
+                ("roster revalidate (bytes)", len(revalidate.data)),
+                ("prefix search results", len(search.get_json())),
+            ]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(f"add_bmi / add_segak payload, {args.students} students", rows)
+
+
+# =========================
+# REPORT CARD: N x 3 QUERY VS SATU QUERY, RENDER SELARI
+# =========================
+def bench_reports(args):
+    import reports
+
+    workdir, path = copy_database()
+    template_dir = os.path.join(BASE_DIR, "templates")
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        student_ids = seed_school(conn, args.students, args.classes)
+        timed_inserts(conn, student_ids)
+        class_ids = [r[0] for r in conn.execute("SELECT class_id FROM class")]
+
+        # cara student_print lama: 3 query bagi setiap pelajar
+        start = time.perf_counter()
+        for (sid,) in conn.execute(
+            f"SELECT student_id FROM student WHERE class_id IN ({', '.join('?' * len(class_ids))})",
+            class_ids
+        ).fetchall():
+            conn.execute("""
+                SELECT student.*, class.class_name AS class FROM student
+                LEFT JOIN class ON student.class_id = class.class_id
+                WHERE student.student_id = ?
+            """, (sid,)).fetchone()
+            conn.execute(
+                "SELECT * FROM bmi_record WHERE student_id = ? ORDER BY record_date DESC LIMIT 1",
+                (sid,)
+            ).fetchone()
+            conn.execute(
+                "SELECT * FROM segak_record WHERE student_id = ? ORDER BY test_date DESC LIMIT 1",
+                (sid,)
+            ).fetchone()
+        per_student = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = reports.report_rows(conn, class_ids)
+        set_based = time.perf_counter() - start
+        conn.close()
+
+        start = time.perf_counter()
+        for i in range(0, len(rows), reports.CHUNK_CARDS):
+            reports.render_cards(template_dir, rows[i:i + reports.CHUNK_CARDS])
+        inline = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cards = reports.render_all(template_dir, rows, lambda done: None)
+        pooled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        out = os.path.join(workdir, "bundle.html")
+        reports.write_output(out, "html", template_dir, rows, cards, "bench")
+        bundle = time.perf_counter() - start
+        size = os.path.getsize(out)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(f"report cards, {len(rows)} students", [
+        ("N x 3 queries (s)", f"{per_student:.3f}"),
+        ("one set-based query (s)", f"{set_based:.3f}"),
+        ("render inline (s)", f"{inline:.3f}"),
+        (f"render pool x{os.cpu_count()} (s)", f"{pooled:.3f}"),
+        ("write html bundle (s)", f"{bundle:.3f}"),
+        ("bundle size (MB)", f"{size / 1e6:.1f}"),
+    ])
+
+
+# =========================
+# PROGRESS: TRIGGER PER PELAJAR VS KIRA SEMULA
+# =========================
+def insert_cycle(conn, student_ids, cycle, teacher_id):
+    # satu kitaran ujian: satu BMI dan satu skor SEGAK setiap pelajar
+    date = f"{2020 + cycle // 2}-{(3, 9)[cycle % 2]:02d}-15"
+    conn.executemany(
+        """
+        INSERT INTO bmi_record
+        (student_id, height, weight, bmi_value, bmi_status, record_date)
+        VALUES (?, 1.55, 45, ?, 'Normal', ?)
+        """,
+        ((sid, 16 + (sid * 7 + cycle * 3) % 14, date) for sid in student_ids)
+    )
+    conn.executemany(
+        """
+        INSERT INTO segak_test (student_id, teacher_id, test_date, total_score)
+        VALUES (?, ?, ?, ?)
+        """,
+        ((sid, teacher_id, date, 4 + (sid * 5 + cycle) % 17) for sid in student_ids)
+    )
+    conn.commit()
+
+
+def raw_class_progress(conn, class_id):
+    # tanpa student_progress: baca semua rekod kelas dan kira dalam Python
+    series = defaultdict(lambda: {"bmi": [], "fitness": []})
+    for sid, value in conn.execute("""
+        SELECT b.student_id, b.bmi_value FROM student s
+        JOIN bmi_record b ON b.student_id = s.student_id
+        WHERE s.class_id = ? ORDER BY b.student_id, b.record_date
+    """, (class_id,)):
+        series[sid]["bmi"].append(value)
+    for sid, value in conn.execute("""
+        SELECT t.student_id, t.total_score FROM student s
+        JOIN segak_test t ON t.student_id = s.student_id
+        WHERE s.class_id = ? ORDER BY t.student_id, t.test_date
+    """, (class_id,)):
+        series[sid]["fitness"].append(value)
+    return {
+        sid: {m: (v[-1], v[-1] - v[-2] if len(v) > 1 else None) for m, v in values.items() if v}
+        for sid, values in series.items()
+    }
+
+
+def bench_progress(args):
+    import analytics
+    import norms
+
+    workdir, path = copy_database()
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        student_ids = seed_school(conn, args.students, args.classes)
+
+        start = time.perf_counter()
+        for cycle in range(args.tests - 1):
+            insert_cycle(conn, student_ids, cycle, norms.SYSTEM_TEACHER_ID)
+        history_time = time.perf_counter() - start
+
+        # kitaran terakhir: dengan dan tanpa trigger progress
+        plain_dir, plain_path = copy_database(path)
+        plain = db.open_connection(plain_path)
+        for (name,) in plain.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%progress%'"
+        ).fetchall():
+            plain.execute(f'DROP TRIGGER "{name}"')
+        start = time.perf_counter()
+        insert_cycle(plain, student_ids, args.tests - 1, norms.SYSTEM_TEACHER_ID)
+        plain_insert = time.perf_counter() - start
+        plain.close()
+        shutil.rmtree(plain_dir, ignore_errors=True)
+
+        start = time.perf_counter()
+        insert_cycle(conn, student_ids, args.tests - 1, norms.SYSTEM_TEACHER_ID)
+        trigger_insert = time.perf_counter() - start
+
+        # satu rekod seperti add_bmi: insert + commit
+        sid = student_ids[len(student_ids) // 2]
+
+        def single_insert():
+            conn.execute("""
+                INSERT INTO bmi_record
+                (student_id, height, weight, bmi_value, bmi_status, record_date)
+                VALUES (?, 1.55, 45, 20.1, 'Normal', '2030-01-01')
+            """, (sid,))
+            conn.commit()
+
+        single_time = best_of(args.repeat, single_insert)
+
+        class_id = conn.execute(
+            "SELECT class_id FROM student WHERE student_id = ?", (sid,)
+        ).fetchone()[0]
+        raw_time = best_of(args.repeat, lambda: raw_class_progress(conn, class_id))
+        stored_time = best_of(args.repeat, lambda: analytics.class_progress(conn, class_id))
+        student_time = best_of(args.repeat, lambda: analytics.student_progress(conn, sid))
+
+        start = time.perf_counter()
+        problems = analytics.check(conn)
+        check_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analytics.rebuild(conn)
+        conn.commit()
+        rebuild_time = time.perf_counter() - start
+
+        records = conn.execute(
+            "SELECT (SELECT COUNT(*) FROM bmi_record) + (SELECT COUNT(*) FROM segak_test)"
+        ).fetchone()[0]
+        class_size = conn.execute(
+            "SELECT COUNT(*) FROM student WHERE class_id = ?", (class_id,)
+        ).fetchone()[0]
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    cycle_records = len(student_ids) * 2
+    report("student progress analytics", [
+        ("students", args.students),
+        ("BMI + SEGAK records", records),
+        ("history insert (rec/s)", f"{cycle_records * (args.tests - 1) / history_time:.0f}"),
+        ("insert no trigger (rec/s)", f"{cycle_records / plain_insert:.0f}"),
+        ("insert with trigger (rec/s)", f"{cycle_records / trigger_insert:.0f}"),
+        ("single add + commit (ms)", f"{single_time * 1000:.2f}"),
+        (f"raw class ({class_size}) (ms)", f"{raw_time * 1000:.2f}"),
+        ("stored class progress (ms)", f"{stored_time * 1000:.2f}"),
+        ("one student + cohort (ms)", f"{student_time * 1000:.2f}"),
+        ("consistency check (s)", f"{check_time:.3f}"),
+        ("mismatches", len(problems)),
+        ("full rebuild (s)", f"{rebuild_time:.3f}"),
+    ])
+
+
+# =========================
+# SERVE: REQUESTS/SEC MELALUI HTTP SEBENAR
+# =========================
+SERVE_PATHS = ("/dashboard", "/segak_records")
+SERVE_SECRET = "benchmark-secret"
+
+
+def server_command(mode, port, args):
+    if mode == "gunicorn":
+        return [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers),
+            "--threads", str(args.threads), "wsgi:app",
+        ]
+    # "single" = app.run() lama (satu request pada satu masa)
+    return [
+        sys.executable, "-c",
+        "from werkzeug.serving import run_simple; from wsgi import app; "
+        f"run_simple('127.0.0.1', {port}, app, threaded={mode == 'threaded'})",
+    ]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"server on port {port} did not start")
+
+
+def session_cookie(user_id, role):
+    # cookie session Flask yang ditandatangani dengan kunci server benchmark
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+
+    signer = Flask(__name__)
+    signer.secret_key = SERVE_SECRET
+    serializer = SecureCookieSessionInterface().get_signing_serializer(signer)
+    return serializer.dumps({"user_id": user_id, "role": role})
+
+
+def http_load(port, path, cookie, clients, seconds, encoding):
+    latencies = []
+    sizes = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    headers = {"Cookie": f"session={cookie}"}
+    if encoding:
+        headers["Accept-Encoding"] = encoding
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        size = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            mine.append(time.perf_counter() - start)
+            size = len(body)
+            if response.status != 200:
+                errors.append(response.status)
+            if response.getheader("Connection", "").lower() == "close":
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            sizes.append(size)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "kb": max(sizes) / 1024,
+        "errors": len(errors),
+    }
+
+
+def bench_serve(args):
+    workdir, path = copy_database()
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        student_ids = seed_school(conn, args.students, args.classes)
+        timed_inserts(conn, student_ids)
+        teacher_id = conn.execute("SELECT teacher_id FROM teacher LIMIT 1").fetchone()[0]
+        conn.close()
+
+        env = dict(
+            os.environ, SEGAK_DATABASE=path, SEGAK_SECRET_KEY=SERVE_SECRET,
+            SEGAK_REPORT_DIR=os.path.join(workdir, "reports"),
+            SEGAK_IMPORT_DIR=os.path.join(workdir, "imports"),
+            SEGAK_ACCESS_LOG="", SEGAK_JOB_THREADS="1",
+        )
+        cookie = session_cookie(teacher_id, "teacher")
+
+        modes = ["single", "threaded"]
+        if importlib.util.find_spec("gunicorn") and os.name != "nt":
+            modes.append("gunicorn")
+        else:
+            print("gunicorn not installed: skipping multi-worker mode")
+
+        results = []
+        for mode in modes:
+            port = free_port()
+            server = subprocess.Popen(
+                server_command(mode, port, args), cwd=BASE_DIR, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                wait_for_port(port)
+                for url in SERVE_PATHS:
+                    # pemanasan: migration, cache, template
+                    http_load(port, url, cookie, 1, 0.5, "gzip")
+                    for encoding in (None, "gzip"):
+                        stats = http_load(port, url, cookie, args.clients, args.seconds, encoding)
+                        results.append((mode, url, encoding or "identity", stats))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n== HTTP load, {args.clients} clients x {args.seconds}s, {os.cpu_count()} CPU ==")
+    print(f"  {'server':<10} {'path':<16} {'encoding':<9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'KB':>7} {'errors':>6}")
+    for mode, url, encoding, stats in results:
+        print(
+            f"  {mode:<10} {url:<16} {encoding:<9} {stats['rps']:>8.1f} {stats['p50']:>8.2f}"
+            f" {stats['p95']:>8.2f} {stats['kb']:>7.1f} {stats['errors']:>6}"
+        )
+
+    logo = os.path.join(BASE_DIR, "logo.png")
+    small = os.path.join(BASE_DIR, "logo-small.png")
+    if os.path.exists(logo) and os.path.exists(small):
+        report("static assets", [
+            ("logo.png (KB)", f"{os.path.getsize(logo) / 1024:.1f}"),
+            ("logo-small.png (KB)", f"{os.path.getsize(small) / 1024:.1f}"),
+        ])
+
+
+# =========================
+# METRICS: KOS INSTRUMENTASI
+# =========================
+# SEGAK_METRICS dibaca semasa app diimport, jadi setiap mod dijalankan
+# dalam process berasingan (benchmark.py metrics --child <mod>).
+METRICS_MODES = {
+    "off": {"SEGAK_METRICS": "0"},
+    "on": {"SEGAK_METRICS": "1", "SEGAK_PROFILE_SAMPLE": "0"},
+    "on + cProfile": {"SEGAK_METRICS": "1"},
+}
+
+
+def metrics_child(args):
+    import app as segak_app
+
+    segak_app.app.testing = True
+    client = segak_app.app.test_client()
+    ids = sample_ids(segak_app.DATABASE)
+    login_as(client, "teacher", ids["teacher_id"])
+    urls = teacher_urls(ids)
+    get_all(client, urls)
+
+    # masa terbaik setiap URL; jumlahnya = satu pusingan semua halaman
+    best = {url: float("inf") for url in urls}
+    for _ in range(args.rounds):
+        for url in urls:
+            start = time.perf_counter()
+            client.get(url)
+            best[url] = min(best[url], time.perf_counter() - start)
+    print(sum(best.values()))
+
+
+def bench_metrics(args):
+    if args.child:
+        return metrics_child(args)
+
+    workdir, path = copy_database()
+    try:
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        student_ids = seed_school(conn, args.students, args.classes)
+        timed_inserts(conn, student_ids)
+        conn.close()
+
+        env = dict(
+            os.environ, SEGAK_DATABASE=path,
+            SEGAK_REPORT_DIR=os.path.join(workdir, "reports"),
+            SEGAK_IMPORT_DIR=os.path.join(workdir, "imports"),
+            SEGAK_PROFILE_DIR=os.path.join(workdir, "profiles"),
+            SEGAK_PROFILE_SAMPLE=str(args.sample),
+            SEGAK_SLOW_QUERY_MS="1000", SEGAK_JOB_THREADS="1",
+        )
+        # mod diselang-seli supaya gangguan mesin terkena semua mod sama rata
+        times = defaultdict(list)
+        for _ in range(args.repeat):
+            for mode, settings in METRICS_MODES.items():
+                output = subprocess.run(
+                    [sys.executable, "benchmark.py", "metrics", "--child", "1",
+                     "--rounds", str(args.rounds)],
+                    cwd=BASE_DIR, env=dict(env, **settings),
+                    capture_output=True, text=True, check=True
+                ).stdout
+                times[mode].append(float(output.strip().splitlines()[-1]))
+        profiles = len(os.listdir(env["SEGAK_PROFILE_DIR"])) if os.path.isdir(env["SEGAK_PROFILE_DIR"]) else 0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    base = min(times["off"])
+    rows = []
+    for mode in METRICS_MODES:
+        best = min(times[mode])
+        rows.append((f"{mode} (ms, all pages)", f"{best * 1000:.2f}  ({(best / base - 1) * 100:+.1f}%)"))
+    rows.append((f"profiles written (sample {args.sample})", profiles))
+    report("request instrumentation overhead", rows)
+
+
+# =========================
+# LOGIN: SATU KELAS LOGIN SERENTAK
+# =========================
+ATTACKER_IP = "10.99.99.99"
+
+
+def login_burst(app, accounts, password, attackers, target_email, interval=0.0, lead_seconds=1.0):
+    # setiap pelajar: client & IP sendiri, mula serentak (barrier);
+    # penyerang sudah mula lebih awal dan berterusan sehingga kelas selesai
+    barrier = threading.Barrier(len(accounts))
+    done = threading.Event()
+    latencies = []
+    statuses = defaultdict(int)
+    attacks = defaultdict(int)
+    lock = threading.Lock()
+
+    def pupil(i, email):
+        client = app.test_client()
+        barrier.wait()
+        start = time.perf_counter()
+        response = client.post("/", data={"email": email, "password": password},
+                               environ_base={"REMOTE_ADDR": f"10.0.{i // 250}.{i % 250 + 1}"})
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    def attacker():
+        client = app.test_client()
+        n = 0
+        while not done.is_set():
+            response = client.post("/", data={"email": target_email, "password": f"guess{n}"},
+                                   environ_base={"REMOTE_ADDR": ATTACKER_IP})
+            n += 1
+            with lock:
+                attacks[response.status_code] += 1
+            # jeda rangkaian antara cubaan (penyerang sebenar bukan dalam process yang sama)
+            done.wait(interval)
+
+    pupils = [threading.Thread(target=pupil, args=(i, e)) for i, e in enumerate(accounts)]
+    flood = [threading.Thread(target=attacker) for _ in range(attackers)]
+    for t in flood:
+        t.start()
+    if attackers:
+        time.sleep(lead_seconds)
+    start = time.perf_counter()
+    for t in pupils:
+        t.start()
+    for t in pupils:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in flood:
+        t.join()
+
+    latencies.sort()
+    return {
+        "logins/s": len(latencies) / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "ok": statuses[302],
+        "busy": statuses[503],
+        "attacks": sum(attacks.values()),
+        "throttled": attacks[429],
+        # cubaan yang sampai ke hash (tidak disekat / tidak ditolak)
+        "hashed": attacks[200],
+    }
+
+
+def bench_login(args):
+    import auth
+    import datagen
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        datagen.create(path, "school", progress=lambda message: None)
+        conn = db.open_connection(path)
+        accounts = [r[0] for r in conn.execute(
+            "SELECT email FROM student_user WHERE email LIKE 'student%@moe-dl.edu.my' "
+            "ORDER BY student_user_id LIMIT ?", (args.students,)
+        )]
+        target = conn.execute("SELECT email FROM teacher LIMIT 1").fetchone()[0]
+        conn.close()
+
+        import app as segak_app
+        segak_app.DATABASE = path
+        segak_app.app.testing = True
+
+        # pool = thread sebanyak pelajar menyamai login() lama (hash dalam
+        # thread request); dijalankan terakhir kerana ru_maxrss hanya naik
+        scenarios = [
+            (f"hash pool x{auth.HASH_THREADS}", auth.HASH_THREADS, 0, False),
+            (f"pool + {args.attackers} attackers, no limit", auth.HASH_THREADS, args.attackers, False),
+            (f"pool + {args.attackers} attackers, limited", auth.HASH_THREADS, args.attackers, True),
+            ("hash per request thread", len(accounts), 0, False),
+        ]
+        limits = (auth.MAX_FAILURES_PER_EMAIL, auth.MAX_FAILURES_PER_IP)
+        results = []
+        for label, threads, attackers, limited in scenarios:
+            auth.configure(threads)
+            auth.limiter = auth.FailureLimiter()
+            auth.MAX_FAILURES_PER_EMAIL, auth.MAX_FAILURES_PER_IP = limits if limited else (10 ** 9, 10 ** 9)
+            login_burst(segak_app.app, accounts[:2], datagen.DEFAULT_PASSWORD, 0, target)
+            stats = login_burst(
+                segak_app.app, accounts, datagen.DEFAULT_PASSWORD, attackers, target, args.attack_interval
+            )
+            stats["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else 0
+            results.append((label, stats))
+        auth.MAX_FAILURES_PER_EMAIL, auth.MAX_FAILURES_PER_IP = limits
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n== {len(accounts)} pupils log in at once, {os.cpu_count()} CPU ==")
+    print(f"  {'scenario':<34} {'logins/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'ok':>4} {'503':>4}"
+          f" {'attacks':>8} {'429':>6} {'hashed':>6} {'max RSS MB':>10}")
+    for label, r in results:
+        print(
+            f"  {label:<34} {r['logins/s']:>8.1f} {r['p50']:>8.0f} {r['p95']:>8.0f} {r['ok']:>4}"
+            f" {r['busy']:>4} {r['attacks']:>8} {r['throttled']:>6} {r['hashed']:>6} {r['rss']:>10.0f}"
+        )
+
+
+# =========================
+# ROUTES: SETIAP HALAMAN PADA SKALA SEKOLAH / DAERAH
+# =========================
+# Data dari datagen.py; hasil disimpan sebagai JSON supaya dua commit
+# boleh dibanding (--compare hasil_lama.json).
+ROUTE_SKIP = {
+    # mengubah session / memadam data / perlukan fail report siap
+    "static", "logout", "login_school", "delete_student", "delete_bmi", "delete_segak",
+    "job_retry", "job_rescore", "report_download",
+}
+# export penuh membaca semua rekod: kurangkan ulangan
+HEAVY_ROUTES = ("GET /export/bmi", "GET /export/segak")
+
+def route_ids(path):
+    # pelajar dalam kelas terbesar (saiz kelas sebenar, bukan kelas contoh)
+    conn = db.open_connection(path)
+    db.ensure_migrated(conn, path)
+    class_id = conn.execute("""
+        SELECT class_id FROM student WHERE class_id IS NOT NULL
+        GROUP BY class_id ORDER BY COUNT(*) DESC, class_id LIMIT 1
+    """).fetchone()[0]
+    row = conn.execute("""
+        SELECT s.student_id, s.name, c.class_id, c.class_name,
+               (SELECT MAX(bmi_id) FROM bmi_record WHERE student_id = s.student_id) AS bmi_id,
+               (SELECT MAX(segak_id) FROM segak_record WHERE student_id = s.student_id) AS segak_id,
+               (SELECT teacher_id FROM teacher LIMIT 1) AS teacher_id,
+               (SELECT email FROM student_user WHERE email LIKE 'student%@moe-dl.edu.my' LIMIT 1) AS login_email,
+               (SELECT COALESCE(MAX(seq), 0) FROM change_log) AS change_seq
+        FROM student s
+        JOIN class c ON s.class_id = c.class_id
+        WHERE s.class_id = ?
+          AND EXISTS (SELECT 1 FROM bmi_record WHERE student_id = s.student_id)
+          AND EXISTS (SELECT 1 FROM segak_record WHERE student_id = s.student_id)
+        LIMIT 1
+    """, (class_id,)).fetchone()
+    if row is None:
+        raise SystemExit("no student with BMI and SEGAK records; generate data with datagen.py")
+
+    # job yang sudah selesai untuk GET /jobs/<id> (tanpa kejutkan worker)
+    job_id = conn.execute(
+        """
+        INSERT INTO job (kind, payload, status, progress, result, attempts, max_attempts,
+                         run_after, created_at, updated_at)
+        VALUES ('rescore', '{}', 'done', 0, '{"bmi": 0, "segak": 0}', 1, 1, 0,
+                datetime('now', 'localtime'), datetime('now', 'localtime'))
+        """
+    ).lastrowid
+    conn.commit()
+    conn.close()
+    return dict(row, job_id=job_id)
+
+
+def route_cases(ids):
+    # (label, peranan, method, url, form); label tetap antara commit
+    today = time.strftime("%Y-%m-%d")
+    cls, class_id, sid = ids["class_name"], ids["class_id"], ids["student_id"]
+    urls = teacher_urls(ids)
+    # susunan sama dengan teacher_urls()
+    labels = [
+        "GET /dashboard", "GET /students", "GET /students?class=", "GET /students?after=",
+        "GET /add_student", "GET /edit_student/<id>", "GET /add_bmi", "GET /bmi_records",
+        "GET /bmi_records?class=", "GET /bmi_records?after=", "GET /edit_bmi/<id>",
+        "GET /add_segak", "GET /segak_records", "GET /segak_records?class=",
+        "GET /segak_records?class=&after=", "GET /edit_segak/<id>",
+        "GET /results?class=&student=", "GET /api/classes", "GET /api/classes/<id>/students",
+        "GET /api/students?q=", "GET /jobs",
+    ]
+    cases = [(label, "teacher", "GET", url, None) for label, url in zip(labels, urls)]
+    cases += [
+        ("GET /", None, "GET", "/", None),
+        ("GET /jobs/<id>", "teacher", "GET", f"/jobs/{ids['job_id']}", None),
+        ("GET /results", "teacher", "GET", "/results", None),
+        ("GET /class_entry/bmi", "teacher", "GET", f"/class_entry/bmi?class_id={class_id}", None),
+        ("GET /class_entry/segak", "teacher", "GET", f"/class_entry/segak?class_id={class_id}", None),
+        ("GET /import", "teacher", "GET", "/import", None),
+        ("GET /reports", "teacher", "GET", "/reports", None),
+        ("GET /district", "teacher", "GET", "/district", None),
+        ("GET /reports/<key>", "teacher", "GET", "/reports/0123456789abcdef.html", None),
+        ("GET /export/bmi?class=", "teacher", "GET", f"/export/bmi?class={cls}", None),
+        ("GET /export/bmi", "teacher", "GET", "/export/bmi", None),
+        ("GET /export/segak", "teacher", "GET", "/export/segak", None),
+        ("GET /cache_stats", "teacher", "GET", "/cache_stats", None),
+        ("GET /metrics", "teacher", "GET", "/metrics", None),
+        ("GET /metrics/slow_queries", "teacher", "GET", "/metrics/slow_queries", None),
+        # sync malam: 1000 perubahan terakhir
+        ("GET /changes?since=", "teacher", "GET", f"/changes?since={max(ids['change_seq'] - 1000, 0)}", None),
+        ("GET /capture/", "teacher", "GET", "/capture/", None),
+        ("GET /capture/sw.js", "teacher", "GET", "/capture/sw.js", None),
+        ("GET /student_dashboard", "student", "GET", "/student_dashboard", None),
+        ("GET /student/print", "student", "GET", "/student/print", None),
+        ("POST /add_bmi", "teacher", "POST", "/add_bmi", {
+            "student_id": sid, "height": "155", "weight": "48", "record_date": today,
+        }),
+        ("POST /add_segak", "teacher", "POST", "/add_segak", {
+            "student_id": sid, "test_date": today, "step_test": "118", "push_up": "18",
+            "sit_up": "17", "sit_reach": "28",
+        }),
+        ("POST /edit_bmi/<id>", "teacher", "POST", f"/edit_bmi/{ids['bmi_id']}", {
+            "height": "156", "weight": "49", "record_date": today,
+        }),
+        ("POST /edit_segak/<id>", "teacher", "POST", f"/edit_segak/{ids['segak_id']}", {
+            "test_date": today, "step_test": "116", "push_up": "19", "sit_up": "18",
+            "sit_reach": "29",
+        }),
+        # id klien tetap: selepas pemanasan setiap ulangan = muat naik semula
+        ("POST /api/entries", "teacher", "POST", "/api/entries", json.dumps({"entries": [{
+            "client_id": "route-bench-1", "kind": "bmi", "student_id": sid,
+            "height": "155", "weight": "48", "record_date": today,
+        }]}).encode()),
+    ]
+    if ids["login_email"]:
+        import datagen
+        cases.append(("POST / (student login)", None, "POST", "/", {
+            "email": ids["login_email"], "password": datagen.DEFAULT_PASSWORD,
+        }))
+    return cases
+
+
+def percentile_ms(times, fraction):
+    ordered = sorted(times)
+    return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 3)
+
+
+def run_case(client, captured, method, url, data):
+    del captured[:]
+    start = time.perf_counter()
+    if method == "POST":
+        response = client.post(url, data=data)
+    else:
+        response = client.get(url)
+    # respons stream (export CSV) dibaca habis dalam masa yang diukur
+    size = len(response.get_data())
+    elapsed = time.perf_counter() - start
+    # baris "--" = statement dalam trigger
+    queries = sum(
+        1 for _, sql in captured
+        if not sql.lstrip().startswith("--") and not sql.lstrip().upper().startswith("PRAGMA")
+    )
+    return elapsed, response.status_code, size, queries
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+            capture_output=True, text=True
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def compare_results(old, new, threshold):
+    print(f"\n== compared with {old['commit']} ({old['created_at']}) ==")
+    print(f"  {'route':<34} {'p50 ms':>15} {'':>6} {'p95 ms':>15} {'queries':>9}")
+    regressions = []
+    for label, now in new["routes"].items():
+        before = old["routes"].get(label)
+        if before is None:
+            print(f"  {label:<34} (new)")
+            continue
+        # p50 lebih stabil daripada p95 untuk ulangan sedikit; < 1 ms diabaikan
+        change = (now["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else 0
+        slower = change > threshold and now["p50_ms"] - before["p50_ms"] > 1
+        more_queries = now["queries"] > before["queries"]
+        flag = "  REGRESSION" if slower or more_queries else ""
+        if flag:
+            regressions.append(label)
+        print(
+            f"  {label:<34} {before['p50_ms']:>7.2f}>{now['p50_ms']:<7.2f}{change:+5.0f}%"
+            f" {before['p95_ms']:>7.2f}>{now['p95_ms']:<7.2f}"
+            f" {before['queries']:>4}>{now['queries']:<4}{flag}"
+        )
+    return regressions
+
+
+def bench_routes(args):
+    import datagen
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        if args.database:
+            # salinan: request POST menambah rekod
+            shutil.copyfile(args.database, path)
+            dataset = {"database": os.path.basename(args.database)}
+        else:
+            dataset = datagen.create(path, args.preset, seed=args.seed)
+
+        ids = route_ids(path)
+        client, captured = route_client(path)
+        import app as segak_app
+        segak_app.REPORT_DIR = os.path.join(workdir, "reports")
+        segak_app.IMPORT_DIR = os.path.join(workdir, "imports")
+
+        cases = route_cases(ids)
+        covered = {
+            segak_app.app.url_map.bind("localhost").match(url.split("?")[0], method=method)[0]
+            for _, _, method, url, _ in cases
+        }
+        missing = sorted(
+            rule.endpoint for rule in segak_app.app.url_map.iter_rules()
+            if rule.endpoint not in covered and rule.endpoint not in ROUTE_SKIP
+        )
+        if missing:
+            print(f"routes without a benchmark case: {', '.join(missing)}")
+
+        results = {}
+        for label, role, method, url, data in cases:
+            if args.only and args.only not in label:
+                continue
+            if role:
+                login_as(client, role, ids["teacher_id"] if role == "teacher" else ids["student_id"])
+            else:
+                with client.session_transaction() as sess:
+                    sess.clear()
+
+            repeat = max(2, args.requests // 10) if label in HEAVY_ROUTES else args.requests
+            # pemanasan: cache, template, norma
+            run_case(client, captured, method, url, data)
+            times = []
+            for _ in range(repeat):
+                elapsed, status, size, queries = run_case(client, captured, method, url, data)
+                if status >= 500:
+                    raise SystemExit(f"{label} returned {status}")
+                times.append(elapsed)
+
+            # memori puncak Python bagi satu request (tracemalloc lambat: sekali sahaja)
+            tracemalloc.start()
+            run_case(client, captured, method, url, data)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results[label] = {
+                "status": status,
+                "requests": repeat,
+                "p50_ms": percentile_ms(times, 0.5),
+                "p95_ms": percentile_ms(times, 0.95),
+                "mean_ms": round(sum(times) / len(times) * 1000, 3),
+                "queries": queries,
+                "bytes": size,
+                "peak_kb": round(peak / 1024, 1),
+            }
+            print(
+                f"  {label:<34} {status:>3} p50 {results[label]['p50_ms']:>8.2f} ms"
+                f"  p95 {results[label]['p95_ms']:>8.2f} ms  {queries:>3} queries"
+                f"  {results[label]['peak_kb']:>8.1f} KB"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit, dirty = git_revision()
+    output = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "preset": None if args.database else args.preset,
+        "dataset": dataset,
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "cpus": os.cpu_count(),
+        # ru_maxrss dalam KB di Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+        "routes": results,
+    }
+
+    target = args.output or os.path.join(
+        BASE_DIR, "bench_results",
+        f"routes-{output['preset'] or 'custom'}-{commit}{'-dirty' if dirty else ''}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+    report("route benchmark", [
+        ("routes", len(results)),
+        ("peak RSS (MB)", output["peak_rss_mb"]),
+        ("results", target),
+    ])
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_results(json.load(f), output, args.threshold)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} route(s) regressed")
+
+
+# =========================
+# SEGAK: JADUAL RATA VS segak_test/segak_detail
+# =========================
+# Data yang sama dalam kedua-dua bentuk: segak_flat ialah salinan
+# segak_record lama (lajur tetap + index student/tarikh) dan segak_record
+# ialah view atas jadual ternormal. Query sama dijalankan pada kedua-duanya.
+SEGAK_LAYOUT_QUERIES = (
+    # (label, SQL dengan {table}, parameter)
+    ("list page, one class", """
+        SELECT r.segak_id, s.student_id, s.name, c.class_name AS class, r.step_test,
+               r.push_up, r.sit_up, r.sit_reach, r.fitness_level, r.test_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN {table} r ON r.student_id = s.student_id
+        WHERE c.class_name = :class
+        ORDER BY c.class_name, s.name, s.student_id, r.test_date DESC, r.segak_id
+        LIMIT 51
+    """),
+    ("list page, all classes", """
+        SELECT r.segak_id, s.student_id, s.name, c.class_name AS class, r.step_test,
+               r.push_up, r.sit_up, r.sit_reach, r.fitness_level, r.test_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN {table} r ON r.student_id = s.student_id
+        ORDER BY c.class_name, s.name, s.student_id, r.test_date DESC, r.segak_id
+        LIMIT 51
+    """),
+    ("one student's tests", """
+        SELECT test_date, step_test, push_up, sit_up, sit_reach, fitness_level
+        FROM {table}
+        WHERE student_id = :student
+        ORDER BY test_date DESC
+    """),
+    ("report rows, one class", """
+        SELECT s.student_id, s.name, r.test_date, r.step_test, r.push_up, r.sit_up,
+               r.sit_reach, r.fitness_level
+        FROM class c
+        JOIN student s ON s.class_id = c.class_id
+        LEFT JOIN {table} r ON r.segak_id = (
+            SELECT segak_id FROM {table}
+            WHERE student_id = s.student_id
+            ORDER BY test_date DESC, segak_id DESC
+            LIMIT 1
+        )
+        WHERE c.class_name = :class
+        ORDER BY s.name, s.student_id
+    """),
+    ("export, every test", """
+        SELECT r.segak_id, s.student_id, s.name, c.class_name AS class, s.gender, s.age,
+               r.step_test, r.push_up, r.sit_up, r.sit_reach, r.fitness_level, r.test_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN {table} r ON r.student_id = s.student_id
+        ORDER BY c.class_name, s.name, s.student_id, r.test_date DESC, r.segak_id
+    """),
+    ("class summary, every test", """
+        SELECT COALESCE(s.class_id, 0), COALESCE(r.fitness_level, ''), COUNT(*),
+               SUM(r.step_test), SUM(r.push_up), SUM(r.sit_up), SUM(r.sit_reach)
+        FROM {table} r
+        JOIN student s ON s.student_id = r.student_id
+        GROUP BY 1, 2
+    """),
+)
+
+
+def table_bytes(conn, names):
+    return conn.execute(
+        f"SELECT SUM(pgsize) FROM dbstat WHERE name IN ({', '.join('?' * len(names))})", names
+    ).fetchone()[0]
+
+
+def bench_segak(args):
+    import datagen
+    import fitness
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, args.preset, seed=args.seed, progress=lambda message: None)
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+
+        # bentuk lama: satu baris, satu lajur bagi setiap aktiviti
+        conn.executescript("""
+            DROP TABLE IF EXISTS segak_flat;
+            CREATE TABLE segak_flat (
+                segak_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id     INTEGER NOT NULL,
+                step_test      INTEGER,
+                sit_up         INTEGER,
+                push_up        INTEGER,
+                sit_reach      REAL,
+                test_date      TEXT NOT NULL,
+                fitness_level  TEXT
+            );
+            INSERT INTO segak_flat
+            SELECT segak_id, student_id, step_test, sit_up, push_up, sit_reach, test_date, fitness_level
+            FROM segak_record;
+            CREATE INDEX idx_segak_flat_student_date ON segak_flat (student_id, test_date DESC);
+            ANALYZE;
+        """)
+        params = dict(zip(("class", "student"), conn.execute("""
+            SELECT c.class_name, MIN(s.student_id)
+            FROM class c JOIN student s ON s.class_id = c.class_id
+            GROUP BY c.class_id ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()))
+        tests = conn.execute("SELECT COUNT(*) FROM segak_test").fetchone()[0]
+
+        rows = []
+        for label, sql in SEGAK_LAYOUT_QUERIES:
+            times = {}
+            results = {}
+            for layout, table in (("flat", "segak_flat"), ("normalized", "segak_record")):
+                query = sql.format(table=table)
+                results[layout] = conn.execute(query, params).fetchall()
+                times[layout] = best_of(args.repeat, lambda: conn.execute(query, params).fetchall())
+            if [tuple(r) for r in results["flat"]] != [tuple(r) for r in results["normalized"]]:
+                raise SystemExit(f"{label}: layouts returned different rows")
+            rows.append((label, times["flat"], times["normalized"], len(results["flat"])))
+
+        # bacaan lajur semua aktiviti (GROUP BY atas segak_detail) vs view
+        activity_ids = [a[0] for a in fitness.activities(conn)]
+        vector = fitness.vector_sql(activity_ids)
+        view_all = "SELECT * FROM segak_record ORDER BY segak_id"
+        flat_all = "SELECT * FROM segak_flat ORDER BY segak_id"
+        pivot_times = {
+            "flat": best_of(args.repeat, lambda: conn.execute(flat_all).fetchall()),
+            "view": best_of(args.repeat, lambda: conn.execute(view_all).fetchall()),
+            "group by": best_of(args.repeat, lambda: conn.execute(vector).fetchall()),
+            "numpy": best_of(args.repeat, lambda: fitness.test_vectors(conn)),
+        }
+
+        storage = {
+            "flat": table_bytes(conn, ["segak_flat", "idx_segak_flat_student_date"]),
+            "normalized": table_bytes(
+                conn, ["segak_test", "segak_detail", "idx_segak_test_student_date"]
+            ),
+        }
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"== SEGAK layouts, {tests} tests ==")
+    print(f"  {'query':30} {'flat ms':>9} {'normal. ms':>11} {'ratio':>6} {'rows':>7}")
+    for label, flat, normalized, count in rows:
+        print(f"  {label:30} {flat * 1000:9.2f} {normalized * 1000:11.2f} "
+              f"{normalized / flat:6.2f} {count:7}")
+    print()
+    report("every test, all activities (ms)", [
+        (name, f"{seconds * 1000:.1f}") for name, seconds in pivot_times.items()
+    ] + [
+        ("storage flat (MB)", f"{storage['flat'] / 1e6:.1f}"),
+        ("storage normalized (MB)", f"{storage['normalized'] / 1e6:.1f}"),
+    ])
+
+
+# =========================
+# CHANGES: SALINAN PENUH VS /changes?since=
+# =========================
+# Satu hari persekolahan (beberapa kelas diuji, rekod dibetulkan dan
+# dipadam) selepas sync terakhir. Sistem hiliran sama ada salin seluruh
+# DB (backup API) atau baca delta dari /changes.
+def school_day(conn, classes, seed):
+    import numpy as np
+
+    import datagen
+
+    rng = np.random.default_rng(seed)
+    students = conn.execute(
+        """
+        SELECT student_id, name, gender, age, class_id FROM student
+        WHERE class_id IN (
+            SELECT class_id FROM class_summary ORDER BY student_count DESC, class_id LIMIT ?
+        )
+        """,
+        (classes,)
+    ).fetchall()
+    students = [tuple(s) for s in students]
+    teacher_id = conn.execute("SELECT MIN(teacher_id) FROM teacher").fetchone()[0] or 0
+    last_bmi = conn.execute("SELECT COALESCE(MAX(bmi_id), 0) FROM bmi_record").fetchone()[0]
+    datagen.add_bmi_cycle(conn, rng, students, 0, 1)
+    datagen.add_segak_cycle(conn, rng, students, 0, 1, teacher_id)
+
+    # pembetulan dan padam: ~2% / ~1% rekod hari ini, 1 pelajar
+    edited = conn.execute(
+        "UPDATE bmi_record SET weight = weight + 0.5 WHERE bmi_id > ? AND bmi_id % 50 = 0",
+        (last_bmi,)
+    ).rowcount
+    deleted = conn.execute(
+        "DELETE FROM bmi_record WHERE bmi_id > ? AND bmi_id % 97 = 0", (last_bmi,)
+    ).rowcount
+    conn.execute("DELETE FROM student WHERE student_id = ?", (students[-1][0],))
+    conn.commit()
+    return len(students), edited, deleted + 1
+
+
+def timed_log_inserts(conn, rows, with_log):
+    import fitness
+    from importer import next_segak_id
+
+    students = [r[0] for r in conn.execute("SELECT student_id FROM student LIMIT ?", (rows,))]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not with_log:
+            # DDL ikut rollback: trigger kembali selepas ukuran
+            for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            ).fetchall():
+                if "_log_" in name or name.endswith("_archive"):
+                    conn.execute(f"DROP TRIGGER {name}")
+        first_id = next_segak_id(conn)
+        start = time.perf_counter()
+        conn.executemany(
+            """
+            INSERT INTO bmi_record (student_id, height, weight, bmi_value, bmi_status, record_date)
+            VALUES (?, 1.6, 50, 19.5, 'Normal', '2030-01-10')
+            """,
+            ((sid,) for sid in students)
+        )
+        fitness.insert_tests(conn, (
+            (first_id + i, sid, "2030-01-15", "Good", 12, [(1, 120, 3), (2, 20, 3), (3, 18, 3), (4, 30, 3)])
+            for i, sid in enumerate(students)
+        ))
+        conn.execute("DELETE FROM bmi_record WHERE record_date = '2030-01-10'")
+        return time.perf_counter() - start, len(students)
+    finally:
+        conn.rollback()
+
+
+def bench_changes(args):
+    import datagen
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, args.preset, seed=args.seed, progress=lambda message: None)
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        since = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+        start = time.perf_counter()
+        students, edited, deleted = school_day(conn, args.classes, args.seed)
+        day_seconds = time.perf_counter() - start
+        log_bytes = table_bytes(conn, ["change_log", "idx_change_log_changed_at"])
+
+        write_times = {
+            label: timed_log_inserts(conn, args.rows, with_log)
+            for label, with_log in (("without log", False), ("with log", True))
+        }
+
+        # sync penuh: salinan DB yang konsisten melalui backup API
+        copy_path = os.path.join(workdir, "copy.db")
+        start = time.perf_counter()
+        target = sqlite3.connect(copy_path)
+        conn.backup(target)
+        target.close()
+        copy_seconds = time.perf_counter() - start
+        copy_bytes = os.path.getsize(copy_path)
+        conn.close()
+
+        client, _ = route_client(path)
+        teacher_id = sqlite3.connect(path).execute("SELECT MIN(teacher_id) FROM teacher").fetchone()[0]
+        login_as(client, "teacher", teacher_id)
+        start = time.perf_counter()
+        response = client.get(f"/changes?since={since}")
+        body = response.get_data()
+        changes = [json.loads(line) for line in body.splitlines()]
+        feed_seconds = time.perf_counter() - start
+        if response.status_code != 200:
+            raise SystemExit(f"/changes returned {response.status_code}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    counts = defaultdict(int)
+    for change in changes:
+        counts[f"{change['table']} {change['op']}"] += 1
+    report(f"one school day: {args.classes} classes, {students} students tested", [
+        ("write time (s)", f"{day_seconds:.2f}"),
+        ("records edited / deleted", f"{edited} / {deleted}"),
+    ] + sorted(counts.items()))
+    report("sync", [
+        ("full copy (s)", f"{copy_seconds:.2f}"),
+        ("full copy (MB)", f"{copy_bytes / 1e6:.1f}"),
+        ("/changes (s)", f"{feed_seconds:.3f}"),
+        ("/changes (MB)", f"{len(body) / 1e6:.2f}"),
+        ("/changes rows", len(changes)),
+        ("head seq (X-Change-Seq)", response.headers["X-Change-Seq"]),
+        ("change_log size (MB)", f"{log_bytes / 1e6:.1f}"),
+    ])
+    (plain, n), (logged, _) = write_times["without log"], write_times["with log"]
+    report(f"write cost: {n} BMI + {n} SEGAK inserts, {n} deletes", [
+        ("without log/archive (ms)", f"{plain * 1000:.0f}"),
+        ("with log/archive (ms)", f"{logged * 1000:.0f}"),
+        ("overhead", f"{(logged / plain - 1) * 100:.0f}%"),
+    ])
+
+
+# =========================
+# SHARD SETIAP SEKOLAH: TULISAN SERENTAK & FAN-OUT DAERAH
+# =========================
+SHARD_WRITE_SQL = """
+    INSERT INTO bmi_record
+    (student_id, height, weight, bmi_value, bmi_status, record_date)
+    VALUES (?, 1.6, 55, 21.48, 'Normal', '2030-03-10')
+"""
+
+
+def school_writer(path, student_ids, seconds, latencies, lock):
+    # seorang guru simpan rekod satu demi satu (satu commit setiap rekod)
+    conn = db.open_connection(path)
+    times = []
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        conn.execute(SHARD_WRITE_SQL, (student_ids[len(times) % len(student_ids)],))
+        conn.commit()
+        times.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(times)
+
+
+def concurrent_writes(targets, seconds):
+    # targets: [(fail DB, id pelajar sekolah)], satu thread setiap sekolah
+    latencies = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=school_writer, args=(path, ids, seconds, latencies, lock))
+        for path, ids in targets
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / seconds, percentile_ms(latencies, 0.5), percentile_ms(latencies, 0.95)
+
+
+def bench_shards(args):
+    import datagen
+    import shards
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    shard_dir = os.path.join(workdir, "shards")
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, "district", seed=args.seed, schools=args.schools,
+                           progress=lambda message: None)
+        start = time.perf_counter()
+        split = shards.split(path, shard_dir, "SCHOOL", progress=lambda message: None)
+        split_seconds = time.perf_counter() - start
+
+        # id pelajar dikekalkan semasa pecah: senarai yang sama untuk kedua-dua susunan
+        conn = db.open_connection(path)
+        schools = [s for s in sorted(split) if s != "SCHOOL"][:args.writers]
+        school_students = {
+            school: [r[0] for r in conn.execute(
+                """
+                SELECT student_id FROM student
+                WHERE class_id IN (SELECT class_id FROM class WHERE class_name LIKE ?)
+                """,
+                (f"%({school})",)
+            )]
+            for school in schools
+        }
+        conn.close()
+
+        single = concurrent_writes(
+            [(path, school_students[s]) for s in schools], args.seconds
+        )
+        sharded = concurrent_writes(
+            [(os.path.join(shard_dir, s + ".db"), school_students[s]) for s in schools],
+            args.seconds
+        )
+
+        whole = shards.Router(path)
+        router = shards.Router(path, shard_dir)
+        start = time.perf_counter()
+        shards.fan_out(router, shards.school_summary)
+        cold = time.perf_counter() - start
+        single_db = best_of(args.repeat, lambda: shards.fan_out(whole, shards.school_summary))
+        sequential = best_of(args.repeat, lambda: [
+            shards.fan_out(router, shards.school_summary, schools=[school])
+            for school in router.schools()
+        ])
+        parallel = best_of(args.repeat, lambda: shards.fan_out(router, shards.school_summary))
+        single_bytes = os.path.getsize(path)
+        shard_bytes = [
+            os.path.getsize(os.path.join(shard_dir, name)) for name in os.listdir(shard_dir)
+            if name.endswith(".db")
+        ]
+        db.close_pools()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(f"split: {len(split)} shards, {sum(split.values())} students", [
+        ("split time (s)", f"{split_seconds:.1f}"),
+        ("single file (MB)", f"{single_bytes / 1e6:.1f}"),
+        ("largest shard (MB)", f"{max(shard_bytes) / 1e6:.1f}"),
+    ])
+    report(f"concurrent writes: {len(schools)} schools, one teacher each, {args.seconds:g}s", [
+        ("single file (commits/s)", f"{single[0]:.0f}"),
+        ("single file p50 / p95 (ms)", f"{single[1]} / {single[2]}"),
+        ("shards (commits/s)", f"{sharded[0]:.0f}"),
+        ("shards p50 / p95 (ms)", f"{sharded[1]} / {sharded[2]}"),
+    ])
+    report(f"district summary ({shards.FANOUT_THREADS} fan-out threads)", [
+        ("single file (ms)", f"{single_db * 1000:.2f}"),
+        ("shards, first call (ms)", f"{cold * 1000:.2f}"),
+        ("shards, sequential (ms)", f"{sequential * 1000:.2f}"),
+        ("shards, fan-out (ms)", f"{parallel * 1000:.2f}"),
+    ])
+
+
+# =========================
+# BACKUP DALAM TALIAN: TEMPOH TULISAN TERHENTI
+# =========================
+def pad_database(path, size_mb):
+    # jadual pengisi supaya fail DB mencapai saiz sasaran
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS bench_padding (id INTEGER PRIMARY KEY, filler BLOB)")
+    rows = int((size_mb * 1e6 - os.path.getsize(path)) // 4000)
+    if rows > 0:
+        conn.execute(
+            """
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+            INSERT INTO bench_padding (filler) SELECT randomblob(3900) FROM n
+            """,
+            (rows,)
+        )
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def steady_writer(path, student_ids, stop, samples, lock):
+    # guru simpan rekod setiap ~5 ms; (masa mula, tempoh commit) dicatat
+    conn = db.open_connection(path)
+    found = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute(SHARD_WRITE_SQL, (student_ids[len(found) % len(student_ids)],))
+        conn.commit()
+        found.append((start, time.perf_counter() - start))
+        time.sleep(0.005)
+    conn.close()
+    with lock:
+        samples.extend(found)
+
+
+def locked_copy(path, target):
+    # cara lama yang selamat: kunci tulis sepanjang salinan fail
+    conn = db.open_connection(path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        shutil.copyfile(path, target)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def writes_during(path, student_ids, writers, func):
+    samples = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=steady_writer, args=(path, student_ids, stop, samples, lock))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    result = func()
+    end = time.perf_counter()
+    time.sleep(0.2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    # tulisan yang bermula semasa backup berjalan
+    during = [seconds for started, seconds in samples if start <= started < end]
+    return end - start, during, result
+
+
+def bench_backup(args):
+    import backup
+    import datagen
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    snapshot_dir = os.path.join(workdir, "snapshots")
+    results = []
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, "school", seed=args.seed, progress=lambda message: None)
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        conn.close()
+        pad_database(path, args.size_mb)
+        size = os.path.getsize(path)
+        student_ids = [r[0] for r in sqlite3.connect(path).execute("SELECT student_id FROM student")]
+
+        methods = [
+            ("no backup (baseline)", lambda: time.sleep(2)),
+            ("file copy under write lock", lambda: locked_copy(path, os.path.join(workdir, "copy.db"))),
+            ("backup API, one step", lambda: backup.snapshot(path, snapshot_dir, pages=-1, verify=False)),
+            (f"backup API, {args.pages} pages/step",
+             lambda: backup.snapshot(path, snapshot_dir, pages=args.pages, verify=False)),
+        ]
+        for label, func in methods:
+            seconds, during, made = writes_during(path, student_ids, args.writers, func)
+            for leftover in [made] if made else [os.path.join(workdir, "copy.db")]:
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            results.append((label, seconds, during))
+
+        start = time.perf_counter()
+        made = backup.snapshot(path, snapshot_dir, pages=args.pages, verify=True)
+        verified_seconds = time.perf_counter() - start
+        errors = backup.integrity_errors(made)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for label, seconds, during in results:
+        report(f"{label}: {size / 1e9:.2f} GB, {args.writers} writers", [
+            ("duration (s)", f"{seconds:.2f}"),
+            ("commits during", len(during)),
+            ("commit p50 / p99 (ms)",
+             f"{percentile_ms(during, 0.5)} / {percentile_ms(during, 0.99)}" if during else "-"),
+            ("longest commit (ms)", f"{max(during) * 1000:.1f}" if during else "-"),
+            ("commits > 100 ms", sum(1 for s in during if s > 0.1)),
+        ])
+    report("snapshot + integrity_check", [
+        ("total (s)", f"{verified_seconds:.2f}"),
+        ("integrity_check", "ok" if not errors else errors[0]),
+    ])
+
+
+# =========================
+# SEARCH: FTS5 AWALAN + EJAAN HAMPIR
+# =========================
+LIKE_SQL = """
+    SELECT s.student_id, s.name, s.gender, c.class_name AS class
+    FROM student s
+    LEFT JOIN class c ON s.class_id = c.class_id
+    WHERE s.name LIKE ? ESCAPE '\\'
+    ORDER BY s.name COLLATE NOCASE
+    LIMIT 20
+"""
+
+
+def misspell(word, rng):
+    # satu kesilapan: buang, tukar atau songsang dua huruf
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("drop", "replace", "swap"))
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "replace":
+        return word[:i] + rng.choice("aeiouhnr") + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def search_queries(conn, count, seed):
+    # {jenis: [(query, perkataan yang patut ada dalam hasil)]}
+    rng = random.Random(seed)
+    rows = conn.execute("""
+        SELECT s.name, c.class_name FROM student s
+        JOIN class c ON c.class_id = s.class_id
+    """).fetchall()
+    queries = defaultdict(list)
+    for name, class_name in rng.sample(rows, min(count, len(rows))):
+        first, *rest = name.split()
+        last = rest[-1] if rest else first
+        queries["prefix, 2 letters"].append((first[:2], first[:2]))
+        queries["prefix, 4 letters"].append((first[:4], first[:4]))
+        queries["first + last name"].append((f"{first} {last}", last))
+        queries["class + name prefix"].append((f"{class_name} {first[:3]}", first[:3]))
+        long_words = [w for w in name.split() if len(w) >= 5 and w.isalpha()]
+        if long_words:
+            word = rng.choice(long_words)
+            queries["one typo"].append((misspell(word, rng), word))
+    return queries
+
+
+def bench_search(args):
+    import datagen
+    import search
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, args.preset, seed=args.seed, progress=lambda message: None)
+        conn = db.open_connection(path)
+        start = time.perf_counter()
+        db.ensure_migrated(conn, path)
+        migrate_seconds = time.perf_counter() - start
+        students = conn.execute("SELECT COUNT(*) FROM student").fetchone()[0]
+        queries = search_queries(conn, args.queries, args.seed)
+
+        start = time.perf_counter()
+        search.load_vocabulary(conn)
+        vocabulary_seconds = time.perf_counter() - start
+        terms = conn.execute("SELECT COUNT(*) FROM student_search_vocab").fetchone()[0]
+
+        results = []
+        for label, cases in queries.items():
+            times = []
+            found = 0
+            for text, expected in cases:
+                start = time.perf_counter()
+                rows = search.search_students(conn, text)
+                times.append(time.perf_counter() - start)
+                found += any(
+                    expected.lower() in search.fold(f"{row['name']} {row['class']}") for row in rows
+                )
+            results.append((label, times, found, len(cases)))
+
+        like_times = []
+        for text, _ in queries["prefix, 4 letters"]:
+            start = time.perf_counter()
+            conn.execute(LIKE_SQL, (text + "%",)).fetchall()
+            like_times.append(time.perf_counter() - start)
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(f"search index: {students} students", [
+        ("migrate + build index (s)", f"{migrate_seconds:.2f}"),
+        ("index terms", terms),
+        ("vocabulary load (ms)", f"{vocabulary_seconds * 1000:.1f}"),
+    ])
+    for label, times, found, total in results:
+        report(label, [
+            ("p50 / p95 (ms)", f"{percentile_ms(times, 0.5)} / {percentile_ms(times, 0.95)}"),
+            ("max (ms)", f"{max(times) * 1000:.2f}"),
+            ("expected word found", f"{found}/{total}"),
+        ])
+    report("before: LIKE 'prefix%' on name (4 letters)", [
+        ("p50 / p95 (ms)", f"{percentile_ms(like_times, 0.5)} / {percentile_ms(like_times, 0.95)}"),
+    ])
+
+
+# =========================
+# LATEST: REKOD TERKINI SETIAP PELAJAR
+# =========================
+# cara sebelum student_latest: cari rekod terkini setiap pelajar
+CORRELATED_LATEST_SQL = """
+    SELECT s.student_id, s.name, s.gender, s.age, c.class_name AS class,
+           b.record_date, b.height, b.weight, b.bmi_value, b.bmi_status,
+           r.test_date, r.step_test, r.push_up, r.sit_up, r.sit_reach, r.fitness_level
+    FROM student s
+    LEFT JOIN class c ON c.class_id = s.class_id
+    LEFT JOIN bmi_record b ON b.bmi_id = (
+        SELECT bmi_id FROM bmi_record
+        WHERE student_id = s.student_id
+        ORDER BY record_date DESC, bmi_id DESC
+        LIMIT 1
+    )
+    LEFT JOIN segak_record r ON r.segak_id = (
+        SELECT segak_id FROM segak_record
+        WHERE student_id = s.student_id
+        ORDER BY test_date DESC, segak_id DESC
+        LIMIT 1
+    )
+"""
+
+
+def timed_bmi_inserts(conn, student_ids, record_date):
+    # ms bagi setiap insert; rollback supaya setiap ukuran bermula sama
+    start = time.perf_counter()
+    conn.executemany(
+        "INSERT INTO bmi_record (student_id, record_date, weight, height, bmi_value, bmi_status)"
+        " VALUES (?, ?, 50, 1.6, 19.5, 'Normal')",
+        ((sid, record_date) for sid in student_ids)
+    )
+    seconds = time.perf_counter() - start
+    conn.rollback()
+    return seconds * 1000 / len(student_ids)
+
+
+def bench_latest(args):
+    import datagen
+    import reports
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, args.preset, seed=args.seed, progress=lambda message: None)
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        students = conn.execute("SELECT COUNT(*) FROM student").fetchone()[0]
+        class_ids = [r[0] for r in conn.execute("SELECT class_id FROM class")]
+        student_ids = [r[0] for r in conn.execute("SELECT student_id FROM student")]
+        sample = random.Random(args.seed).sample(student_ids, min(args.students, len(student_ids)))
+
+        overview = {}
+        for label, sql in (("before", CORRELATED_LATEST_SQL), ("after", reports.LATEST_SQL)):
+            overview[label] = best_of(args.repeat, lambda: [
+                conn.execute(sql + " WHERE s.class_id = ?", (class_id,)).fetchall()
+                for class_id in class_ids
+            ])
+
+        lookups = {}
+        for label, sql in (("before", CORRELATED_LATEST_SQL), ("after", reports.LATEST_SQL)):
+            lookups[label] = best_of(args.repeat, lambda: [
+                conn.execute(sql + " WHERE s.student_id = ?", (sid,)).fetchone() for sid in sample
+            ])
+
+        # trigger student_latest: rekod baru vs rekod lama (tarikh ke belakang)
+        newest = timed_bmi_inserts(conn, sample, "2999-12-31")
+        back_dated = timed_bmi_inserts(conn, sample, "1900-01-01")
+        conn.execute("BEGIN")
+        for event in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER trg_bmi_record_latest_{event}")
+        without = timed_bmi_inserts(conn, sample, "2999-12-31")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(f"status overview: {len(class_ids)} classes, {students} students", [
+        ("correlated subqueries (ms)", f"{overview['before'] * 1000:.1f}"),
+        ("student_latest (ms)", f"{overview['after'] * 1000:.1f}"),
+    ])
+    report(f"print lookup: {len(sample)} students", [
+        ("correlated (ms/student)", f"{lookups['before'] * 1000 / len(sample):.3f}"),
+        ("student_latest (ms/student)", f"{lookups['after'] * 1000 / len(sample):.3f}"),
+    ])
+    report("BMI insert cost (ms per row)", [
+        ("without student_latest", f"{without:.3f}"),
+        ("newest record", f"{newest:.3f}"),
+        ("back-dated record", f"{back_dated:.3f}"),
+    ])
+
+
+# =========================
+# CAPTURE: MUAT NAIK KUMPULAN DARI PERANTI (KLIEN TIRUAN)
+# =========================
+def capture_entries(conn, count, rng, invalid):
+    # rekod seperti yang disimpan oleh /capture/ (nilai sebagai teks)
+    student_ids = [r[0] for r in conn.execute("SELECT student_id FROM student")]
+    entries = []
+    for i in range(count):
+        entry = {"client_id": f"{rng.getrandbits(64):016x}-{i}", "student_id": rng.choice(student_ids)}
+        if i % 2:
+            entry.update(kind="bmi", record_date="2026-03-02",
+                         height=f"{rng.uniform(120, 180):.1f}", weight=f"{rng.uniform(25, 80):.1f}")
+        else:
+            entry.update(kind="segak", test_date="2026-03-02", step_test=str(rng.randint(20, 60)),
+                         push_up=str(rng.randint(0, 40)), sit_up=str(rng.randint(0, 40)),
+                         sit_reach=f"{rng.uniform(10, 45):.1f}")
+        if rng.random() < invalid:
+            entry["student_id"] = "0"
+        entries.append(entry)
+    return entries
+
+
+def bench_capture(args):
+    import gzip
+    import datagen
+
+    workdir = tempfile.mkdtemp(prefix="segak_bench_")
+    path = os.path.join(workdir, "segak.db")
+    try:
+        if args.database:
+            shutil.copyfile(args.database, path)
+        else:
+            datagen.create(path, args.preset, seed=args.seed, progress=lambda message: None)
+        conn = db.open_connection(path)
+        db.ensure_migrated(conn, path)
+        rng = random.Random(args.seed)
+        teacher_id = conn.execute("SELECT teacher_id FROM teacher LIMIT 1").fetchone()[0]
+        entries = capture_entries(conn, args.entries, rng, args.invalid)
+
+        def counts():
+            return [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("bmi_record", "segak_test", "client_entry")]
+
+        before = counts()
+        client, _ = route_client(path)
+        login_as(client, "teacher", teacher_id)
+
+        # klien tiruan: sama seperti capture.html, rekod keluar dari
+        # baris gilir hanya selepas jawapan server sampai
+        queue = list(entries)
+        outcome = {}
+        times = []
+        raw_bytes = gzip_bytes = sent = dropped = lost = 0
+        while queue:
+            batch = queue[:args.batch]
+            body = json.dumps({"entries": batch}).encode()
+            packed = gzip.compress(body)
+            if rng.random() < args.drop:
+                # permintaan tidak sampai ke server
+                dropped += 1
+                continue
+            start = time.perf_counter()
+            response = client.post("/api/entries", data=packed, content_type="application/json",
+                                   headers={"Content-Encoding": "gzip"})
+            times.append(time.perf_counter() - start)
+            sent += 1
+            raw_bytes += len(body)
+            gzip_bytes += len(packed)
+            if response.status_code != 200:
+                raise SystemExit(f"/api/entries returned {response.status_code}: {response.get_data(as_text=True)}")
+            if rng.random() < args.lose:
+                # server sudah commit tetapi jawapan hilang: hantar semula
+                lost += 1
+                continue
+            done = set()
+            for result in response.get_json()["results"]:
+                outcome.setdefault(result["client_id"], result["status"])
+                done.add(result["client_id"])
+            queue = [e for e in queue if e["client_id"] not in done]
+
+        after = counts()
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    statuses = defaultdict(int)
+    for status in outcome.values():
+        statuses[status] += 1
+    rows_added = (after[0] - before[0]) + (after[1] - before[1])
+    expected = sum(1 for e in entries if e["student_id"] != "0")
+    report(f"stub client: {len(entries)} entries, batches of {args.batch}", [
+        ("requests sent", sent),
+        ("requests dropped", dropped),
+        ("responses lost (re-sent)", lost),
+        ("first reply created", statuses["created"]),
+        ("first reply duplicate", statuses["duplicate"]),
+        ("first reply error", statuses["error"]),
+    ])
+    report("database after the queue drained", [
+        ("valid entries", expected),
+        ("rows added", rows_added),
+        ("client ids stored", after[2] - before[2]),
+        ("duplicate rows", rows_added - expected),
+    ])
+    report("upload size and latency", [
+        ("JSON (KB)", f"{raw_bytes / 1024:.1f}"),
+        ("gzip (KB)", f"{gzip_bytes / 1024:.1f}"),
+        ("batch p50 / p95 (ms)", f"{percentile_ms(times, 0.5)} / {percentile_ms(times, 0.95)}"),
+        ("ms per entry (p50)", f"{percentile_ms(times, 0.5) / min(args.batch, len(entries)):.3f}"),
+    ])
+    if rows_added != expected:
+        raise SystemExit("retries created duplicate or missing rows")
+
+
+# =========================
+# CLI
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="SEGAK performance benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load = sub.add_parser("load", help="concurrent teacher sessions")
+    load.add_argument("--sessions", type=int, default=20)
+    load.add_argument("--ops", type=int, default=200)
+    load.add_argument("--write-every", type=int, default=5)
+    load.set_defaults(func=bench_load)
+
+    plans = sub.add_parser("plans", help="EXPLAIN QUERY PLAN for every route query")
+    plans.set_defaults(func=bench_plans)
+
+    exp = sub.add_parser("export", help="stream a large BMI CSV export")
+    exp.add_argument("--rows", type=int, default=100000)
+    exp.set_defaults(func=bench_export)
+
+    imp = sub.add_parser("import", help="bulk CSV import of SEGAK rows")
+    imp.add_argument("--rows", type=int, default=10000)
+    imp.set_defaults(func=bench_import)
+
+    recl = sub.add_parser("reclassify", help="recompute every BMI/SEGAK status")
+    recl.add_argument("--rows", type=int, default=100000)
+    recl.set_defaults(func=bench_reclassify)
+
+    dash = sub.add_parser("dashboard", help="dashboard counts at school scale")
+    dash.add_argument("--students", type=int, default=100000)
+    dash.add_argument("--classes", type=int, default=40)
+    dash.add_argument("--repeat", type=int, default=20)
+    dash.set_defaults(func=bench_dashboard)
+
+    pay = sub.add_parser("payload", help="add_bmi/add_segak HTML size and roster API")
+    pay.add_argument("--students", type=int, default=2000)
+    pay.add_argument("--classes", type=int, default=40)
+    pay.set_defaults(func=bench_payload)
+
+    rep = sub.add_parser("reports", help="bulk report cards for many classes")
+    rep.add_argument("--students", type=int, default=2000)
+    rep.add_argument("--classes", type=int, default=40)
+    rep.set_defaults(func=bench_reports)
+
+    prog = sub.add_parser("progress", help="student progress triggers and cohort percentiles")
+    prog.add_argument("--students", type=int, default=50000)
+    prog.add_argument("--classes", type=int, default=1500)
+    prog.add_argument("--tests", type=int, default=4)
+    prog.add_argument("--repeat", type=int, default=20)
+    prog.set_defaults(func=bench_progress)
+
+    serve = sub.add_parser("serve", help="requests/sec over HTTP: dev server vs threaded vs gunicorn")
+    serve.add_argument("--students", type=int, default=2000)
+    serve.add_argument("--classes", type=int, default=40)
+    serve.add_argument("--clients", type=int, default=8)
+    serve.add_argument("--seconds", type=float, default=5)
+    serve.add_argument("--workers", type=int, default=(os.cpu_count() or 1) * 2 + 1)
+    serve.add_argument("--threads", type=int, default=4)
+    serve.set_defaults(func=bench_serve)
+
+    met = sub.add_parser("metrics", help="overhead of query/route instrumentation and cProfile sampling")
+    met.add_argument("--students", type=int, default=2000)
+    met.add_argument("--classes", type=int, default=40)
+    met.add_argument("--rounds", type=int, default=20)
+    met.add_argument("--repeat", type=int, default=3)
+    met.add_argument("--sample", type=float, default=0.01)
+    met.add_argument("--child", type=int, default=0, help=argparse.SUPPRESS)
+    met.set_defaults(func=bench_metrics)
+
+    login = sub.add_parser("login", help="logins/sec when a whole class signs in at once")
+    login.add_argument("--students", type=int, default=40)
+    login.add_argument("--attackers", type=int, default=8)
+    login.add_argument("--attack-interval", type=float, default=0.25, help="seconds between one attacker's attempts")
+    login.set_defaults(func=bench_login)
+
+    seg = sub.add_parser("segak", help="flat segak_record vs segak_test/segak_detail reads")
+    seg.add_argument("--preset", choices=("school", "district"), default="school")
+    seg.add_argument("--database", help="use a copy of an existing (generated) database instead")
+    seg.add_argument("--seed", type=int, default=1)
+    seg.add_argument("--repeat", type=int, default=20)
+    seg.set_defaults(func=bench_segak)
+
+    chg = sub.add_parser("changes", help="nightly sync: full database copy vs /changes?since= delta")
+    chg.add_argument("--preset", choices=("school", "district"), default="school")
+    chg.add_argument("--database", help="use a copy of an existing (generated) database instead")
+    chg.add_argument("--seed", type=int, default=1)
+    chg.add_argument("--classes", type=int, default=5, help="classes tested during the simulated day")
+    chg.add_argument("--rows", type=int, default=2000, help="rows per table for the write-cost test")
+    chg.set_defaults(func=bench_changes)
+
+    shd = sub.add_parser("shards", help="one database per school: concurrent writes and district fan-out")
+    shd.add_argument("--database", help="split a copy of an existing (generated) database instead")
+    shd.add_argument("--schools", type=int, default=10, help="schools in the generated district")
+    shd.add_argument("--seed", type=int, default=1)
+    shd.add_argument("--writers", type=int, default=8, help="schools writing at the same time")
+    shd.add_argument("--seconds", type=float, default=3)
+    shd.add_argument("--repeat", type=int, default=20)
+    shd.set_defaults(func=bench_shards)
+
+    bak = sub.add_parser("backup", help="writer stalls during an online snapshot of a large database")
+    bak.add_argument("--database", help="pad a copy of an existing (generated) database instead")
+    bak.add_argument("--seed", type=int, default=1)
+    bak.add_argument("--size-mb", type=int, default=1024, help="database size after padding")
+    bak.add_argument("--writers", type=int, default=4)
+    bak.add_argument("--pages", type=int, default=1024, help="pages per backup step")
+    bak.set_defaults(func=bench_backup)
+
+    srch = sub.add_parser("search", help="student search latency: prefix, class and misspelt names")
+    srch.add_argument("--preset", choices=("school", "district"), default="district")
+    srch.add_argument("--database", help="use a copy of an existing (generated) database instead")
+    srch.add_argument("--seed", type=int, default=1)
+    srch.add_argument("--queries", type=int, default=300, help="sampled students per query kind")
+    srch.set_defaults(func=bench_search)
+
+    lat = sub.add_parser("latest", help="latest record per student: status overview, print lookup, insert cost")
+    lat.add_argument("--preset", choices=("school", "district"), default="school")
+    lat.add_argument("--database", help="use a copy of an existing (generated) database instead")
+    lat.add_argument("--seed", type=int, default=1)
+    lat.add_argument("--students", type=int, default=500, help="students sampled for lookups and inserts")
+    lat.add_argument("--repeat", type=int, default=5)
+    lat.set_defaults(func=bench_latest)
+
+    cap = sub.add_parser("capture", help="offline capture: batched gzip uploads from a stub client with lost replies")
+    cap.add_argument("--preset", choices=("school", "district"), default="school")
+    cap.add_argument("--database", help="use a copy of an existing (generated) database instead")
+    cap.add_argument("--seed", type=int, default=1)
+    cap.add_argument("--entries", type=int, default=2000)
+    cap.add_argument("--batch", type=int, default=200, help="entries per upload")
+    cap.add_argument("--drop", type=float, default=0.2, help="share of requests that never reach the server")
+    cap.add_argument("--lose", type=float, default=0.3, help="share of replies lost after the server commits")
+    cap.add_argument("--invalid", type=float, default=0.02, help="share of entries for an unknown student")
+    cap.set_defaults(func=bench_capture)
+
+    routes = sub.add_parser("routes", help="p50/p95, queries and memory for every route, saved as JSON")
+    routes.add_argument("--preset", choices=("school", "district"), default="school")
+    routes.add_argument("--database", help="use a copy of an existing (generated) database instead")
+    routes.add_argument("--seed", type=int, default=1)
+    routes.add_argument("--requests", type=int, default=30)
+    routes.add_argument("--only", help="run routes whose label contains this text")
+    routes.add_argument("--output", help="JSON file (default bench_results/routes-<preset>-<commit>.json)")
+    routes.add_argument("--compare", help="earlier JSON result to compare against")
+    routes.add_argument("--threshold", type=float, default=25, help="p50 slowdown (%%) counted as a regression")
+    routes.set_defaults(func=bench_routes)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
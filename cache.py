@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import OrderedDict
+
+# =========================
+# CACHE DATA RUJUKAN
+# =========================
+# Senarai kelas, roster pelajar dan keputusan setiap pelajar jarang
+# berubah tetapi dibaca hampir setiap request. Cache ini simpan dalam
+# memori process (LRU + TTL).
+#
+# Invalidation: setiap entri disimpan bersama versi dari jadual
+# cache_version. Trigger (migration 5) naikkan versi bila kelas, pelajar
+# atau rekod BMI/SEGAK berubah -- sama ada dari route, import CSV atau
+# CLI. Versi dibaca dari DB (satu lookup primary key), jadi worker
+# gunicorn lain nampak perubahan serta-merta tanpa perlu mesej antara
+# process. TTL hanya had atas umur entri.
+#
+# Dengan shard (shards.py), setiap fail DB ada cache_version sendiri:
+# kunci entri termasuk fail DB connection (db.Connection.path).
+MAX_ENTRIES = 512
+TTL_SECONDS = 300
+
+
+class TTLCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                stored_version, expires, value = entry
+                if stored_version == version and expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+                self.stale += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key, version, value):
+        with self.lock:
+            self.entries[key] = (version, time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+_cache = TTLCache()
+
+
+def versions(conn, scopes):
+    # skop yang belum pernah berubah tiada baris -> versi 0
+    found = dict(conn.execute(
+        f"SELECT name, version FROM cache_version WHERE name IN ({', '.join('?' * len(scopes))})",
+        scopes
+    ))
+    return tuple(found.get(scope, 0) for scope in scopes)
+
+
+def cached(conn, key, scopes, loader):
+    # versi dibaca SEBELUM data: tulisan serentak hanya buat entri
+    # dianggap lama pada request seterusnya, tak pernah sebaliknya
+    version = versions(conn, scopes)
+    key = (getattr(conn, "path", None), key)
+    found, value = _cache.get(key, version)
+    if not found:
+        value = loader()
+        _cache.put(key, version, value)
+    return value
+
+
+def stats():
+    return _cache.stats()
+
+
+def clear():
+    _cache.clear()
+
+
+# =========================
+# DATA YANG DICACHE
+# =========================
+def class_list(conn):
+    return cached(conn, "classes", ("classes",), lambda: conn.execute(
+        "SELECT class_id, class_name FROM class ORDER BY class_name"
+    ).fetchall())
+
+
+def class_roster(conn, class_id):
+    return cached(conn, ("roster", class_id), ("roster",), lambda: conn.execute("""
+        SELECT s.student_id, s.name, s.gender, s.age,
+               c.class_name AS class
+        FROM student s
+        JOIN class c ON s.class_id = c.class_id
+        WHERE s.class_id = ?
+        ORDER BY s.name
+    """, (class_id,)).fetchall())
+
+
+def principal(conn, role, user_id):
+    # nama (dan kelas pelajar) untuk header setiap halaman; pelajar dicache
+    # ikut versi pelajar & kelas, jadi edit_student / tukar nama kelas terus
+    # kelihatan. Guru: satu lookup primary key (tiada trigger versi guru)
+    if role == "teacher":
+        row = conn.execute(
+            "SELECT name, NULL AS class_name FROM teacher WHERE teacher_id = ?", (user_id,)
+        ).fetchone()
+        return row
+
+    student_id = int(user_id)
+    return cached(
+        conn, ("principal", student_id),
+        (f"student:{student_id}", "classes"),
+        lambda: conn.execute("""
+            SELECT s.name, c.class_name
+            FROM student s
+            LEFT JOIN class c ON s.class_id = c.class_id
+            WHERE s.student_id = ?
+        """, (student_id,)).fetchone()
+    )
+
+
+def student_results(conn, student_id):
+    # maklumat pelajar + semua rekod BMI/SEGAK, terbaru dahulu
+    def load():
+        student = conn.execute("""
+            SELECT s.student_id, s.name, s.gender, s.age, c.class_name AS class
+            FROM student s
+            LEFT JOIN class c ON s.class_id = c.class_id
+            WHERE s.student_id = ?
+        """, (student_id,)).fetchone()
+
+        bmi = conn.execute("""
+            SELECT record_date, height, weight, bmi_value, bmi_status
+            FROM bmi_record
+            WHERE student_id = ?
+            ORDER BY record_date DESC
+        """, (student_id,)).fetchall()
+
+        segak = conn.execute("""
+            SELECT test_date, step_test, push_up, sit_up, sit_reach, fitness_level
+            FROM segak_record
+            WHERE student_id = ?
+            ORDER BY test_date DESC
+        """, (student_id,)).fetchall()
+
+        return {"student": student, "bmi": bmi, "segak": segak}
+
+    student_id = int(student_id)
+    return cached(
+        conn, ("student", student_id),
+        (f"student:{student_id}", "classes"),
+        load
+    )
@@ -0,0 +1,201 @@
+import json
+import zlib
+
+import fitness
+import importer
+
+# =========================
+# RAKAMAN LUAR TALIAN (MUAT NAIK KUMPULAN)
+# =========================
+# Halaman /capture/ simpan setiap rekod dalam IndexedDB browser dengan id
+# klien (UUID), kemudian hantar beberapa rekod sekali gus (gzip) ke
+# POST /api/entries bila rangkaian ada. Satu kumpulan = satu transaction:
+# - id yang sudah diterima (jadual client_entry) dipulangkan sebagai
+#   "duplicate" bersama id rekod asal, tanpa insert kali kedua;
+# - rekod yang salah dipulangkan sebagai "error" dan tidak disimpan;
+# - rekod lain dimasukkan, bersama id kliennya, sebelum satu commit.
+# Jika jawapan hilang, browser hantar semula kumpulan yang sama dan
+# mendapat keputusan yang sama.
+MAX_ENTRIES = 500
+# had saiz JSON selepas dinyahmampat (gzip boleh mampat 1000x)
+MAX_BODY_BYTES = 2 * 1024 * 1024
+MAX_CLIENT_ID = 64
+
+KINDS = ("bmi", "segak")
+
+
+class BatchRejected(ValueError):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def read_body(data, encoding):
+    # bytes permintaan -> senarai rekod; BatchRejected jika tidak sah
+    if encoding == "gzip":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = inflater.decompress(data, MAX_BODY_BYTES)
+        except zlib.error:
+            raise BatchRejected(400, "body is not valid gzip")
+        if inflater.unconsumed_tail:
+            raise BatchRejected(413, f"body larger than {MAX_BODY_BYTES} bytes")
+        if not inflater.eof:
+            # terputus di tengah jalan
+            raise BatchRejected(400, "body is not valid gzip")
+    elif encoding:
+        raise BatchRejected(415, f"unsupported Content-Encoding: {encoding}")
+
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        raise BatchRejected(400, "body is not valid JSON")
+    entries = payload.get("entries") if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        raise BatchRejected(400, 'expected {"entries": [{...}, ...]}')
+    if len(entries) > MAX_ENTRIES:
+        raise BatchRejected(413, f"at most {MAX_ENTRIES} entries per batch")
+    return entries
+
+
+# =========================
+# ID KLIEN
+# =========================
+def known(conn, client_ids):
+    # client_id -> (kind, row_id) bagi id yang sudah diterima
+    found = {}
+    client_ids = list(client_ids)
+    for i in range(0, len(client_ids), MAX_ENTRIES):
+        chunk = client_ids[i:i + MAX_ENTRIES]
+        found.update(
+            (r[0], (r[1], r[2])) for r in conn.execute(
+                f"SELECT client_id, kind, row_id FROM client_entry"
+                f" WHERE client_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+        )
+    return found
+
+
+def remember(conn, rows, teacher_id):
+    # rows: (client_id, kind, row_id, student_id)
+    conn.executemany(
+        "INSERT INTO client_entry (client_id, kind, row_id, student_id, teacher_id)"
+        " VALUES (?, ?, ?, ?, ?)",
+        ((client_id, kind, row_id, student_id, teacher_id)
+         for client_id, kind, row_id, student_id in rows)
+    )
+
+
+def claim(conn, client_id, kind, row_id, student_id, teacher_id):
+    # satu rekod dari form Add BMI / Add SEGAK, dalam transaction insert itu.
+    # False = id sudah diterima (form dihantar semula): pemanggil rollback
+    return conn.execute(
+        "INSERT OR IGNORE INTO client_entry (client_id, kind, row_id, student_id, teacher_id)"
+        " VALUES (?, ?, ?, ?, ?)",
+        (client_id, kind, row_id, student_id, teacher_id)
+    ).rowcount == 1
+
+
+def prune(conn, days):
+    # id klien hanya perlu selagi browser mungkin hantar semula
+    return conn.execute(
+        "DELETE FROM client_entry WHERE received_at < datetime('now', ?)", (f"-{int(days)} days",)
+    ).rowcount
+
+
+# =========================
+# SATU KUMPULAN
+# =========================
+def student_lookups(conn, entries):
+    # hanya pelajar dalam kumpulan ini (bukan seluruh sekolah)
+    ids = set()
+    for entry in entries:
+        try:
+            ids.add(int(entry.get("student_id")))
+        except (TypeError, ValueError):
+            pass
+    ids = list(ids)
+    students = {}
+    for i in range(0, len(ids), MAX_ENTRIES):
+        chunk = ids[i:i + MAX_ENTRIES]
+        students.update(
+            (r[0], (r[1], r[2])) for r in conn.execute(
+                f"SELECT student_id, gender, age FROM student"
+                f" WHERE student_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+        )
+    return {"students": students}
+
+
+def insert_kind(conn, kind, chunk, lookups, teacher_id):
+    # chunk: [(client_id, nilai parse)] -> [id rekod baru]
+    prepared = importer.classify_chunk(conn, kind, chunk, lookups)
+    rows = [values for _, values in prepared]
+    if kind == "segak":
+        # kunci tulis sudah dipegang: id diperuntuk terus (sama seperti import)
+        first_id = importer.next_segak_id(conn)
+        rows = [(first_id + i,) + tuple(row)[1:] for i, row in enumerate(rows)]
+        return fitness.insert_tests(conn, rows, teacher_id=teacher_id)
+    return [conn.execute(importer.INSERT_SQL[kind], row).lastrowid for row in rows]
+
+
+def apply_batch(conn, entries, teacher_id):
+    # pulang satu keputusan bagi setiap rekod, ikut susunan entries
+    results = [None] * len(entries)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        client_ids = [e.get("client_id") for e in entries]
+        seen = known(conn, (c for c in client_ids if isinstance(c, str)))
+        lookups = student_lookups(conn, entries)
+
+        chunks = {kind: [] for kind in KINDS}
+        positions = {kind: [] for kind in KINDS}
+        for i, entry in enumerate(entries):
+            client_id = client_ids[i]
+            if not isinstance(client_id, str) or not 0 < len(client_id) <= MAX_CLIENT_ID:
+                results[i] = {"client_id": client_id, "status": "error",
+                              "error": "client_id is required"}
+                continue
+            if client_id in seen:
+                kind, row_id = seen[client_id]
+                results[i] = {"client_id": client_id, "status": "duplicate", "kind": kind, "id": row_id}
+                continue
+            kind = entry.get("kind")
+            if kind not in KINDS:
+                results[i] = {"client_id": client_id, "status": "error",
+                              "error": f"kind must be one of {', '.join(KINDS)}"}
+                continue
+            # nilai sebagai teks, sama seperti baris CSV import
+            row = {k: "" if v is None else str(v) for k, v in entry.items()}
+            try:
+                values = importer.PARSERS[kind](row, lookups)
+            except importer.RowError as e:
+                results[i] = {"client_id": client_id, "status": "error", "error": str(e)}
+                continue
+            # id sama dua kali dalam kumpulan: yang pertama disimpan
+            seen[client_id] = (kind, None)
+            chunks[kind].append((client_id, values))
+            positions[kind].append(i)
+
+        created = []
+        for kind in KINDS:
+            if not chunks[kind]:
+                continue
+            ids = insert_kind(conn, kind, chunks[kind], lookups, teacher_id)
+            for i, (client_id, values), row_id in zip(positions[kind], chunks[kind], ids):
+                seen[client_id] = (kind, row_id)
+                created.append((client_id, kind, row_id, values[0]))
+                results[i] = {"client_id": client_id, "status": "created", "kind": kind, "id": row_id}
+        remember(conn, created, teacher_id)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    for i, result in enumerate(results):
+        if result["status"] == "duplicate" and result["id"] is None:
+            kind, row_id = seen[result["client_id"]]
+            result.update(kind=kind, id=row_id)
+    return results
@@ -0,0 +1,41 @@
+// =========================
+// SERVICE WORKER: RAKAMAN LUAR TALIAN
+// =========================
+// Didaftar oleh /capture/ (skop /capture/). Setiap GET dari halaman itu
+// (halaman, roster kelas, CSS, gambar) cuba rangkaian dahulu dan salinan
+// disimpan; bila rangkaian putus, salinan terakhir digunakan. POST tidak
+// disentuh: rekod menunggu dalam IndexedDB halaman sehingga dimuat naik.
+const CACHE = "segak-capture-v1";
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(
+                names.filter((name) => name !== CACHE).map((name) => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener("fetch", (event) => {
+    const request = event.request;
+    if (request.method !== "GET" || new URL(request.url).origin !== self.location.origin) {
+        return;
+    }
+
+    event.respondWith(
+        fetch(request)
+            .then((response) => {
+                // halaman log masuk (sesi tamat) tidak disimpan sebagai halaman ini
+                if (response.ok && !response.redirected) {
+                    const copy = response.clone();
+                    caches.open(CACHE).then((cache) => cache.put(request, copy));
+                }
+                return response;
+            })
+            .catch(() => caches.match(request, {ignoreVary: true})
+                .then((cached) => cached || Response.error()))
+    );
+});
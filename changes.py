@@ -0,0 +1,143 @@
+import db
+from migrations import ARCHIVED_TABLES, table_columns
+
+# =========================
+# SUAPAN PERUBAHAN (/changes?since=<seq>)
+# =========================
+# change_log diisi oleh trigger (migration 10). Sistem hiliran simpan seq
+# terakhir yang diterima dan minta baris selepasnya sahaja. Setiap baris
+# dibina sebagai JSON oleh SQLite (json_object), satu baris setiap
+# perubahan (NDJSON), dan distrim terus ke response.
+CHUNK_ROWS = 1000
+
+CHANGE_JSON_SQL = """
+    SELECT json_object(
+        'seq', seq, 'table', table_name, 'op', op, 'id', row_id, 'at', changed_at,
+        'data', json(data), 'previous', json(previous)
+    )
+    FROM change_log
+    WHERE seq > ? AND seq <= ?
+    ORDER BY seq
+"""
+
+
+class ChangesPruned(Exception):
+    # seq yang diminta sudah dibuang oleh prune(): salinan penuh diperlukan
+    pass
+
+
+def feed_range(conn, since, limit=None):
+    # (since, head): baris seq > since hingga head, paling banyak limit baris
+    oldest, latest = conn.execute(
+        "SELECT MIN(seq), COALESCE(MAX(seq), 0) FROM change_log"
+    ).fetchone()
+    if oldest is None:
+        oldest = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) + 1 FROM sqlite_sequence WHERE name = 'change_log'"
+        ).fetchone()[0]
+    if since < oldest - 1:
+        raise ChangesPruned(oldest)
+
+    head = latest
+    if limit is not None:
+        # kunci utama: seq ke-limit selepas since tanpa imbas log
+        row = conn.execute(
+            "SELECT seq FROM change_log WHERE seq > ? ORDER BY seq LIMIT 1 OFFSET ?",
+            (since, limit - 1)
+        ).fetchone()
+        if row is not None:
+            head = row[0]
+    return max(since, 0), max(head, since)
+
+
+def stream_changes(path, since, head):
+    # Macam export.stream_csv: connection sendiri kerana response distrim
+    # selepas connection per-request ditutup.
+    conn = db.open_connection(path)
+    try:
+        cursor = conn.execute(CHANGE_JSON_SQL, (since, head))
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                break
+            yield "\n".join(row[0] for row in rows) + "\n"
+    finally:
+        conn.close()
+
+
+# =========================
+# RESTORE REKOD DIPADAM
+# =========================
+# Baris dikembalikan dari <jadual>_deleted dengan id asal (AUTOINCREMENT
+# tidak guna semula id, jadi tiada pertembungan). Anak yang dipadam oleh
+# cascade dalam statement yang sama (deleted_at sama) turut dikembalikan.
+# INSERT biasa: trigger ringkasan, progress, cache dan change_log berjalan.
+RESTORE_KINDS = {
+    # jenis: (jadual, kunci, [(jadual anak, kunci anak)])
+    "student": ("student", "student_id", [
+        ("student_user", "student_id"),
+        ("bmi_record", "student_id"),
+        ("segak_test", "student_id"),
+    ]),
+    "bmi": ("bmi_record", "bmi_id", []),
+    "segak": ("segak_test", "test_id", []),
+}
+
+# detail ikut ujian yang dikembalikan
+CHILD_DETAILS = {"segak_test": ("segak_detail", "test_id")}
+
+
+def _move_back(conn, table, where, params):
+    names = ", ".join(name for name, _ in table_columns(conn, table))
+    restored = conn.execute(
+        f"INSERT INTO {table} ({names}) SELECT {names} FROM {table}_deleted WHERE {where}",
+        params
+    ).rowcount
+    conn.execute(f"DELETE FROM {table}_deleted WHERE {where}", params)
+    return restored
+
+
+def restore(conn, kind, row_id):
+    # pulang {jadual: bilangan baris}; {} jika tiada dalam arkib
+    table, key, children = RESTORE_KINDS[kind]
+    row = conn.execute(
+        f"SELECT deleted_at FROM {table}_deleted WHERE {key} = ? ORDER BY deleted_at DESC LIMIT 1",
+        (row_id,)
+    ).fetchone()
+    if row is None:
+        return {}
+    deleted_at = row[0]
+
+    counts = {}
+    for child, child_key in [(table, key)] + children:
+        where = f"{child_key} = ? AND deleted_at = ?"
+        tests = []
+        if child in CHILD_DETAILS:
+            tests = [r[0] for r in conn.execute(
+                f"SELECT test_id FROM {child}_deleted WHERE {where}", (row_id, deleted_at)
+            )]
+        counts[child] = _move_back(conn, child, where, (row_id, deleted_at))
+        # detail yang dipadam bersama ujian (cascade)
+        for test_id in tests:
+            detail, detail_key = CHILD_DETAILS[child]
+            counts[detail] = counts.get(detail, 0) + _move_back(
+                conn, detail, f"{detail_key} = ? AND deleted_at = ?", (test_id, deleted_at)
+            )
+    return counts
+
+
+# =========================
+# PRUNE (RETENSI)
+# =========================
+def prune(conn, days):
+    # buang log dan arkib yang lebih lama daripada `days` hari
+    cutoff = f"-{int(days)} days"
+    counts = {"change_log": conn.execute(
+        "DELETE FROM change_log WHERE changed_at < datetime('now', ?)", (cutoff,)
+    ).rowcount}
+    for table in ARCHIVED_TABLES:
+        counts[f"{table}_deleted"] = conn.execute(
+            f"DELETE FROM {table}_deleted WHERE deleted_at < strftime('%Y-%m-%d %H:%M:%f', 'now', ?)",
+            (cutoff,)
+        ).rowcount
+    return counts
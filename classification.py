@@ -0,0 +1,133 @@
+from bisect import bisect_right
+
+import numpy as np
+
+# =========================
+# BMI STATUS & SEGAK FITNESS LEVEL
+# =========================
+# Satu sumber untuk peraturan klasifikasi. Ada dua API:
+#   - scalar  : satu rekod (form add/edit)
+#   - batch   : array NumPy (import CSV, reclassify semua rekod)
+# Kedua-duanya mesti beri jawapan yang sama untuk input yang sama.
+#
+# Kontrak unit: tinggi SENTIASA dalam meter bila masuk ke engine ini dan
+# bila disimpan dalam bmi_record.height. Input dari form/CSV ditukar
+# dengan to_metres() dahulu.
+
+BMI_THRESHOLDS = (18.5, 25, 30)
+BMI_LABELS = ("Underweight", "Normal", "Overweight", "Obese")
+
+FITNESS_LABELS = ("Poor", "Average", "Good", "Excellent")
+
+# jumlah skor SEGAK (4 aktiviti x skor 1-5 = 4..20) -> tahap kecergasan
+FITNESS_SCORE_THRESHOLDS = (9, 13, 17)
+
+# tiada pelajar setinggi 3 meter, jadi nilai lebih besar ialah cm
+MAX_HEIGHT_M = 3
+
+
+# =========================
+# UNIT
+# =========================
+def to_metres(height):
+    height = float(height)
+    return height / 100 if height > MAX_HEIGHT_M else height
+
+
+def to_metres_batch(heights):
+    heights = np.asarray(heights, dtype=float)
+    return np.where(heights > MAX_HEIGHT_M, heights / 100, heights)
+
+
+# =========================
+# SCALAR API
+# =========================
+def calculate_bmi(height_m, weight):
+    return round(weight / (height_m * height_m), 2)
+
+
+def bmi_status(bmi):
+    return BMI_LABELS[bisect_right(BMI_THRESHOLDS, bmi)]
+
+
+def fitness_from_total(total_score):
+    return FITNESS_LABELS[bisect_right(FITNESS_SCORE_THRESHOLDS, total_score)]
+
+
+def fitness_level(push_up, sit_up, sit_reach):
+    # ladder rata, hanya bila jantina/umur pelajar tiada untuk norma SEGAK
+    # PRIORITY: POOR
+    if push_up < 10 or sit_up < 10 or sit_reach < 2:
+        return "Poor"
+    # AVERAGE
+    elif push_up < 20 or sit_up < 20:
+        return "Average"
+    # GOOD
+    elif push_up < 25 or sit_up < 25:
+        return "Good"
+    # EXCELLENT
+    else:
+        return "Excellent"
+
+
+# =========================
+# BATCH API (NumPy)
+# =========================
+def bmi_batch(heights_m, weights):
+    heights_m = np.asarray(heights_m, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    bmi = np.round(weights / (heights_m * heights_m), 2)
+    status = np.asarray(BMI_LABELS)[np.searchsorted(BMI_THRESHOLDS, bmi, side="right")]
+    return bmi, status
+
+
+def fitness_from_total_batch(total_scores):
+    idx = np.searchsorted(FITNESS_SCORE_THRESHOLDS, np.asarray(total_scores), side="right")
+    return np.asarray(FITNESS_LABELS)[idx]
+
+
+def fitness_batch(push_up, sit_up, sit_reach):
+    push_up = np.asarray(push_up, dtype=float)
+    sit_up = np.asarray(sit_up, dtype=float)
+    sit_reach = np.asarray(sit_reach, dtype=float)
+
+    return np.select(
+        [
+            (push_up < 10) | (sit_up < 10) | (sit_reach < 2),
+            (push_up < 20) | (sit_up < 20),
+            (push_up < 25) | (sit_up < 25),
+        ],
+        FITNESS_LABELS[:3],
+        default=FITNESS_LABELS[3]
+    )
+
+
+# =========================
+# RECLASSIFY SEMUA REKOD BMI
+# =========================
+# (rekod SEGAK diskor semula oleh fitness.rescore_all)
+def reclassify_bmi(conn):
+    rows = conn.execute(
+        "SELECT bmi_id, height, weight, bmi_value, bmi_status FROM bmi_record"
+    ).fetchall()
+    if not rows:
+        return 0
+
+    ids, heights, weights, old_bmi, old_status = zip(*rows)
+    heights_m = to_metres_batch(heights)
+    bmi, status = bmi_batch(heights_m, weights)
+
+    # hanya rekod yang berubah ditulis semula
+    changed = (
+        (heights_m != np.asarray(heights, dtype=float))
+        | (bmi != np.asarray(old_bmi, dtype=float))
+        | (status != np.asarray(old_status, dtype=object))
+    )
+    idx = np.flatnonzero(changed)
+    conn.executemany(
+        "UPDATE bmi_record SET height = ?, bmi_value = ?, bmi_status = ? WHERE bmi_id = ?",
+        zip(heights_m[idx].tolist(), bmi[idx].tolist(), status[idx].tolist(),
+            np.asarray(ids)[idx].tolist())
+    )
+    return len(idx)
@@ -0,0 +1,261 @@
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+from werkzeug.security import generate_password_hash
+
+import db
+import fitness
+import norms
+from classification import bmi_batch
+from importer import next_segak_id
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.path.join(BASE_DIR, "segak.db")
+
+# =========================
+# DATA SINTETIK (SEKOLAH / DAERAH)
+# =========================
+# Isi skema sebenar (class, student, student_user, bmi_record,
+# segak_test/segak_detail) melalui laluan kod yang sama dengan app:
+# bmi_batch untuk status BMI, norms untuk skor SEGAK. Trigger
+# ringkasan/progress berjalan seperti biasa, jadi DB sedia untuk app.
+# Seed yang sama -> data yang sama.
+PRESETS = {
+    # satu sekolah: 35 kelas x 35 pelajar, 4 ujian (~10k rekod)
+    "school": {"schools": 1, "classes_per_form": 7, "class_size": 35, "cycles": 4},
+    # satu daerah: 50 sekolah, ~63k pelajar, 4 ujian (~500k rekod BMI + SEGAK)
+    "district": {"schools": 50, "classes_per_form": 7, "class_size": 36, "cycles": 4},
+}
+
+FORMS = (1, 2, 3, 4, 5)
+CLASS_NAMES = (
+    "Bestari", "Dedikasi", "Gemilang", "Harmoni", "Inovasi", "Jaya", "Kreatif",
+    "Lestari", "Murni", "Nilam", "Perdana", "Ria",
+)
+
+MALE_NAMES = (
+    "Ahmad", "Muhammad", "Aiman", "Haziq", "Irfan", "Danial", "Hakim", "Arif",
+    "Syafiq", "Zulkifli", "Amir", "Faris", "Wei Jie", "Jun Hao", "Arjun", "Kumar",
+)
+FEMALE_NAMES = (
+    "Nur", "Siti", "Aisyah", "Nurul", "Farah", "Alya", "Hani", "Balqis",
+    "Sofea", "Iman", "Damia", "Qistina", "Mei Ling", "Xin Yi", "Priya", "Kavitha",
+)
+FAMILY_NAMES = (
+    "Abdullah", "Ismail", "Hassan", "Rahman", "Yusof", "Ibrahim", "Osman", "Salleh",
+    "Aziz", "Hamid", "Tan", "Lim", "Wong", "Raj", "Muthu", "Kamal",
+)
+
+# satu hash untuk semua akaun pelajar sintetik (scrypt terlalu perlahan
+# untuk dikira 60k kali)
+DEFAULT_PASSWORD = "segak123"
+
+# baris setiap executemany / commit
+CHUNK = 5000
+
+
+def class_plan(schools, classes_per_form):
+    # "1 Bestari (SMK001)": tingkatan di depan supaya reports.year_of() berfungsi
+    return [
+        f"{form} {CLASS_NAMES[i % len(CLASS_NAMES)]}"
+        f"{'' if i < len(CLASS_NAMES) else ' ' + str(i // len(CLASS_NAMES) + 1)}"
+        f" (SMK{school:03d})"
+        for school in range(1, schools + 1)
+        for form in FORMS
+        for i in range(classes_per_form)
+    ]
+
+
+def cycle_date(rng, cycle, cycles, kind):
+    # dua ujian setahun (Mac, Ogos); ujian terakhir = Mac tahun semasa
+    ago = cycles - 1 - cycle
+    year = time.localtime().tm_year - (ago + 1) // 2
+    month = 3 if ago % 2 == 0 else 8
+    day = 10 + int(rng.integers(0, 10)) + (0 if kind == "bmi" else 5)
+    return f"{year}-{month:02d}-{day:02d}"
+
+
+def _chunks(rows):
+    rows = list(rows)
+    for start in range(0, len(rows), CHUNK):
+        yield rows[start:start + CHUNK]
+
+
+# =========================
+# KELAS, PELAJAR, AKAUN
+# =========================
+def add_students(conn, rng, schools, classes_per_form, class_size, password):
+    names = class_plan(schools, classes_per_form)
+    conn.executemany(
+        "INSERT OR IGNORE INTO class (class_name) VALUES (?)", ((n,) for n in names)
+    )
+    class_ids = dict(conn.execute("SELECT class_name, class_id FROM class"))
+
+    first = conn.execute("SELECT COALESCE(MAX(student_id), 0) + 1 FROM student").fetchone()[0]
+    students = []
+    for name in names:
+        form = int(name.split()[0])
+        for _ in range(class_size):
+            gender = ("Male", "Female")[int(rng.integers(0, 2))]
+            given = rng.choice(MALE_NAMES if gender == "Male" else FEMALE_NAMES)
+            family = rng.choice(FAMILY_NAMES)
+            link = "bin" if gender == "Male" else "binti"
+            # umur = tingkatan + 12, sebahagian kecil lewat setahun
+            age = form + 12 + int(rng.random() < 0.05)
+            students.append((
+                first + len(students), f"{given} {link} {family}", gender, age, class_ids[name]
+            ))
+
+    for chunk in _chunks(students):
+        conn.executemany(
+            "INSERT INTO student (student_id, name, gender, age, class_id) VALUES (?, ?, ?, ?, ?)",
+            chunk
+        )
+    conn.commit()
+
+    password_hash = generate_password_hash(password)
+    for chunk in _chunks(students):
+        conn.executemany(
+            "INSERT OR IGNORE INTO student_user (student_id, email, password) VALUES (?, ?, ?)",
+            ((s[0], f"student{s[0]}@moe-dl.edu.my", password_hash) for s in chunk)
+        )
+    conn.commit()
+    return students
+
+
+# =========================
+# REKOD BMI & SEGAK
+# =========================
+def add_bmi_cycle(conn, rng, students, cycle, cycles):
+    n = len(students)
+    ages = np.array([s[3] for s in students])
+    male = np.array([s[2] == "Male" for s in students])
+    # tinggi ikut umur/jantina, BMI ~ taburan sebenar remaja (sedikit condong kanan)
+    heights = np.clip(
+        1.30 + (ages - 12) * np.where(male, 0.06, 0.035) + rng.normal(0, 0.07, n)
+        + cycle * 0.015, 1.25, 1.95
+    ).round(2)
+    target_bmi = np.clip(rng.lognormal(np.log(21), 0.18, n), 13, 42)
+    weights = (target_bmi * heights * heights).round(1)
+    bmi, status = bmi_batch(heights, weights)
+
+    rows = [
+        (s[0], float(h), float(w), float(b), str(st), cycle_date(rng, cycle, cycles, "bmi"))
+        for s, h, w, b, st in zip(students, heights, weights, bmi, status)
+    ]
+    for chunk in _chunks(rows):
+        conn.executemany(
+            """
+            INSERT INTO bmi_record
+            (student_id, height, weight, bmi_value, bmi_status, record_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            chunk
+        )
+        conn.commit()
+    return len(rows)
+
+
+def add_segak_cycle(conn, rng, students, cycle, cycles, teacher_id):
+    n = len(students)
+    male = np.array([s[2] == "Male" for s in students])
+    # sedikit peningkatan setiap ujian supaya progress ada arah
+    step = np.clip(rng.normal(120 - cycle, 13, n), 80, 190).round()
+    push = np.clip(rng.normal(np.where(male, 20, 11) + cycle, 6, n), 0, 60).round()
+    sit = np.clip(rng.normal(17 + cycle * 0.5, 5, n), 0, 60).round()
+    reach = np.clip(rng.normal(np.where(male, 27, 30), 6, n), 5, 55).round(1)
+
+    genders = [s[2] for s in students]
+    ages = [s[3] for s in students]
+    index = norms.get_index(conn)
+    scores, totals, levels = norms.score_segak(index, genders, ages, step, push, sit, reach)
+
+    records = list(zip(
+        students, zip(step.astype(int).tolist(), push.astype(int).tolist(),
+                      sit.astype(int).tolist(), reach.tolist()),
+        scores, totals, levels
+    ))
+    for chunk in _chunks(records):
+        # kunci tulis dipegang supaya test_id boleh diperuntuk dahulu (macam importer)
+        conn.execute("BEGIN IMMEDIATE")
+        first_id = next_segak_id(conn)
+        fitness.insert_tests(conn, (
+            (first_id + i, s[0], cycle_date(rng, cycle, cycles, "segak"), level, total,
+             fitness.details(index.activity_ids, values, row_scores))
+            for i, (s, values, row_scores, total, level) in enumerate(chunk)
+        ), teacher_id=teacher_id)
+        conn.commit()
+    return len(records)
+
+
+# =========================
+# PENJANA
+# =========================
+def generate(conn, schools, classes_per_form, class_size, cycles, seed=1,
+             password=DEFAULT_PASSWORD, progress=print):
+    rng = np.random.default_rng(seed)
+    teacher = conn.execute("SELECT MIN(teacher_id) FROM teacher").fetchone()[0]
+    teacher_id = teacher if teacher is not None else norms.SYSTEM_TEACHER_ID
+
+    start = time.perf_counter()
+    students = add_students(conn, rng, schools, classes_per_form, class_size, password)
+    counts = {
+        "classes": schools * len(FORMS) * classes_per_form,
+        "students": len(students),
+        "bmi_records": 0,
+        "segak_records": 0,
+    }
+    progress(f"{counts['classes']} classes, {len(students)} students")
+
+    for cycle in range(cycles):
+        counts["bmi_records"] += add_bmi_cycle(conn, rng, students, cycle, cycles)
+        counts["segak_records"] += add_segak_cycle(conn, rng, students, cycle, cycles, teacher_id)
+        progress(f"test cycle {cycle + 1}/{cycles}: "
+                 f"{counts['bmi_records'] + counts['segak_records']} records")
+
+    conn.execute("PRAGMA optimize")
+    counts["seconds"] = round(time.perf_counter() - start, 1)
+    return counts
+
+
+def create(path, preset="school", seed=1, progress=print, **overrides):
+    # DB baru = salinan segak.db (guru, aktiviti, norma) + data sintetik
+    sizes = dict(PRESETS[preset], **{k: v for k, v in overrides.items() if v is not None})
+    shutil.copyfile(DATABASE, path)
+    conn = db.open_connection(path)
+    db.ensure_migrated(conn, path)
+    try:
+        counts = generate(conn, seed=seed, progress=progress, **sizes)
+    finally:
+        conn.close()
+    return dict(counts, preset=preset, seed=seed, **sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic SEGAK database")
+    parser.add_argument("preset", choices=sorted(PRESETS), nargs="?", default="school")
+    parser.add_argument("--output", default=os.path.join(BASE_DIR, "segak_synthetic.db"))
+    parser.add_argument("--schools", type=int)
+    parser.add_argument("--classes-per-form", type=int)
+    parser.add_argument("--class-size", type=int)
+    parser.add_argument("--cycles", type=int, help="BMI + SEGAK tests per student")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output) == DATABASE:
+        raise SystemExit("refusing to overwrite segak.db; choose another --output")
+
+    counts = create(
+        args.output, args.preset, seed=args.seed,
+        schools=args.schools, classes_per_form=args.classes_per_form,
+        class_size=args.class_size, cycles=args.cycles
+    )
+    print(f"wrote {args.output}: {counts}")
+    print(f"student logins: student<id>@moe-dl.edu.my / {DEFAULT_PASSWORD}")
+
+
+if __name__ == "__main__":
+    main()
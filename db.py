@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+from flask import g
+
+import migrations
+
+# =========================
+# SQLITE TUNING
+# =========================
+# WAL lets teachers read while another request is writing, and
+# busy_timeout makes writers wait for the lock instead of failing
+# with "database is locked".
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+
+# DB yang sudah dimigrate dalam process ini
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+class Connection(sqlite3.Connection):
+    # fail DB connection ini: cache.py asingkan entri ikut shard
+    path = None
+
+
+def open_connection(path, factory=Connection, shared=False):
+    # shared: connection dari pool, diguna oleh satu thread pada satu masa
+    conn = sqlite3.connect(path, timeout=5, factory=factory, check_same_thread=not shared)
+    conn.row_factory = sqlite3.Row
+    if isinstance(conn, Connection):
+        conn.path = path
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# =========================
+# CACHE CONNECTION SETIAP SHARD
+# =========================
+# Connection yang sudah dibuka (PRAGMA dijalankan, migration disemak)
+# dipulangkan ke pool fail DB itu selepas request dan diguna semula oleh
+# request seterusnya, dari mana-mana thread. Paling banyak POOL_IDLE
+# connection terbiar bagi setiap fail (shard); lebihan ditutup.
+POOL_IDLE = 4
+
+
+class ConnectionPool:
+    def __init__(self, path, factory, max_idle=POOL_IDLE):
+        self.path = path
+        self.factory = factory
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.opened = self.reused = 0
+
+    def acquire(self):
+        with self.lock:
+            if self.idle:
+                self.reused += 1
+                return self.idle.pop()
+            self.opened += 1
+        conn = open_connection(self.path, self.factory, shared=True)
+        try:
+            ensure_migrated(conn, self.path)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def release(self, conn):
+        if hasattr(conn, "stop_recording"):
+            conn.stop_recording()
+        # transaction yang belum commit dibuang, sama seperti close()
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self.lock:
+            if not self.closed and len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(path, factory=Connection):
+    # gunicorn fork: process anak buka connection sendiri (pid dalam kunci)
+    key = (os.getpid(), path, factory)
+    found = _pools.get(key)
+    if found is None:
+        with _pools_lock:
+            found = _pools.setdefault(key, ConnectionPool(path, factory))
+    return found
+
+
+def close_pools(path=None):
+    # cth. sebelum fail DB diganti; connection yang sedang diguna ditutup
+    # bila dipulangkan
+    with _pools_lock:
+        for key in [k for k in _pools if path is None or k[1] == path]:
+            _pools.pop(key).close()
+
+
+# =========================
+# PER-REQUEST CONNECTION
+# =========================
+def get_db(path, factory=Connection):
+    # satu connection dari pool untuk setiap request, dipulangkan oleh teardown
+    if "db" not in g:
+        g.db_pool = pool(path, factory)
+        g.db = g.db_pool.acquire()
+        # connection berinstrumen (metrics.py) mula rekod query selepas PRAGMA
+        if hasattr(g.db, "start_recording"):
+            g.db.start_recording()
+    return g.db
+
+
+def ensure_migrated(conn, path):
+    if path in _migrated:
+        return
+    with _migrate_lock:
+        if path not in _migrated:
+            migrations.migrate(conn)
+            _migrated.add(path)
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is None:
+        return
+    g.pop("db_pool").release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,91 @@
+import csv
+import io
+
+import db
+
+# =========================
+# BULK EXPORT (CSV)
+# =========================
+# Baris dibaca dari cursor SQLite secara berkumpulan (fetchmany) dan terus
+# ditulis ke response, jadi memori kekal kecil walaupun 100k+ baris.
+CHUNK_ROWS = 1000
+
+BMI_COLUMNS = [
+    "bmi_id", "student_id", "name", "class", "gender", "age",
+    "height", "weight", "bmi_value", "bmi_status", "record_date",
+]
+
+SEGAK_COLUMNS = [
+    "segak_id", "student_id", "name", "class", "gender", "age",
+    "step_test", "push_up", "sit_up", "sit_reach", "fitness_level", "test_date",
+]
+
+
+def export_filters(class_name, date_from, date_to, date_column):
+    where = []
+    params = {}
+    if class_name:
+        where.append("c.class_name = :class")
+        params["class"] = class_name
+    if date_from:
+        where.append(f"{date_column} >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        where.append(f"{date_column} <= :date_to")
+        params["date_to"] = date_to
+    return ("WHERE " + " AND ".join(where) if where else ""), params
+
+
+def bmi_export_query(class_name=None, date_from=None, date_to=None):
+    where, params = export_filters(class_name, date_from, date_to, "b.record_date")
+    sql = f"""
+        SELECT b.bmi_id, s.student_id, s.name, c.class_name AS class,
+               s.gender, s.age, b.height, b.weight, b.bmi_value,
+               b.bmi_status, b.record_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN bmi_record b ON b.student_id = s.student_id
+        {where}
+        ORDER BY c.class_name, s.name, s.student_id, b.record_date DESC, b.bmi_id
+    """
+    return sql, params
+
+
+def segak_export_query(class_name=None, date_from=None, date_to=None):
+    where, params = export_filters(class_name, date_from, date_to, "r.test_date")
+    sql = f"""
+        SELECT r.segak_id, s.student_id, s.name, c.class_name AS class,
+               s.gender, s.age, r.step_test, r.push_up, r.sit_up,
+               r.sit_reach, r.fitness_level, r.test_date
+        FROM class c
+        CROSS JOIN student s ON s.class_id = c.class_id
+        CROSS JOIN segak_record r ON r.student_id = s.student_id
+        {where}
+        ORDER BY c.class_name, s.name, s.student_id, r.test_date DESC, r.segak_id
+    """
+    return sql, params
+
+
+def stream_csv(path, sql, params, columns):
+    # Generator ini buka connection sendiri: response diteruskan selepas
+    # request tamat, jadi connection per-request (flask.g) sudah ditutup.
+    conn = db.open_connection(path)
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(columns)
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                break
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        conn.close()
@@ -0,0 +1,183 @@
+import numpy as np
+
+import norms
+
+# =========================
+# UJIAN SEGAK (segak_test + segak_detail)
+# =========================
+# Satu baris segak_test bagi setiap ujian dan satu baris segak_detail bagi
+# setiap aktiviti yang dicatat (migration 9). Semua tulisan melalui modul
+# ini; ringkasan kelas, versi cache dan progress dikemas kini oleh trigger.
+# View segak_record pivot empat aktiviti asal untuk route dan laporan.
+INSERT_TEST_SQL = """
+    INSERT INTO segak_test
+    (test_id, student_id, teacher_id, test_date, total_score, fitness_level)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_DETAIL_SQL = """
+    INSERT INTO segak_detail (test_id, activity_id, value_obtained, score)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (test_id, activity_id) DO UPDATE SET
+        value_obtained = excluded.value_obtained,
+        score = excluded.score
+"""
+
+
+def details(activity_ids, values, scores):
+    # (activity_id, nilai, skor) bagi aktiviti yang ada nilai; skor 0 = tiada norma
+    return [
+        (activity_id, value, score or None)
+        for activity_id, value, score in zip(activity_ids, values, scores)
+        if value is not None
+    ]
+
+
+def insert_tests(conn, tests, teacher_id=norms.SYSTEM_TEACHER_ID):
+    # tests: (test_id atau None, student_id, test_date, fitness_level, total_score, details)
+    # pulang test_id mengikut susunan tests
+    tests = list(tests)
+    if all(test[0] is not None for test in tests):
+        # id sudah diperuntuk (import / datagen): satu executemany
+        conn.executemany(INSERT_TEST_SQL, (
+            (test_id, student_id, teacher_id, test_date, total, level)
+            for test_id, student_id, test_date, level, total, _ in tests
+        ))
+        ids = [test[0] for test in tests]
+    else:
+        ids = [
+            conn.execute(
+                INSERT_TEST_SQL, (test_id, student_id, teacher_id, test_date, total, level)
+            ).lastrowid
+            for test_id, student_id, test_date, level, total, _ in tests
+        ]
+
+    conn.executemany(INSERT_DETAIL_SQL, (
+        (test_id, activity_id, value, score)
+        for test_id, test in zip(ids, tests)
+        for activity_id, value, score in test[5]
+    ))
+    return ids
+
+
+def update_test(conn, test_id, test_date, level, total, items):
+    # aktiviti yang tiada dalam items (cth. aktiviti tambahan) tidak disentuh
+    conn.execute(
+        """
+        UPDATE segak_test SET test_date = ?, fitness_level = ?, total_score = ?
+        WHERE test_id = ?
+        """,
+        (test_date, level, total, test_id)
+    )
+    conn.executemany(INSERT_DETAIL_SQL, (
+        (test_id, activity_id, value, score) for activity_id, value, score in items
+    ))
+
+
+def update_scores(conn, tests):
+    # tests: (test_id, fitness_level, total_score, [(activity_id, skor)]);
+    # hanya baris yang berubah ditulis (trigger tidak berjalan sia-sia)
+    tests = list(tests)
+    conn.executemany(
+        """
+        UPDATE segak_test SET fitness_level = ?, total_score = ?
+        WHERE test_id = ? AND (fitness_level IS NOT ? OR total_score IS NOT ?)
+        """,
+        ((level, total, test_id, level, total) for test_id, level, total, _ in tests)
+    )
+    conn.executemany(
+        """
+        UPDATE segak_detail SET score = ?
+        WHERE test_id = ? AND activity_id = ? AND score IS NOT ?
+        """,
+        (
+            (score, test_id, activity_id, score)
+            for test_id, _, _, scores in tests
+            for activity_id, score in scores
+        )
+    )
+
+
+# =========================
+# BACAAN: VEKTOR AKTIVITI
+# =========================
+# Semua aktiviti (termasuk yang ditambah kemudian) dipivot dalam satu
+# query berkumpulan: segak_detail disusun ikut test_id (WITHOUT ROWID),
+# jadi GROUP BY berjalan terus atas kunci utama tanpa sort. Hasil dalam bentuk lajur NumPy.
+def activities(conn):
+    return conn.execute(
+        "SELECT activity_id, activity_name FROM SEGAK_activity ORDER BY activity_id"
+    ).fetchall()
+
+
+def vector_sql(activity_ids, where=""):
+    pivot = ", ".join(
+        f"MAX(CASE WHEN d.activity_id = {int(a)} THEN d.value_obtained END), "
+        f"MAX(CASE WHEN d.activity_id = {int(a)} THEN d.score END)"
+        for a in activity_ids
+    )
+    return f"""
+        SELECT t.test_id, t.student_id, t.test_date, t.total_score, t.fitness_level, {pivot}
+        FROM segak_test t
+        LEFT JOIN segak_detail d ON d.test_id = t.test_id
+        {where}
+        GROUP BY t.test_id
+        ORDER BY t.test_id
+    """
+
+
+def test_vectors(conn, class_id=None):
+    # pulang dict: test_id, student_id, test_date, total_score, fitness_level,
+    # activities [(id, nama)], values (n x aktiviti, NaN = tiada), scores (0 = tiada)
+    listed = activities(conn)
+    where, params = "", ()
+    if class_id is not None:
+        where = "WHERE t.student_id IN (SELECT student_id FROM student WHERE class_id = ?)"
+        params = (class_id,)
+    rows = conn.execute(vector_sql([a[0] for a in listed], where), params).fetchall()
+
+    k = len(listed)
+    data = np.array(
+        [tuple(row)[5:] for row in rows], dtype=float
+    ).reshape(len(rows), 2 * k)
+    columns = list(zip(*rows)) if rows else [()] * 5
+    return {
+        "test_id": np.array(columns[0], dtype=np.int64),
+        "student_id": np.array(columns[1], dtype=np.int64),
+        "test_date": list(columns[2]),
+        "total_score": list(columns[3]),
+        "fitness_level": list(columns[4]),
+        "activities": [tuple(a) for a in listed],
+        "values": data[:, 0::2],
+        "scores": np.nan_to_num(data[:, 1::2]).astype(np.int8),
+    }
+
+
+# =========================
+# SKOR SEMULA SEMUA UJIAN
+# =========================
+def rescore_all(conn):
+    index = norms.get_index(conn)
+    tests = test_vectors(conn)
+    if not len(tests["test_id"]):
+        return 0
+
+    students = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute("SELECT student_id, gender, age FROM student")
+    }
+    genders, ages = zip(*(students.get(sid, (None, None)) for sid in tests["student_id"].tolist()))
+    # lajur nilai bagi empat aktiviti bernorma (NaN jika aktiviti tiada)
+    position = {activity_id: i for i, (activity_id, _) in enumerate(tests["activities"])}
+    missing = np.full(len(tests["test_id"]), np.nan)
+    columns = [
+        tests["values"][:, position[a]] if a in position else missing
+        for a in index.activity_ids
+    ]
+    scores, totals, levels = norms.score_segak(index, genders, ages, *columns)
+
+    update_scores(conn, (
+        (test_id, level, total, list(zip(index.activity_ids, (s or None for s in row))))
+        for test_id, level, total, row in zip(tests["test_id"].tolist(), levels, totals, scores)
+    ))
+    return sum(level != old for level, old in zip(levels, tests["fitness_level"]))
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# =========================
+# GUNICORN (PRODUCTION)
+# =========================
+# gunicorn -c gunicorn.conf.py wsgi:app
+# Setiap worker process ada connection SQLite dan worker job sendiri,
+# jadi app TIDAK dimuat sebelum fork (preload_app = False).
+bind = os.environ.get("SEGAK_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("SEGAK_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# app.py bahagi pool hash kata laluan ikut bilangan worker
+raw_env = [f"SEGAK_WORKERS={workers}"]
+# gthread: beberapa request serentak bagi setiap worker (I/O SQLite, hashing)
+worker_class = "gthread"
+threads = int(os.environ.get("SEGAK_THREADS", 4))
+keepalive = 5
+timeout = 60
+preload_app = False
+# SEGAK_ACCESS_LOG= (kosong) matikan access log
+accesslog = os.environ.get("SEGAK_ACCESS_LOG", "-") or None
@@ -0,0 +1,259 @@
+import csv
+import datetime
+import sqlite3
+
+import fitness
+import norms
+from classification import bmi_batch, to_metres
+
+# =========================
+# BULK CSV IMPORT
+# =========================
+# Setiap baris disemak dahulu; baris yang salah direkod sebagai error dan
+# baris lain tetap dimasukkan. Insert dibuat dengan executemany, satu
+# transaction bagi setiap chunk.
+CHUNK_ROWS = 5000
+
+KINDS = ("student", "bmi", "segak")
+
+COLUMNS = {
+    "student": ["name", "gender", "age", "class"],
+    "bmi": ["student_id", "height", "weight", "record_date"],
+    "segak": ["student_id", "test_date", "step_test", "push_up", "sit_up", "sit_reach"],
+}
+
+INSERT_SQL = {
+    "student": """
+        INSERT INTO student (name, gender, age, class_id)
+        VALUES (?, ?, ?, ?)
+    """,
+    "bmi": """
+        INSERT INTO bmi_record
+        (student_id, height, weight, bmi_value, bmi_status, record_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, kind):
+        self.kind = kind
+        self.inserted = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+# =========================
+# FIELD VALIDATION
+# =========================
+def required(row, field):
+    value = (row.get(field) or "").strip()
+    if not value:
+        raise RowError(f"{field} is required")
+    return value
+
+
+def number(row, field, cast=float, minimum=0):
+    value = required(row, field)
+    try:
+        value = cast(value)
+    except ValueError:
+        raise RowError(f"{field} must be a number")
+    if value < minimum:
+        raise RowError(f"{field} must be at least {minimum}")
+    return value
+
+
+def date_field(row, field):
+    value = required(row, field)
+    try:
+        datetime.date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{field} must be YYYY-MM-DD")
+    return value
+
+
+def student_ref(row, student_ids):
+    student_id = number(row, "student_id", int, 1)
+    if student_id not in student_ids:
+        raise RowError(f"student_id {student_id} does not exist")
+    return student_id
+
+
+# =========================
+# ROW PARSERS
+# =========================
+def parse_student(row, lookups):
+    class_name = required(row, "class")
+    if class_name not in lookups["classes"]:
+        raise RowError(f"class '{class_name}' does not exist")
+
+    gender = required(row, "gender").capitalize()
+    if gender not in ("Male", "Female"):
+        raise RowError("gender must be Male or Female")
+
+    return (
+        required(row, "name"),
+        gender,
+        number(row, "age", int, 1),
+        lookups["classes"][class_name],
+    )
+
+
+def parse_bmi(row, lookups):
+    # tinggi dalam cm (sama macam form Add BMI), disimpan dalam meter
+    return (
+        student_ref(row, lookups["students"]),
+        to_metres(number(row, "height", float, 0.5)),
+        number(row, "weight", float, 1),
+        date_field(row, "record_date"),
+    )
+
+
+def parse_segak(row, lookups):
+    return (
+        student_ref(row, lookups["students"]),
+        date_field(row, "test_date"),
+        number(row, "step_test", int),
+        number(row, "push_up", int),
+        number(row, "sit_up", int),
+        number(row, "sit_reach", float),
+    )
+
+
+PARSERS = {
+    "student": parse_student,
+    "bmi": parse_bmi,
+    "segak": parse_segak,
+}
+
+
+def load_lookups(conn, kind):
+    if kind == "student":
+        return {"classes": dict(conn.execute("SELECT class_name, class_id FROM class"))}
+    # student_id -> (gender, age) untuk norma SEGAK
+    return {"students": {
+        r[0]: (r[1], r[2])
+        for r in conn.execute("SELECT student_id, gender, age FROM student")
+    }}
+
+
+# =========================
+# IMPORT PIPELINE
+# =========================
+def classify_chunk(conn, kind, chunk, lookups):
+    # BMI status / fitness level dikira sekali untuk seluruh chunk
+    lines = [line for line, _ in chunk]
+    rows = [values for _, values in chunk]
+
+    if kind == "bmi":
+        student_ids, heights, weights, dates = zip(*rows)
+        bmi, status = bmi_batch(heights, weights)
+        rows = zip(student_ids, heights, weights, bmi.tolist(), status.tolist(), dates)
+    elif kind == "segak":
+        student_ids, dates, step, push, sit, reach = zip(*rows)
+        genders, ages = zip(*(lookups["students"][sid] for sid in student_ids))
+        index = norms.get_index(conn)
+        scores, totals, levels = norms.score_segak(index, genders, ages, step, push, sit, reach)
+        # baris fitness.insert_tests; test_id diberi semasa insert (lihat next_segak_id)
+        rows = [
+            (None, sid, date, level, total, fitness.details(index.activity_ids, values, row_scores))
+            for sid, date, level, total, values, row_scores
+            in zip(student_ids, dates, levels, totals, zip(step, push, sit, reach), scores)
+        ]
+
+    return [list(row) for row in zip(lines, rows)]
+
+
+def next_segak_id(conn):
+    row = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'segak_test'"
+    ).fetchone()
+    return (row[0] if row else 0) + 1
+
+
+def insert_rows(conn, kind, rows, teacher_id):
+    if kind == "segak":
+        fitness.insert_tests(conn, rows, teacher_id=teacher_id)
+    else:
+        conn.executemany(INSERT_SQL[kind], rows)
+
+
+def insert_chunk(conn, kind, chunk, result, lookups, teacher_id=norms.SYSTEM_TEACHER_ID):
+    prepared = classify_chunk(conn, kind, chunk, lookups)
+    try:
+        if kind == "segak":
+            # kunci tulis dipegang dari sini, jadi id boleh diperuntuk
+            # terlebih dahulu dan segak_detail ditulis tanpa query balik
+            conn.execute("BEGIN IMMEDIATE")
+            first_id = next_segak_id(conn)
+            for i, item in enumerate(prepared):
+                item[1] = (first_id + i,) + tuple(item[1])[1:]
+
+        insert_rows(conn, kind, [values for _, values in prepared], teacher_id)
+        conn.commit()
+        result.inserted += len(prepared)
+    except sqlite3.IntegrityError:
+        # satu baris gagal -> ulang baris demi baris supaya yang lain masuk.
+        # Savepoint bagi setiap baris: ujian SEGAK yang gagal selepas
+        # segak_test ditulis tidak tinggal tanpa segak_detail (dan ringkasan)
+        conn.rollback()
+        conn.execute("BEGIN IMMEDIATE")
+        for line, values in prepared:
+            if kind == "segak":
+                values = (None,) + tuple(values)[1:]
+            conn.execute("SAVEPOINT row")
+            try:
+                insert_rows(conn, kind, [values], teacher_id)
+                result.inserted += 1
+            except sqlite3.IntegrityError as e:
+                conn.execute("ROLLBACK TO row")
+                result.error(line, str(e))
+            conn.execute("RELEASE row")
+        conn.commit()
+
+
+def parse_rows(kind, rows, lookups, result):
+    # rows: (nombor baris, dict); baris yang salah direkod dalam result
+    parse = PARSERS[kind]
+    for line, row in rows:
+        try:
+            yield line, parse(row, lookups)
+        except RowError as e:
+            result.error(line, str(e))
+
+
+def import_csv(conn, kind, stream, progress=None):
+    if kind not in KINDS:
+        raise ValueError(f"unknown import type: {kind}")
+
+    result = ImportResult(kind)
+    reader = csv.DictReader(stream)
+
+    missing = set(COLUMNS[kind]) - set(reader.fieldnames or [])
+    if missing:
+        result.error(1, "missing columns: " + ", ".join(sorted(missing)))
+        return result
+
+    lookups = load_lookups(conn, kind)
+    chunk = []
+
+    # baris 1 ialah header
+    for item in parse_rows(kind, enumerate(reader, start=2), lookups, result):
+        chunk.append(item)
+        if len(chunk) >= CHUNK_ROWS:
+            insert_chunk(conn, kind, chunk, result, lookups)
+            chunk = []
+            if progress:
+                progress(reader.line_num)
+
+    if chunk:
+        insert_chunk(conn, kind, chunk, result, lookups)
+
+    return result
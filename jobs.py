@@ -0,0 +1,319 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+import db
+
+# =========================
+# JOB QUEUE (SQLite)
+# =========================
+# Kerja berat (skor semula, import CSV, report card) dimasukkan ke jadual
+# job dan request terus pulang. Worker thread (dalam setiap process app,
+# atau `flask worker`) ambil job secara atomik dengan UPDATE ... RETURNING,
+# jadi beberapa worker/process boleh kongsi satu queue tanpa broker luar.
+POLL_SECONDS = 1.0
+# job "running" tanpa heartbeat selama ini: worker mati, masuk queue semula
+# (atau gagal jika cubaan sudah habis)
+STALE_SECONDS = 300
+STALE_CHECK_SECONDS = 60
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 5
+# job yang sudah selesai/gagal dibuang selepas ini
+KEEP_DAYS = 30
+# senarai ralat dalam hasil job (JSON) dipotong
+MAX_RESULT_ERRORS = 1000
+
+HANDLERS = {}
+
+_wakeup = threading.Event()
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def now_text():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# =========================
+# ENQUEUE & STATUS
+# =========================
+def enqueue(conn, kind, payload, dedupe_key=None, max_attempts=MAX_ATTEMPTS):
+    # job sama (dedupe_key) yang masih queued/running diguna semula
+    if dedupe_key is not None:
+        row = conn.execute(
+            """
+            SELECT job_id FROM job
+            WHERE dedupe_key = ? AND status IN ('queued', 'running')
+            """,
+            (dedupe_key,)
+        ).fetchone()
+        if row:
+            return row[0]
+
+    try:
+        cursor = conn.execute(
+            """
+            INSERT INTO job
+            (kind, payload, status, progress, total, attempts, max_attempts,
+             run_after, dedupe_key, created_at, updated_at)
+            VALUES (?, ?, 'queued', 0, NULL, 0, ?, ?, ?, ?, ?)
+            """,
+            (kind, json.dumps(payload), max_attempts, time.time(), dedupe_key,
+             now_text(), now_text())
+        )
+        conn.commit()
+    except sqlite3.IntegrityError:
+        # request lain baru masukkan job yang sama
+        conn.rollback()
+        return enqueue(conn, kind, payload, dedupe_key, max_attempts)
+
+    _wakeup.set()
+    return cursor.lastrowid
+
+
+def get(conn, job_id):
+    return conn.execute("SELECT * FROM job WHERE job_id = ?", (job_id,)).fetchone()
+
+
+def latest(conn, dedupe_key):
+    return conn.execute(
+        "SELECT * FROM job WHERE dedupe_key = ? ORDER BY job_id DESC LIMIT 1",
+        (dedupe_key,)
+    ).fetchone()
+
+
+def recent(conn, limit=50):
+    # julat job_id terakhir (carian rowid), bukan imbasan seluruh jadual
+    return conn.execute(
+        """
+        SELECT * FROM job
+        WHERE job_id > (SELECT MAX(job_id) FROM job) - ?
+        ORDER BY job_id DESC
+        """,
+        (limit,)
+    ).fetchall()
+
+
+def as_dict(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def retry(conn, job_id):
+    cursor = conn.execute(
+        """
+        UPDATE job SET status = 'queued', attempts = 0, error = NULL,
+                       run_after = ?, updated_at = ?
+        WHERE job_id = ? AND status = 'failed'
+        """,
+        (time.time(), now_text(), job_id)
+    )
+    conn.commit()
+    _wakeup.set()
+    return cursor.rowcount == 1
+
+
+# =========================
+# JOB YANG SEDANG BERJALAN
+# =========================
+class Job:
+    def __init__(self, db_path, row):
+        self.db_path = db_path
+        self.job_id = row["job_id"]
+        self.kind = row["kind"]
+        self.payload = json.loads(row["payload"])
+        self.attempts = row["attempts"]
+        self._progress_conn = None
+
+    def progress(self, done, total=None):
+        # connection berasingan dengan busy_timeout pendek: jika handler
+        # sedang pegang kunci tulis, kemas kini ini dilangkau sahaja
+        if self._progress_conn is None:
+            self._progress_conn = sqlite3.connect(self.db_path, timeout=0.05)
+        try:
+            self._progress_conn.execute(
+                """
+                UPDATE job SET progress = ?, total = COALESCE(?, total),
+                               heartbeat = ?, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (done, total, time.time(), now_text(), self.job_id)
+            )
+            self._progress_conn.commit()
+        except sqlite3.OperationalError:
+            self._progress_conn.rollback()
+
+    def close(self):
+        if self._progress_conn is not None:
+            self._progress_conn.close()
+
+
+def claim(conn, worker_id):
+    now = time.time()
+    # semak tanpa kunci dahulu supaya worker yang menunggu tak ganggu penulis lain
+    if conn.execute(
+        "SELECT 1 FROM job WHERE status = 'queued' AND run_after <= ? LIMIT 1", (now,)
+    ).fetchone() is None:
+        return None
+
+    conn.execute("BEGIN IMMEDIATE")
+    row = conn.execute(
+        """
+        UPDATE job SET status = 'running', locked_by = ?, heartbeat = ?,
+                       attempts = attempts + 1, updated_at = ?
+        WHERE job_id = (
+            SELECT job_id FROM job
+            WHERE status = 'queued' AND run_after <= ?
+            ORDER BY run_after, job_id
+            LIMIT 1
+        )
+        RETURNING *
+        """,
+        (worker_id, now, now_text(), now)
+    ).fetchone()
+    conn.commit()
+    return row
+
+
+def requeue_stale(conn):
+    # worker mati di tengah job: dikira sebagai satu cubaan gagal, jadi
+    # job max_attempts=1 (import) atau job yang sentiasa mematikan worker
+    # tidak diulang tanpa had
+    cursor = conn.execute(
+        """
+        UPDATE job SET status = CASE WHEN attempts >= max_attempts
+                                     THEN 'failed' ELSE 'queued' END,
+                       error = 'worker stopped while running this job',
+                       locked_by = NULL, updated_at = ?
+        WHERE status = 'running' AND heartbeat < ?
+        """,
+        (now_text(), time.time() - STALE_SECONDS)
+    )
+    conn.commit()
+    return cursor.rowcount
+
+
+def prune(conn):
+    conn.execute(
+        """
+        DELETE FROM job
+        WHERE status IN ('done', 'failed') AND updated_at < datetime('now', 'localtime', ?)
+        """,
+        (f"-{KEEP_DAYS} days",)
+    )
+    conn.commit()
+
+
+def finish(conn, job, result):
+    conn.execute(
+        """
+        UPDATE job SET status = 'done', result = ?, error = NULL,
+                       locked_by = NULL, updated_at = ?
+        WHERE job_id = ?
+        """,
+        (json.dumps(result), now_text(), job.job_id)
+    )
+    conn.commit()
+
+
+def fail(conn, job, row, error):
+    # cuba semula dengan backoff: 5s, 10s, 20s ...
+    if row["attempts"] < row["max_attempts"]:
+        conn.execute(
+            """
+            UPDATE job SET status = 'queued', error = ?, locked_by = NULL,
+                           run_after = ?, updated_at = ?
+            WHERE job_id = ?
+            """,
+            (error, time.time() + RETRY_BASE_SECONDS * 2 ** (row["attempts"] - 1),
+             now_text(), job.job_id)
+        )
+    else:
+        conn.execute(
+            """
+            UPDATE job SET status = 'failed', error = ?, locked_by = NULL, updated_at = ?
+            WHERE job_id = ?
+            """,
+            (error, now_text(), job.job_id)
+        )
+    conn.commit()
+
+
+def run_one(conn, db_path, row):
+    job = Job(db_path, row)
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise ValueError(f"no handler for job kind '{job.kind}'")
+        result = func(job, conn)
+        conn.commit()
+        finish(conn, job, result)
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        fail(conn, job, row, f"{type(e).__name__}: {e}")
+    finally:
+        job.close()
+
+
+# =========================
+# WORKER
+# =========================
+def work(db_path, worker_id, stop):
+    conn = db.open_connection(db_path)
+    db.ensure_migrated(conn, db_path)
+    last_stale_check = 0
+
+    while not stop.is_set():
+        try:
+            if time.time() - last_stale_check > STALE_CHECK_SECONDS:
+                requeue_stale(conn)
+                prune(conn)
+                last_stale_check = time.time()
+
+            row = claim(conn, worker_id)
+            if row is None:
+                # enqueue dalam process ini kejutkan worker serta-merta;
+                # job dari process lain dijumpai oleh polling
+                _wakeup.wait(POLL_SECONDS)
+                _wakeup.clear()
+                continue
+            run_one(conn, db_path, row)
+        except sqlite3.OperationalError:
+            # DB sibuk (database is locked): cuba lagi pusingan seterusnya
+            conn.rollback()
+            time.sleep(POLL_SECONDS)
+
+    conn.close()
+
+
+def start_workers(db_path, threads):
+    # sekali bagi setiap process (gunicorn fork -> pid baru -> worker baru)
+    key = (os.getpid(), db_path)
+    with _workers_lock:
+        if key in _workers:
+            return _workers[key]
+        stop = threading.Event()
+        pool = []
+        for i in range(threads):
+            worker_id = f"{os.getpid()}-{i}"
+            thread = threading.Thread(
+                target=work, args=(db_path, worker_id, stop),
+                name=f"job-worker-{worker_id}", daemon=True
+            )
+            thread.start()
+            pool.append(thread)
+        _workers[key] = (stop, pool)
+        return _workers[key]
@@ -0,0 +1,370 @@
+import cProfile
+import itertools
+import logging
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+from flask import g, request, before_render_template, template_rendered
+
+import db
+
+# =========================
+# HISTOGRAM (FORMAT PROMETHEUS)
+# =========================
+# Kiraan untuk process (worker) ini sahaja; Prometheus scrape setiap
+# worker, atau jalankan satu worker untuk /metrics.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # kiraan setiap bucket (+Inf terakhir), kemudian jumlah nilai
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((k, list(v)) for k, v in self.series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.series.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "segak_request_duration_seconds", "End-to-end request time.",
+    ("endpoint", "method", "status"), LATENCY_BUCKETS
+)
+TEMPLATE_SECONDS = Histogram(
+    "segak_template_render_seconds", "Time spent rendering each template.",
+    ("template",), LATENCY_BUCKETS
+)
+QUERY_SECONDS = Histogram(
+    "segak_query_duration_seconds", "SQLite query time including row fetches, by call site.",
+    ("callsite",), LATENCY_BUCKETS
+)
+QUERY_ROWS = Histogram(
+    "segak_query_rows", "Rows fetched per query, by call site.",
+    ("callsite",), ROW_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "segak_request_queries", "Queries executed per request.",
+    ("endpoint",), COUNT_BUCKETS
+)
+SLOW_QUERIES = Counter(
+    "segak_slow_queries_total", "Queries slower than the slow-query threshold.", ("callsite",)
+)
+PROFILED_REQUESTS = Counter(
+    "segak_profiled_requests_total", "Requests sampled with cProfile.", ("endpoint",)
+)
+
+REGISTRY = (
+    REQUEST_SECONDS, TEMPLATE_SECONDS, QUERY_SECONDS, QUERY_ROWS,
+    REQUEST_QUERIES, SLOW_QUERIES, PROFILED_REQUESTS,
+)
+
+
+def render(extra=None):
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    # nilai tambahan dari app: (nama, jenis, penerangan, nilai)
+    for name, kind, help_text, value in extra or ():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+    return "\n".join(lines) + "\n"
+
+
+# =========================
+# QUERY INSTRUMENTATION
+# =========================
+# get_db_connection() pulangkan InstrumentedConnection: setiap query
+# direkod (SQL, masa termasuk fetch, bilangan baris, baris kod pemanggil)
+# dan dikumpul ke histogram bila request tamat.
+_THIS_FILE = __file__
+_callsites = {}
+
+
+def callsite():
+    # baris pertama di luar modul ini (app.py, cache.py, analytics.py ...)
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == _THIS_FILE:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    key = (frame.f_code, frame.f_lineno)
+    site = _callsites.get(key)
+    if site is None:
+        site = _callsites[key] = (
+            f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        )
+    return site
+
+
+class QueryRecord:
+    __slots__ = ("sql", "callsite", "seconds", "rows")
+
+    def __init__(self, sql, site):
+        self.sql = sql
+        self.callsite = site
+        self.seconds = 0.0
+        self.rows = 0
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    record = None
+
+    def _start(self, sql):
+        self.record = QueryRecord(sql, callsite())
+        queries = getattr(self.connection, "queries", None)
+        if queries is not None:
+            queries.append(self.record)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.record.seconds += time.perf_counter() - start
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.record.seconds += time.perf_counter() - start
+            self.record.rows = max(self.rowcount, 0)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        if self.record is not None:
+            self.record.seconds += time.perf_counter() - start
+            self.record.rows += row is not None
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        if self.record is not None:
+            self.record.seconds += time.perf_counter() - start
+            self.record.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        if self.record is not None:
+            self.record.seconds += time.perf_counter() - start
+            self.record.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        finally:
+            if self.record is not None:
+                self.record.seconds += time.perf_counter() - start
+        if self.record is not None:
+            self.record.rows += 1
+        return row
+
+
+class InstrumentedConnection(db.Connection):
+    # None semasa PRAGMA dalam open_connection; senarai selepas itu
+    queries = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def start_recording(self):
+        self.queries = []
+
+    def stop_recording(self):
+        self.queries = None
+
+
+# =========================
+# SLOW QUERY LOG
+# =========================
+slow_log = logging.getLogger("segak.slow_query")
+recent_slow = deque(maxlen=100)
+
+
+def _one_line(sql, limit=500):
+    sql = re.sub(r"\s+", " ", sql).strip()
+    return sql if len(sql) <= limit else sql[:limit] + "..."
+
+
+def log_slow(record, endpoint, threshold):
+    SLOW_QUERIES.inc(record.callsite)
+    entry = {
+        "ms": round(record.seconds * 1000, 2),
+        "rows": record.rows,
+        "callsite": record.callsite,
+        "endpoint": endpoint,
+        "sql": _one_line(record.sql),
+        "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    recent_slow.append(entry)
+    slow_log.warning(
+        "slow query %.1f ms (threshold %.0f ms) rows=%d at %s [%s]: %s",
+        record.seconds * 1000, threshold * 1000, record.rows,
+        record.callsite, endpoint, entry["sql"]
+    )
+
+
+# =========================
+# FLASK HOOKS
+# =========================
+_profile_lock = threading.Lock()
+_profile_seq = itertools.count()
+
+
+def init_app(app, slow_query_seconds, profile_sample=0.0, profile_dir=None, slow_log_path=None):
+    if slow_log_path:
+        handler = logging.FileHandler(slow_log_path)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_log.addHandler(handler)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_status = 500
+        g.metrics_templates = []
+        # cProfile: satu request pada satu masa bagi setiap process
+        if profile_sample and random.random() < profile_sample and _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc=None):
+        if "metrics_start" not in g:
+            return
+        endpoint = request.endpoint or "unmatched"
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+            PROFILED_REQUESTS.inc(endpoint)
+            if profile_dir:
+                path = os.path.join(
+                    profile_dir, f"{endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_seq)}.prof"
+                )
+                # gagal tulis profil tidak boleh gagalkan request
+                try:
+                    os.makedirs(profile_dir, exist_ok=True)
+                    profiler.dump_stats(path)
+                except OSError as e:
+                    slow_log.warning("could not write profile %s: %s", path, e)
+
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - g.metrics_start, endpoint, request.method, str(g.metrics_status)
+        )
+
+        conn = g.get("db")
+        queries = getattr(conn, "queries", None)
+        if queries is None:
+            return
+        REQUEST_QUERIES.observe(len(queries), endpoint)
+        for record in queries:
+            QUERY_SECONDS.observe(record.seconds, record.callsite)
+            QUERY_ROWS.observe(record.rows, record.callsite)
+            if record.seconds >= slow_query_seconds:
+                log_slow(record, endpoint, slow_query_seconds)
+
+    def template_started(sender, template, context, **extra):
+        if "metrics_templates" in g:
+            g.metrics_templates.append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        if g.get("metrics_templates"):
+            TEMPLATE_SECONDS.observe(
+                time.perf_counter() - g.metrics_templates.pop(), template.name or "string"
+            )
+
+    # weak=False: penerima ialah fungsi tempatan, jangan biar ia dikutip GC
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
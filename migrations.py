@@ -0,0 +1,1330 @@
+import sqlite3
+import time
+
+from norms import ACTIVITY_COLUMNS
+
+# =========================
+# SCHEMA MIGRATIONS
+# =========================
+# Setiap migration ada nombor versi, nama dan sama ada skrip SQL atau
+# function(conn). Versi yang sudah dijalankan disimpan dalam jadual
+# schema_version, jadi migration hanya berjalan sekali bagi setiap DB.
+
+
+def run_script(conn, script):
+    # executescript() buat COMMIT dulu, jadi skrip dipecah kepada statement
+    # supaya semuanya kekal dalam transaction migration
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def rebuild_table(conn, table, create_sql):
+    # SQLite tak boleh ALTER TABLE ADD FOREIGN KEY, jadi jadual dibina
+    # semula: create baru -> salin data -> drop lama -> rename.
+    new_table = f"{table}_new"
+    columns = ", ".join(
+        f'"{row[1]}"' for row in conn.execute(f'PRAGMA table_info("{table}")')
+    )
+
+    conn.execute(create_sql.format(table=new_table))
+    conn.execute(
+        f'INSERT INTO "{new_table}" ({columns}) SELECT {columns} FROM "{table}"'
+    )
+
+    # kekalkan nilai AUTOINCREMENT supaya id yang pernah dipadam tak diguna semula
+    old_seq = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)
+    ).fetchone()
+    if old_seq is not None:
+        conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+            (old_seq[0], new_table)
+        )
+
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{new_table}" RENAME TO "{table}"')
+
+
+def add_foreign_keys(conn):
+    # buang rekod yatim (student sudah dipadam) sebelum FK dikuatkuasakan
+    run_script(conn, """
+        DELETE FROM bmi_record
+        WHERE student_id NOT IN (SELECT student_id FROM student);
+        DELETE FROM segak_record
+        WHERE student_id NOT IN (SELECT student_id FROM student);
+        DELETE FROM student_user
+        WHERE student_id NOT IN (SELECT student_id FROM student);
+        DELETE FROM segak_test
+        WHERE student_id NOT IN (SELECT student_id FROM student);
+        DELETE FROM segak_detail
+        WHERE test_id NOT IN (SELECT test_id FROM segak_test);
+        UPDATE student SET class_id = NULL
+        WHERE class_id NOT IN (SELECT class_id FROM class);
+    """)
+
+    rebuild_table(conn, "student", """
+        CREATE TABLE "{table}" (
+            "student_id"  INTEGER NOT NULL,
+            "name"        TEXT NOT NULL,
+            "gender"      TEXT,
+            "age"         INTEGER,
+            "class_id"    INTEGER,
+            PRIMARY KEY("student_id" AUTOINCREMENT),
+            FOREIGN KEY("class_id") REFERENCES class(class_id) ON DELETE SET NULL
+        )
+    """)
+
+    rebuild_table(conn, "student_user", """
+        CREATE TABLE "{table}" (
+            "student_user_id" INTEGER PRIMARY KEY AUTOINCREMENT,
+            "student_id"      INTEGER NOT NULL,
+            "email"           TEXT UNIQUE NOT NULL,
+            "password"        TEXT NOT NULL,
+            FOREIGN KEY("student_id") REFERENCES student(student_id) ON DELETE CASCADE
+        )
+    """)
+
+    rebuild_table(conn, "bmi_record", """
+        CREATE TABLE "{table}" (
+            "bmi_id"       INTEGER NOT NULL,
+            "student_id"   INTEGER NOT NULL,
+            "record_date"  TEXT NOT NULL,
+            "weight"       REAL NOT NULL,
+            "height"       REAL NOT NULL,
+            "bmi_value"    REAL,
+            "bmi_status"   TEXT,
+            PRIMARY KEY("bmi_id" AUTOINCREMENT),
+            FOREIGN KEY("student_id") REFERENCES student(student_id) ON DELETE CASCADE
+        )
+    """)
+
+    rebuild_table(conn, "segak_record", """
+        CREATE TABLE "{table}" (
+            "segak_id"       INTEGER,
+            "student_id"     INTEGER NOT NULL,
+            "step_test"      INTEGER,
+            "sit_up"         INTEGER,
+            "push_up"        INTEGER,
+            "sit_reach"      REAL,
+            "test_date"      TEXT NOT NULL,
+            "fitness_level"  TEXT,
+            PRIMARY KEY("segak_id" AUTOINCREMENT),
+            FOREIGN KEY("student_id") REFERENCES student(student_id) ON DELETE CASCADE
+        )
+    """)
+
+    rebuild_table(conn, "segak_test", """
+        CREATE TABLE "{table}" (
+            "test_id"      INTEGER NOT NULL,
+            "student_id"   INTEGER NOT NULL,
+            "teacher_id"   INTEGER NOT NULL,
+            "test_date"    TEXT NOT NULL,
+            "total_score"  INTEGER,
+            PRIMARY KEY("test_id" AUTOINCREMENT),
+            FOREIGN KEY("student_id") REFERENCES student(student_id) ON DELETE CASCADE
+        )
+    """)
+
+    rebuild_table(conn, "segak_detail", """
+        CREATE TABLE "{table}" (
+            "detail_id"       INTEGER NOT NULL,
+            "test_id"         INTEGER NOT NULL,
+            "activity_id"     INTEGER NOT NULL,
+            "value_obtained"  INTEGER NOT NULL,
+            PRIMARY KEY("detail_id" AUTOINCREMENT),
+            FOREIGN KEY("test_id") REFERENCES segak_test(test_id) ON DELETE CASCADE,
+            FOREIGN KEY("activity_id") REFERENCES SEGAK_activity(activity_id)
+        )
+    """)
+
+
+HOT_PATH_INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_student_class_name
+        ON student (class_id, name);
+    CREATE INDEX IF NOT EXISTS idx_student_name
+        ON student (name);
+    CREATE INDEX IF NOT EXISTS idx_student_user_student
+        ON student_user (student_id);
+    CREATE INDEX IF NOT EXISTS idx_bmi_student_date
+        ON bmi_record (student_id, record_date DESC);
+    CREATE INDEX IF NOT EXISTS idx_segak_student_date
+        ON segak_record (student_id, test_date DESC);
+    CREATE INDEX IF NOT EXISTS idx_segak_test_student_date
+        ON segak_test (student_id, test_date DESC);
+    CREATE INDEX IF NOT EXISTS idx_segak_detail_test
+        ON segak_detail (test_id);
+"""
+
+
+# Norma SEGAK ikut aktiviti, jantina dan umur (13-17). Nilai ialah ambang
+# untuk skor 2, 3, 4, 5 pada umur 13 dan perubahan ambang setiap tahun.
+# Step test: kadar nadi, lebih rendah lebih baik. Ambang boleh dikemas
+# kini terus dalam jadual segak_norm tanpa ubah kod.
+NORM_AGES = range(13, 18)
+
+NORM_SPEC = {
+    # activity_name: (lower_is_better, {gender: (thresholds, step per year)})
+    "Step Test": (True, {
+        "Male": ((135, 125, 115, 105), -1),
+        "Female": ((140, 130, 120, 110), -1),
+    }),
+    "Push Up": (False, {
+        "Male": ((10, 15, 20, 25), 1),
+        "Female": ((6, 9, 12, 15), 0.5),
+    }),
+    "Sit Up": (False, {
+        "Male": ((10, 14, 18, 22), 0.5),
+        "Female": ((8, 12, 16, 20), 0.5),
+    }),
+    "Sit and Reach": (False, {
+        "Male": ((20, 25, 30, 35), 0),
+        "Female": ((23, 28, 33, 38), 0),
+    }),
+}
+
+
+def norm_bands(thresholds, lower_is_better):
+    # (score, min_value, max_value) bagi skor 1-5; None = tiada had
+    t2, t3, t4, t5 = thresholds
+    if lower_is_better:
+        return [(5, 0, t5), (4, t5 + 1, t4), (3, t4 + 1, t3), (2, t3 + 1, t2), (1, t2 + 1, None)]
+    return [(1, 0, t2 - 1), (2, t2, t3 - 1), (3, t3, t4 - 1), (4, t4, t5 - 1), (5, t5, None)]
+
+
+def add_segak_norms(conn):
+    run_script(conn, """
+        CREATE TABLE segak_norm (
+            norm_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+            activity_id  INTEGER NOT NULL REFERENCES SEGAK_activity(activity_id),
+            gender       TEXT NOT NULL,
+            age          INTEGER NOT NULL,
+            score        INTEGER NOT NULL,
+            min_value    REAL NOT NULL,
+            max_value    REAL
+        );
+        CREATE INDEX idx_segak_norm_lookup
+            ON segak_norm (activity_id, gender, age);
+
+        ALTER TABLE segak_test ADD COLUMN segak_id INTEGER
+            REFERENCES segak_record(segak_id) ON DELETE CASCADE;
+        CREATE UNIQUE INDEX idx_segak_test_record ON segak_test (segak_id);
+
+        ALTER TABLE segak_detail ADD COLUMN score INTEGER;
+    """)
+
+    activities = dict(conn.execute("SELECT activity_name, activity_id FROM SEGAK_activity"))
+    max_scores = dict(conn.execute("SELECT activity_name, max_score FROM SEGAK_activity"))
+    rows = []
+    for name, (lower_is_better, genders) in NORM_SPEC.items():
+        for gender, (base, step) in genders.items():
+            for age in NORM_AGES:
+                thresholds = [int(t + step * (age - 13)) for t in base]
+                if max_scores.get(name):
+                    thresholds = [min(t, max_scores[name]) for t in thresholds]
+                for score, low, high in norm_bands(thresholds, lower_is_better):
+                    rows.append((activities[name], gender, age, score, low, high))
+
+    conn.executemany(
+        """
+        INSERT INTO segak_norm (activity_id, gender, age, score, min_value, max_value)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        rows
+    )
+
+
+# =========================
+# RINGKASAN KELAS / PENGGAL
+# =========================
+# Kiraan pelajar, taburan status BMI dan tahap kecergasan bagi setiap
+# kelas dan penggal disimpan dalam jadual ringkasan. Trigger kemas kini
+# jadual ini pada setiap insert/update/delete, jadi dashboard hanya baca
+# O(kelas) baris. class_id 0 = pelajar tanpa kelas.
+def term_sql(date_column):
+    # penggal: S1 = Jan-Jun, S2 = Jul-Dis
+    return (
+        f"substr({date_column}, 1, 4) || "
+        f"CASE WHEN substr({date_column}, 6, 2) <= '06' THEN '-S1' ELSE '-S2' END"
+    )
+
+
+SUMMARY_TABLES = {
+    # jadual: (lajur kunci, lajur nilai, SELECT dari data asal)
+    "class_summary": (
+        ("class_id",),
+        ("student_count",),
+        """
+        SELECT COALESCE(class_id, 0), COUNT(*)
+        FROM student
+        GROUP BY 1
+        """,
+    ),
+    "class_bmi_summary": (
+        ("class_id", "term", "bmi_status"),
+        ("record_count", "bmi_sum"),
+        f"""
+        SELECT COALESCE(s.class_id, 0), {term_sql("b.record_date")},
+               COALESCE(b.bmi_status, ''), COUNT(*), SUM(COALESCE(b.bmi_value, 0))
+        FROM bmi_record b
+        JOIN student s ON s.student_id = b.student_id
+        GROUP BY 1, 2, 3
+        """,
+    ),
+    "class_segak_summary": (
+        ("class_id", "term", "fitness_level"),
+        ("record_count", "step_test_sum", "push_up_sum", "sit_up_sum", "sit_reach_sum"),
+        f"""
+        SELECT COALESCE(s.class_id, 0), {term_sql("r.test_date")},
+               COALESCE(r.fitness_level, ''), COUNT(*),
+               SUM(COALESCE(r.step_test, 0)), SUM(COALESCE(r.push_up, 0)),
+               SUM(COALESCE(r.sit_up, 0)), SUM(COALESCE(r.sit_reach, 0))
+        FROM segak_record r
+        JOIN student s ON s.student_id = r.student_id
+        GROUP BY 1, 2, 3
+        """,
+    ),
+}
+
+
+def summary_upsert(table, select_sql):
+    keys, values, _ = SUMMARY_TABLES[table]
+    return f"""
+        INSERT INTO {table} ({", ".join(keys + values)})
+        {select_sql}
+        ON CONFLICT ({", ".join(keys)}) DO UPDATE SET
+            {", ".join(f"{v} = {v} + excluded.{v}" for v in values)};
+    """
+
+
+def bmi_delta(row, sign):
+    # satu rekod BMI; tiada kesan jika pelajar sudah dipadam (cascade)
+    return summary_upsert("class_bmi_summary", f"""
+        SELECT COALESCE(s.class_id, 0), {term_sql(f"{row}.record_date")},
+               COALESCE({row}.bmi_status, ''), {sign}1, {sign}COALESCE({row}.bmi_value, 0)
+        FROM student s
+        WHERE s.student_id = {row}.student_id
+    """)
+
+
+def segak_delta(row, sign):
+    return summary_upsert("class_segak_summary", f"""
+        SELECT COALESCE(s.class_id, 0), {term_sql(f"{row}.test_date")},
+               COALESCE({row}.fitness_level, ''), {sign}1,
+               {sign}COALESCE({row}.step_test, 0), {sign}COALESCE({row}.push_up, 0),
+               {sign}COALESCE({row}.sit_up, 0), {sign}COALESCE({row}.sit_reach, 0)
+        FROM student s
+        WHERE s.student_id = {row}.student_id
+    """)
+
+
+def student_records_delta(row, sign):
+    # semua rekod seorang pelajar, untuk pindah kelas / padam pelajar
+    return summary_upsert("class_bmi_summary", f"""
+        SELECT COALESCE({row}.class_id, 0), {term_sql("b.record_date")},
+               COALESCE(b.bmi_status, ''), {sign}COUNT(*), {sign}SUM(COALESCE(b.bmi_value, 0))
+        FROM bmi_record b
+        WHERE b.student_id = {row}.student_id
+        GROUP BY 1, 2, 3
+    """) + summary_upsert("class_segak_summary", f"""
+        SELECT COALESCE({row}.class_id, 0), {term_sql("r.test_date")},
+               COALESCE(r.fitness_level, ''), {sign}COUNT(*),
+               {sign}SUM(COALESCE(r.step_test, 0)), {sign}SUM(COALESCE(r.push_up, 0)),
+               {sign}SUM(COALESCE(r.sit_up, 0)), {sign}SUM(COALESCE(r.sit_reach, 0))
+        FROM segak_record r
+        WHERE r.student_id = {row}.student_id
+        GROUP BY 1, 2, 3
+    """)
+
+
+def student_count_delta(row, sign):
+    return summary_upsert("class_summary", f"""
+        SELECT COALESCE({row}.class_id, 0), {sign}1 WHERE true
+    """)
+
+
+def add_class_summaries(conn):
+    run_script(conn, """
+        CREATE TABLE class_summary (
+            class_id       INTEGER PRIMARY KEY,
+            student_count  INTEGER NOT NULL
+        );
+        CREATE TABLE class_bmi_summary (
+            class_id      INTEGER NOT NULL,
+            term          TEXT NOT NULL,
+            bmi_status    TEXT NOT NULL,
+            record_count  INTEGER NOT NULL,
+            bmi_sum       REAL NOT NULL,
+            PRIMARY KEY (term, class_id, bmi_status)
+        ) WITHOUT ROWID;
+        CREATE TABLE class_segak_summary (
+            class_id       INTEGER NOT NULL,
+            term           TEXT NOT NULL,
+            fitness_level  TEXT NOT NULL,
+            record_count   INTEGER NOT NULL,
+            step_test_sum  REAL NOT NULL,
+            push_up_sum    REAL NOT NULL,
+            sit_up_sum     REAL NOT NULL,
+            sit_reach_sum  REAL NOT NULL,
+            PRIMARY KEY (term, class_id, fitness_level)
+        ) WITHOUT ROWID;
+    """)
+
+    # pelajar dipadam: rekod anak dipadam oleh cascade SELEPAS baris pelajar
+    # hilang, jadi trigger rekod tak jumpa kelas -> tolak semuanya di sini
+    run_script(conn, f"""
+        CREATE TRIGGER trg_student_summary_insert AFTER INSERT ON student
+        BEGIN
+            {student_count_delta("new", "+")}
+        END;
+
+        CREATE TRIGGER trg_student_summary_delete BEFORE DELETE ON student
+        BEGIN
+            {student_count_delta("old", "-")}
+            {student_records_delta("old", "-")}
+        END;
+
+        CREATE TRIGGER trg_student_summary_class AFTER UPDATE OF class_id ON student
+        WHEN old.class_id IS NOT new.class_id
+        BEGIN
+            {student_count_delta("old", "-")}
+            {student_count_delta("new", "+")}
+            {student_records_delta("old", "-")}
+            {student_records_delta("new", "+")}
+        END;
+
+        CREATE TRIGGER trg_bmi_summary_insert AFTER INSERT ON bmi_record
+        BEGIN
+            {bmi_delta("new", "+")}
+        END;
+
+        CREATE TRIGGER trg_bmi_summary_delete AFTER DELETE ON bmi_record
+        BEGIN
+            {bmi_delta("old", "-")}
+        END;
+
+        CREATE TRIGGER trg_bmi_summary_update
+        AFTER UPDATE OF student_id, record_date, bmi_value, bmi_status ON bmi_record
+        BEGIN
+            {bmi_delta("old", "-")}
+            {bmi_delta("new", "+")}
+        END;
+
+        CREATE TRIGGER trg_segak_summary_insert AFTER INSERT ON segak_record
+        BEGIN
+            {segak_delta("new", "+")}
+        END;
+
+        CREATE TRIGGER trg_segak_summary_delete AFTER DELETE ON segak_record
+        BEGIN
+            {segak_delta("old", "-")}
+        END;
+
+        CREATE TRIGGER trg_segak_summary_update
+        AFTER UPDATE OF student_id, test_date, fitness_level,
+                        step_test, push_up, sit_up, sit_reach ON segak_record
+        BEGIN
+            {segak_delta("old", "-")}
+            {segak_delta("new", "+")}
+        END;
+    """)
+
+    for table, (keys, values, select_sql) in SUMMARY_TABLES.items():
+        conn.execute(f"INSERT INTO {table} ({', '.join(keys + values)}) {select_sql}")
+
+
+# =========================
+# VERSI CACHE
+# =========================
+# Setiap perubahan naikkan versi skop yang terlibat; cache.py banding
+# versi ini sebelum guna entri dalam memori (semua worker kongsi DB).
+def bump_version(scope_sql):
+    return f"""
+        INSERT INTO cache_version (name, version) VALUES ({scope_sql}, 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+    """
+
+
+def add_cache_versions(conn):
+    student_scope = "'student:' || {row}.student_id"
+    run_script(conn, f"""
+        CREATE TABLE cache_version (
+            name     TEXT PRIMARY KEY,
+            version  INTEGER NOT NULL
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER trg_class_cache_insert AFTER INSERT ON class
+        BEGIN
+            {bump_version("'classes'")}
+            {bump_version("'roster'")}
+        END;
+
+        CREATE TRIGGER trg_class_cache_update AFTER UPDATE ON class
+        BEGIN
+            {bump_version("'classes'")}
+            {bump_version("'roster'")}
+        END;
+
+        CREATE TRIGGER trg_class_cache_delete AFTER DELETE ON class
+        BEGIN
+            {bump_version("'classes'")}
+            {bump_version("'roster'")}
+        END;
+
+        CREATE TRIGGER trg_student_cache_insert AFTER INSERT ON student
+        BEGIN
+            {bump_version("'roster'")}
+        END;
+
+        CREATE TRIGGER trg_student_cache_update AFTER UPDATE ON student
+        BEGIN
+            {bump_version("'roster'")}
+            {bump_version(student_scope.format(row="old"))}
+            {bump_version(student_scope.format(row="new"))}
+        END;
+
+        CREATE TRIGGER trg_student_cache_delete AFTER DELETE ON student
+        BEGIN
+            {bump_version("'roster'")}
+            {bump_version(student_scope.format(row="old"))}
+        END;
+    """)
+
+    for table in ("bmi_record", "segak_record"):
+        run_script(conn, f"""
+            CREATE TRIGGER trg_{table}_cache_insert AFTER INSERT ON {table}
+            BEGIN
+                {bump_version(student_scope.format(row="new"))}
+            END;
+
+            CREATE TRIGGER trg_{table}_cache_update AFTER UPDATE ON {table}
+            BEGIN
+                {bump_version(student_scope.format(row="old"))}
+                {bump_version(student_scope.format(row="new"))}
+            END;
+
+            CREATE TRIGGER trg_{table}_cache_delete AFTER DELETE ON {table}
+            BEGIN
+                {bump_version(student_scope.format(row="old"))}
+            END;
+        """)
+
+
+# =========================
+# JOB QUEUE
+# =========================
+# Satu baris bagi setiap kerja latar (lihat jobs.py). Worker cari job
+# melalui idx_job_queue; dedupe_key unik hanya semasa job masih aktif.
+JOB_QUEUE = """
+    CREATE TABLE job (
+        job_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind          TEXT NOT NULL,
+        payload       TEXT NOT NULL,
+        status        TEXT NOT NULL CHECK (status IN ('queued', 'running', 'done', 'failed')),
+        progress      INTEGER NOT NULL DEFAULT 0,
+        total         INTEGER,
+        result        TEXT,
+        error         TEXT,
+        attempts      INTEGER NOT NULL DEFAULT 0,
+        max_attempts  INTEGER NOT NULL,
+        run_after     REAL NOT NULL,
+        locked_by     TEXT,
+        heartbeat     REAL,
+        dedupe_key    TEXT,
+        created_at    TEXT NOT NULL,
+        updated_at    TEXT NOT NULL
+    );
+
+    CREATE INDEX idx_job_queue ON job (status, run_after);
+    CREATE INDEX idx_job_dedupe_key ON job (dedupe_key, job_id);
+    CREATE UNIQUE INDEX idx_job_active_dedupe ON job (dedupe_key)
+        WHERE status IN ('queued', 'running');
+"""
+
+
+# =========================
+# PROGRESS PELAJAR (LONGITUDINAL)
+# =========================
+# Satu baris bagi setiap pelajar: nilai pertama, sebelum, terkini dan
+# purata bergerak BMI dan skor SEGAK. Trigger kira semula baris pelajar
+# yang terlibat sahaja (rekodnya dibaca melalui index student_id, date).
+PROGRESS_SERIES = {
+    # metrik: (jadual, nilai, tarikh, id)
+    "bmi": ("bmi_record", "bmi_value", "record_date", "bmi_id"),
+    "fitness": ("segak_test", "total_score", "test_date", "test_id"),
+}
+PROGRESS_COLUMNS = (
+    "count", "first", "previous", "latest", "latest_date", "rolling", "rolling_previous"
+)
+# purata bergerak bagi N ujian terakhir
+ROLLING_TESTS = 3
+
+
+def progress_select(metric, student_sql=None):
+    table, value, date, key = PROGRESS_SERIES[metric]
+    only = f"AND student_id = {student_sql}" if student_sql else ""
+    where = f"s.student_id = {student_sql}" if student_sql else "true"
+    return f"""
+        SELECT s.student_id,
+               COUNT(x.v),
+               MAX(CASE WHEN x.n = x.total THEN x.v END),
+               MAX(CASE WHEN x.n = 2 THEN x.v END),
+               MAX(CASE WHEN x.n = 1 THEN x.v END),
+               MAX(CASE WHEN x.n = 1 THEN x.d END),
+               AVG(CASE WHEN x.n <= {ROLLING_TESTS} THEN x.v END),
+               AVG(CASE WHEN x.total > 1 AND x.n BETWEEN 2 AND {ROLLING_TESTS + 1} THEN x.v END)
+        FROM student s
+        LEFT JOIN (
+            SELECT student_id, {value} AS v, {date} AS d,
+                   ROW_NUMBER() OVER (PARTITION BY student_id ORDER BY {date} DESC, {key} DESC) AS n,
+                   COUNT(*) OVER (PARTITION BY student_id) AS total
+            FROM {table}
+            WHERE {value} IS NOT NULL {only}
+        ) x ON x.student_id = s.student_id
+        WHERE {where}
+        GROUP BY s.student_id
+    """
+
+
+def progress_refresh(metric, student_sql):
+    # pelajar yang sudah dipadam tiada dalam SELECT -> tiada baris ditulis
+    names = ", ".join(f"{metric}_{c}" for c in PROGRESS_COLUMNS)
+    updates = ", ".join(f"{metric}_{c} = excluded.{metric}_{c}" for c in PROGRESS_COLUMNS)
+    return f"""
+        INSERT INTO student_progress (student_id, {names})
+        {progress_select(metric, student_sql)}
+        ON CONFLICT (student_id) DO UPDATE SET {updates};
+    """
+
+
+def add_student_progress(conn):
+    columns = []
+    for metric in PROGRESS_SERIES:
+        columns += [
+            f"{metric}_count             INTEGER NOT NULL DEFAULT 0",
+            f"{metric}_first             REAL",
+            f"{metric}_previous          REAL",
+            f"{metric}_latest            REAL",
+            f"{metric}_latest_date       TEXT",
+            f"{metric}_rolling           REAL",
+            f"{metric}_rolling_previous  REAL",
+            # beza dikira oleh SQLite, tidak disimpan
+            f"{metric}_delta  REAL AS ({metric}_latest - {metric}_previous)",
+            f"{metric}_change REAL AS ({metric}_latest - {metric}_first)",
+            f"{metric}_trend  REAL AS ({metric}_rolling - {metric}_rolling_previous)",
+        ]
+    conn.execute(f"""
+        CREATE TABLE student_progress (
+            student_id  INTEGER PRIMARY KEY
+                        REFERENCES student(student_id) ON DELETE CASCADE,
+            {", ".join(columns)}
+        )
+    """)
+
+    for metric in PROGRESS_SERIES:
+        run_script(conn, progress_triggers(metric))
+        # isi untuk rekod sedia ada
+        conn.execute(progress_refresh(metric, None))
+
+
+def progress_triggers(metric):
+    table, value, date, key = PROGRESS_SERIES[metric]
+    return f"""
+        CREATE TRIGGER trg_{table}_progress_insert AFTER INSERT ON {table}
+        BEGIN
+            {progress_refresh(metric, "new.student_id")}
+        END;
+
+        CREATE TRIGGER trg_{table}_progress_delete AFTER DELETE ON {table}
+        BEGIN
+            {progress_refresh(metric, "old.student_id")}
+        END;
+
+        CREATE TRIGGER trg_{table}_progress_update
+        AFTER UPDATE OF student_id, {date}, {value} ON {table}
+        BEGIN
+            {progress_refresh(metric, "old.student_id")}
+            {progress_refresh(metric, "new.student_id")}
+        END;
+    """
+
+
+# =========================
+# UJIAN SEGAK TERNORMAL
+# =========================
+# segak_test + segak_detail jadi sumber data SEGAK: satu baris ujian
+# (segak_id lama dikekalkan sebagai test_id) dan satu baris detail bagi
+# setiap aktiviti. Aktiviti baharu = baris baharu dalam SEGAK_activity,
+# bukan lajur baharu. segak_record kini VIEW yang pivot empat aktiviti
+# asal; setiap lajur ialah subquery pada kunci utama segak_detail, jadi
+# view boleh diratakan (flatten) dan query lama masih guna index.
+SEGAK_REAL_COLUMNS = {"sit_reach"}
+
+
+def segak_activity_columns(conn):
+    # [(activity_id, lajur segak_record)] ikut susunan norms.ACTIVITY_COLUMNS
+    ids = dict(conn.execute("SELECT activity_name, activity_id FROM SEGAK_activity"))
+    return [(ids[name], column) for name, column in ACTIVITY_COLUMNS]
+
+
+def segak_record_view(activities):
+    columns = []
+    for activity_id, column in activities:
+        value = "CAST(d.value_obtained AS REAL)" if column in SEGAK_REAL_COLUMNS else "d.value_obtained"
+        columns.append(f"""
+            (SELECT {value} FROM segak_detail d
+             WHERE d.test_id = t.test_id AND d.activity_id = {activity_id}) AS {column}""")
+    return f"""
+        CREATE VIEW segak_record AS
+        SELECT t.test_id AS segak_id, t.student_id,{",".join(columns)},
+               t.test_date, t.fitness_level, t.total_score, t.teacher_id
+        FROM segak_test t;
+    """
+
+
+def segak_test_delta(row, sign, activities):
+    # satu ujian: kiraan + nilai aktiviti yang sudah ada dalam segak_detail
+    sums = ", ".join(
+        f"""{sign}COALESCE((SELECT value_obtained FROM segak_detail
+                   WHERE test_id = {row}.test_id AND activity_id = {activity_id}), 0)"""
+        for activity_id, _ in activities
+    )
+    return summary_upsert("class_segak_summary", f"""
+        SELECT COALESCE(s.class_id, 0), {term_sql(f"{row}.test_date")},
+               COALESCE({row}.fitness_level, ''), {sign}1, {sums}
+        FROM student s
+        WHERE s.student_id = {row}.student_id
+    """)
+
+
+def segak_detail_delta(row, sign, activities):
+    # satu nilai aktiviti; tiada kesan jika ujian sudah dipadam (cascade)
+    sums = ", ".join(
+        f"CASE WHEN {row}.activity_id = {activity_id} THEN {sign}{row}.value_obtained ELSE 0 END"
+        for activity_id, _ in activities
+    )
+    return summary_upsert("class_segak_summary", f"""
+        SELECT COALESCE(s.class_id, 0), {term_sql("t.test_date")},
+               COALESCE(t.fitness_level, ''), 0, {sums}
+        FROM segak_test t
+        JOIN student s ON s.student_id = t.student_id
+        WHERE t.test_id = {row}.test_id
+    """)
+
+
+def bump_test_version(row):
+    # versi cache pelajar bagi ujian yang memiliki baris detail ini
+    return f"""
+        INSERT INTO cache_version (name, version)
+        SELECT 'student:' || student_id, 1 FROM segak_test WHERE test_id = {row}.test_id
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+    """
+
+
+def normalize_segak(conn):
+    activities = segak_activity_columns(conn)
+    summed = ", ".join(str(activity_id) for activity_id, _ in activities)
+    student_scope = "'student:' || {row}.student_id"
+
+    # id baru untuk ujian lama yang tiada segak_record, selepas id tertinggi
+    last_id = conn.execute("""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'segak_record'), 0),
+                   COALESCE((SELECT MAX(segak_id) FROM segak_record), 0))
+    """).fetchone()[0]
+
+    conn.execute("""
+        CREATE TEMP TABLE segak_test_copy AS
+        SELECT r.segak_id AS test_id, r.student_id,
+               COALESCE(t.teacher_id, 0) AS teacher_id, r.test_date,
+               t.total_score, r.fitness_level, t.test_id AS old_test_id
+        FROM segak_record r
+        LEFT JOIN segak_test t ON t.segak_id = r.segak_id
+    """)
+    conn.execute("""
+        INSERT INTO segak_test_copy
+        SELECT ? + ROW_NUMBER() OVER (ORDER BY test_id), student_id, teacher_id,
+               test_date, total_score, NULL, test_id
+        FROM segak_test
+        WHERE segak_id IS NULL
+    """, (last_id,))
+
+    # nilai dari lajur segak_record, skor dari segak_detail lama (jika ada)
+    conn.execute("""
+        CREATE TEMP TABLE segak_detail_copy (
+            test_id, activity_id, value_obtained, score,
+            PRIMARY KEY (test_id, activity_id)
+        )
+    """)
+    for activity_id, column in activities:
+        conn.execute(f"""
+            INSERT INTO segak_detail_copy
+            SELECT r.segak_id, {activity_id}, r.{column},
+                   (SELECT MAX(d.score) FROM segak_detail d
+                    WHERE d.test_id = c.old_test_id AND d.activity_id = {activity_id})
+            FROM segak_record r
+            JOIN segak_test_copy c ON c.test_id = r.segak_id
+            WHERE r.{column} IS NOT NULL
+        """)
+    conn.execute("""
+        INSERT OR IGNORE INTO segak_detail_copy
+        SELECT c.test_id, d.activity_id, d.value_obtained, d.score
+        FROM segak_test_copy c
+        JOIN segak_detail d ON d.test_id = c.old_test_id
+        WHERE c.test_id > ?
+    """, (last_id,))
+
+    # trigger lama (ringkasan, cache, progress) hilang bersama jadual
+    run_script(conn, f"""
+        DROP TABLE segak_detail;
+        DROP TABLE segak_test;
+        DROP TABLE segak_record;
+
+        CREATE TABLE segak_test (
+            test_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id     INTEGER NOT NULL
+                           REFERENCES student(student_id) ON DELETE CASCADE,
+            teacher_id     INTEGER NOT NULL,
+            test_date      TEXT NOT NULL,
+            total_score    INTEGER,
+            fitness_level  TEXT
+        );
+        -- disusun ikut ujian: semua aktiviti satu ujian dalam halaman yang sama
+        CREATE TABLE segak_detail (
+            test_id         INTEGER NOT NULL
+                            REFERENCES segak_test(test_id) ON DELETE CASCADE,
+            activity_id     INTEGER NOT NULL REFERENCES SEGAK_activity(activity_id),
+            value_obtained  INTEGER NOT NULL,
+            score           INTEGER,
+            PRIMARY KEY (test_id, activity_id)
+        ) WITHOUT ROWID;
+
+        INSERT INTO segak_test
+            (test_id, student_id, teacher_id, test_date, total_score, fitness_level)
+        SELECT test_id, student_id, teacher_id, test_date, total_score, fitness_level
+        FROM temp.segak_test_copy
+        ORDER BY test_id;
+        INSERT INTO segak_detail (test_id, activity_id, value_obtained, score)
+        SELECT test_id, activity_id, value_obtained, score
+        FROM temp.segak_detail_copy
+        ORDER BY test_id, activity_id;
+        DROP TABLE temp.segak_test_copy;
+        DROP TABLE temp.segak_detail_copy;
+
+        CREATE INDEX idx_segak_test_student_date
+            ON segak_test (student_id, test_date DESC);
+
+        {segak_record_view(activities)}
+
+        -- ringkasan kelas: kiraan ikut ujian, jumlah nilai ikut detail.
+        -- BEFORE DELETE: detail masih ada semasa ujian ditolak; detail yang
+        -- kemudian dipadam oleh cascade tak jumpa ujian lagi -> tiada kesan
+        CREATE TRIGGER trg_segak_test_summary_insert AFTER INSERT ON segak_test
+        BEGIN
+            {segak_test_delta("new", "+", activities)}
+        END;
+
+        CREATE TRIGGER trg_segak_test_summary_delete BEFORE DELETE ON segak_test
+        BEGIN
+            {segak_test_delta("old", "-", activities)}
+        END;
+
+        CREATE TRIGGER trg_segak_test_summary_update
+        AFTER UPDATE OF student_id, test_date, fitness_level ON segak_test
+        BEGIN
+            {segak_test_delta("old", "-", activities)}
+            {segak_test_delta("new", "+", activities)}
+        END;
+
+        CREATE TRIGGER trg_segak_detail_summary_insert AFTER INSERT ON segak_detail
+        WHEN new.activity_id IN ({summed})
+        BEGIN
+            {segak_detail_delta("new", "+", activities)}
+        END;
+
+        CREATE TRIGGER trg_segak_detail_summary_delete AFTER DELETE ON segak_detail
+        WHEN old.activity_id IN ({summed})
+        BEGIN
+            {segak_detail_delta("old", "-", activities)}
+        END;
+
+        CREATE TRIGGER trg_segak_detail_summary_update
+        AFTER UPDATE OF test_id, activity_id, value_obtained ON segak_detail
+        BEGIN
+            {segak_detail_delta("old", "-", activities)}
+            {segak_detail_delta("new", "+", activities)}
+        END;
+
+        CREATE TRIGGER trg_segak_test_cache_insert AFTER INSERT ON segak_test
+        BEGIN
+            {bump_version(student_scope.format(row="new"))}
+        END;
+
+        CREATE TRIGGER trg_segak_test_cache_update AFTER UPDATE ON segak_test
+        BEGIN
+            {bump_version(student_scope.format(row="old"))}
+            {bump_version(student_scope.format(row="new"))}
+        END;
+
+        CREATE TRIGGER trg_segak_test_cache_delete AFTER DELETE ON segak_test
+        BEGIN
+            {bump_version(student_scope.format(row="old"))}
+        END;
+
+        CREATE TRIGGER trg_segak_detail_cache_insert AFTER INSERT ON segak_detail
+        BEGIN
+            {bump_test_version("new")}
+        END;
+
+        CREATE TRIGGER trg_segak_detail_cache_update AFTER UPDATE ON segak_detail
+        BEGIN
+            {bump_test_version("old")}
+            {bump_test_version("new")}
+        END;
+
+        CREATE TRIGGER trg_segak_detail_cache_delete AFTER DELETE ON segak_detail
+        BEGIN
+            {bump_test_version("old")}
+        END;
+
+        {progress_triggers("fitness")}
+    """)
+
+    # jujukan AUTOINCREMENT: id segak_record yang pernah dipadam tak diguna semula
+    conn.execute("""
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'segak_test', ? WHERE NOT EXISTS (
+            SELECT 1 FROM sqlite_sequence WHERE name = 'segak_test'
+        )
+    """, (last_id,))
+    conn.execute(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'segak_test'", (last_id,)
+    )
+
+    # ujian lama tanpa segak_record kini dikira; test_id baru untuk susunan tarikh sama
+    keys, values, select_sql = SUMMARY_TABLES["class_segak_summary"]
+    conn.execute("DELETE FROM class_segak_summary")
+    conn.execute(f"INSERT INTO class_segak_summary ({', '.join(keys + values)}) {select_sql}")
+    conn.execute(progress_refresh("fitness", None))
+
+
+
+# =========================
+# CHANGE LOG & ARKIB REKOD DIPADAM
+# =========================
+# Setiap INSERT/UPDATE/DELETE pada jadual data ditulis oleh trigger ke
+# change_log. seq ialah AUTOINCREMENT (tidak diguna semula) dan SQLite
+# hanya benarkan satu penulis pada satu masa, jadi seq naik ikut susunan
+# commit: pembaca /changes?since=N tidak akan terlepas baris yang commit
+# kemudian dengan seq lebih kecil.
+#
+# Padam ialah soft delete: baris yang dipadam (termasuk anak yang dipadam
+# oleh cascade) disalin ke <jadual>_deleted oleh trigger. Jadual asal
+# hanya ada baris aktif, jadi query, index, ringkasan dan trigger sedia ada
+# tidak perlu tapis baris terpadam. Lihat changes.restore().
+#
+# Senarai lajur dibaca semasa migration; migration yang menambah lajur
+# perlu bina semula trigger ini (change_triggers / archive_table).
+CHANGE_TABLES = {
+    # jadual: lajur untuk change_log.row_id
+    "class": "class_id",
+    "student": "student_id",
+    "bmi_record": "bmi_id",
+    # satu baris bagi setiap aktiviti; kunci penuh (row_id, data.activity_id)
+    "segak_test": "test_id",
+    "segak_detail": "test_id",
+}
+
+ARCHIVED_TABLES = {
+    # jadual: lajur yang diindex untuk restore (rekod sendiri / ikut induk)
+    "student": ("student_id",),
+    "student_user": ("student_id",),
+    "bmi_record": ("bmi_id", "student_id"),
+    "segak_test": ("test_id", "student_id"),
+    "segak_detail": ("test_id",),
+}
+
+# sama bagi semua baris yang dipadam dalam satu statement (cascade)
+DELETED_AT_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def table_columns(conn, table):
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def row_json(row, columns):
+    return "json_object(" + ", ".join(f"'{name}', {row}.{name}" for name, _ in columns) + ")"
+
+
+def change_triggers(table, key, columns):
+    changed = " OR ".join(f"old.{name} IS NOT new.{name}" for name, _ in columns)
+    log = """
+        INSERT INTO change_log (table_name, op, row_id, data, previous, changed_at)
+        VALUES ('{table}', '{op}', {row}.{key}, {data}, {previous}, {at});
+    """
+
+    def entry(op, row, previous="NULL"):
+        return log.format(
+            table=table, op=op, row=row, key=key, data=row_json(row, columns),
+            previous=previous, at="strftime('%Y-%m-%d %H:%M:%S', 'now')"
+        )
+
+    return f"""
+        CREATE TRIGGER trg_{table}_log_insert AFTER INSERT ON {table}
+        BEGIN
+            {entry("insert", "new")}
+        END;
+
+        -- UPDATE tanpa perubahan (borang edit disimpan semula) tidak dilog
+        CREATE TRIGGER trg_{table}_log_update AFTER UPDATE ON {table}
+        WHEN {changed}
+        BEGIN
+            {entry("update", "new", row_json("old", columns))}
+        END;
+
+        CREATE TRIGGER trg_{table}_log_delete AFTER DELETE ON {table}
+        BEGIN
+            {entry("delete", "old")}
+        END;
+    """
+
+
+def archive_table(table, keys, columns):
+    definitions = ",\n".join(f"            {name} {kind}".rstrip() for name, kind in columns)
+    names = ", ".join(name for name, _ in columns)
+    values = ", ".join(f"old.{name}" for name, _ in columns)
+    indexes = "\n".join(
+        f"CREATE INDEX idx_{table}_deleted_{key} ON {table}_deleted ({key});" for key in keys
+    )
+    return f"""
+        CREATE TABLE {table}_deleted (
+{definitions},
+            deleted_at TEXT NOT NULL
+        );
+        {indexes}
+
+        CREATE TRIGGER trg_{table}_archive AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {table}_deleted ({names}, deleted_at)
+            VALUES ({values}, {DELETED_AT_SQL});
+        END;
+    """
+
+
+def add_change_log(conn):
+    run_script(conn, """
+        CREATE TABLE change_log (
+            seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name  TEXT NOT NULL,
+            op          TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+            row_id      INTEGER NOT NULL,
+            -- baris selepas perubahan; bagi delete, baris yang dipadam
+            data        TEXT NOT NULL,
+            -- baris sebelum update (audit)
+            previous    TEXT,
+            changed_at  TEXT NOT NULL
+        );
+        CREATE INDEX idx_change_log_changed_at ON change_log (changed_at);
+    """)
+
+    for table, key in CHANGE_TABLES.items():
+        run_script(conn, change_triggers(table, key, table_columns(conn, table)))
+    for table, keys in ARCHIVED_TABLES.items():
+        run_script(conn, archive_table(table, keys, table_columns(conn, table)))
+
+
+# =========================
+# INDEX CARIAN PELAJAR (FTS5)
+# =========================
+# Nama pelajar dan nama kelas dalam jadual FTS5 (rowid = student_id),
+# dikemas kini oleh trigger bila pelajar ditambah/diubah/dipadam atau
+# kelas dinamakan semula. student_search_vocab senaraikan semua istilah
+# dalam index untuk padanan ejaan hampir (search.py).
+SEARCH_FILL_SQL = """
+    INSERT INTO student_search (rowid, name, class_name)
+    SELECT s.student_id, s.name, c.class_name
+    FROM student s
+    LEFT JOIN class c ON c.class_id = s.class_id
+"""
+
+
+def add_student_search(conn):
+    class_name = "(SELECT class_name FROM class WHERE class_id = new.class_id)"
+    run_script(conn, f"""
+        CREATE VIRTUAL TABLE student_search USING fts5 (
+            name, class_name,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+
+        CREATE VIRTUAL TABLE student_search_vocab USING fts5vocab (student_search, 'row');
+
+        CREATE TRIGGER trg_student_search_insert AFTER INSERT ON student
+        BEGIN
+            INSERT INTO student_search (rowid, name, class_name)
+            VALUES (new.student_id, new.name, {class_name});
+        END;
+
+        CREATE TRIGGER trg_student_search_update
+        AFTER UPDATE OF student_id, name, class_id ON student
+        BEGIN
+            DELETE FROM student_search WHERE rowid = old.student_id;
+            INSERT INTO student_search (rowid, name, class_name)
+            VALUES (new.student_id, new.name, {class_name});
+        END;
+
+        CREATE TRIGGER trg_student_search_delete AFTER DELETE ON student
+        BEGIN
+            DELETE FROM student_search WHERE rowid = old.student_id;
+        END;
+
+        CREATE TRIGGER trg_class_search_update AFTER UPDATE OF class_name ON class
+        BEGIN
+            UPDATE student_search SET class_name = new.class_name
+            WHERE rowid IN (SELECT student_id FROM student WHERE class_id = new.class_id);
+        END;
+    """)
+    conn.execute(SEARCH_FILL_SQL)
+
+
+# =========================
+# REKOD TERKINI PELAJAR
+# =========================
+# Satu baris bagi setiap pelajar: rekod BMI terkini dan ujian SEGAK
+# terkini (tarikh terbaru, id terbesar jika tarikh sama). Laporan, cetak
+# dan status kelas baca baris ini melalui primary key, bukan cari rekod
+# terkini setiap pelajar. Nilai aktiviti SEGAK dibaca dari segak_record
+# ikut segak_id (aktiviti ialah baris, bukan lajur).
+#
+# Insert yang lebih lama dari rekod terkini (tarikh ke belakang) tidak
+# mengubah apa-apa. Padam/ubah rekod terkini cari semula rekod terkini
+# melalui index (student_id, tarikh).
+LATEST_SERIES = {
+    # jadual: (id, lajur id dalam student_latest, tarikh, lajur disalin)
+    "bmi_record": ("bmi_id", "bmi_id", "record_date",
+                   ("height", "weight", "bmi_value", "bmi_status")),
+    "segak_test": ("test_id", "segak_id", "test_date", ("fitness_level", "total_score")),
+}
+
+
+def latest_columns(table):
+    _, latest_key, date, values = LATEST_SERIES[table]
+    return (latest_key, date) + values
+
+
+def latest_select(table, student_sql=None):
+    key, _, date, values = LATEST_SERIES[table]
+    where = f"s.student_id = {student_sql}" if student_sql else "true"
+    return f"""
+        SELECT s.student_id, {", ".join(f"x.{c}" for c in (key, date) + values)}
+        FROM student s
+        LEFT JOIN {table} x ON x.{key} = (
+            SELECT {key} FROM {table}
+            WHERE student_id = s.student_id
+            ORDER BY {date} DESC, {key} DESC
+            LIMIT 1
+        )
+        WHERE {where}
+    """
+
+
+def latest_refresh(table, student_sql=None):
+    # pelajar yang sudah dipadam tiada dalam SELECT -> tiada baris ditulis
+    columns = latest_columns(table)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    return f"""
+        INSERT INTO student_latest (student_id, {", ".join(columns)})
+        {latest_select(table, student_sql)}
+        ON CONFLICT (student_id) DO UPDATE SET {updates};
+    """
+
+
+def latest_triggers(table):
+    key, latest_key, date, values = LATEST_SERIES[table]
+    columns = latest_columns(table)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    is_latest = f"""(SELECT {latest_key} FROM student_latest
+                     WHERE student_id = old.student_id)"""
+    return f"""
+        CREATE TRIGGER trg_{table}_latest_insert AFTER INSERT ON {table}
+        WHEN NOT EXISTS (
+            SELECT 1 FROM student_latest l
+            WHERE l.student_id = new.student_id
+              AND (l.{date} > new.{date}
+                   OR (l.{date} = new.{date} AND l.{latest_key} > new.{key}))
+        )
+        BEGIN
+            INSERT INTO student_latest (student_id, {", ".join(columns)})
+            VALUES (new.student_id, {", ".join(f"new.{c}" for c in (key, date) + values)})
+            ON CONFLICT (student_id) DO UPDATE SET {updates};
+        END;
+
+        CREATE TRIGGER trg_{table}_latest_delete AFTER DELETE ON {table}
+        WHEN old.{key} = {is_latest}
+        BEGIN
+            {latest_refresh(table, "old.student_id")}
+        END;
+
+        CREATE TRIGGER trg_{table}_latest_update
+        AFTER UPDATE OF student_id, {key}, {date}, {", ".join(values)} ON {table}
+        WHEN new.student_id IS NOT old.student_id OR new.{key} IS NOT old.{key}
+             OR new.{date} IS NOT old.{date} OR old.{key} = {is_latest}
+        BEGIN
+            {latest_refresh(table, "old.student_id")}
+            {latest_refresh(table, "new.student_id")}
+        END;
+    """
+
+
+def add_student_latest(conn):
+    run_script(conn, """
+        CREATE TABLE student_latest (
+            student_id     INTEGER PRIMARY KEY
+                           REFERENCES student(student_id) ON DELETE CASCADE,
+            bmi_id         INTEGER,
+            record_date    TEXT,
+            height         REAL,
+            weight         REAL,
+            bmi_value      REAL,
+            bmi_status     TEXT,
+            segak_id       INTEGER,
+            test_date      TEXT,
+            fitness_level  TEXT,
+            total_score    INTEGER
+        );
+    """)
+    for table in LATEST_SERIES:
+        run_script(conn, latest_triggers(table))
+        conn.execute(latest_refresh(table))
+
+
+# =========================
+# ID KLIEN (RAKAMAN LUAR TALIAN)
+# =========================
+# Setiap rekod yang dihantar dari halaman rakaman (capture.py) membawa id
+# yang dijana oleh browser. Id disimpan bersama rekod yang dihasilkan,
+# jadi kumpulan yang dihantar semula (jawapan hilang, rangkaian putus)
+# tidak mencipta rekod berganda. Tiada FK: id kekal walaupun rekod
+# dipadam, supaya hantaran semula tidak mencipta rekod itu semula.
+ADD_CLIENT_ENTRIES = """
+    CREATE TABLE client_entry (
+        client_id    TEXT PRIMARY KEY,
+        kind         TEXT NOT NULL,
+        row_id       INTEGER NOT NULL,
+        student_id   INTEGER NOT NULL,
+        teacher_id   INTEGER,
+        received_at  TEXT NOT NULL DEFAULT (datetime('now'))
+    ) WITHOUT ROWID;
+
+    CREATE INDEX idx_client_entry_received ON client_entry (received_at);
+"""
+
+
+# =========================
+# SEKOLAH GURU (SHARD)
+# =========================
+# Kod sekolah guru, untuk split-shards / create-shard. NULL = belum
+# ditetapkan: guru masuk ke shard sekolah tempat dia merekod ujian.
+TEACHER_SCHOOL = """
+    ALTER TABLE teacher ADD COLUMN school TEXT;
+"""
+
+
+# =========================
+# VERSI NORMA
+# =========================
+# Indeks norma dalam memori (norms.get_index) dimuat semula bila versi
+# 'norms' berubah, jadi band yang disunting dalam segak_norm terus dipakai
+# oleh setiap worker. Skor rekod lama dikira semula dengan `flask reclassify`.
+def add_norm_versions(conn):
+    for table in ("segak_norm", "SEGAK_activity"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            run_script(conn, f"""
+                CREATE TRIGGER trg_{table.lower()}_cache_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    {bump_version("'norms'")}
+                END;
+            """)
+
+
+MIGRATIONS = [
+    (1, "foreign keys with ON DELETE CASCADE", add_foreign_keys),
+    (2, "indexes for hot lookup columns", HOT_PATH_INDEXES),
+    (3, "SEGAK norm tables by activity, gender and age", add_segak_norms),
+    (4, "class and term summary tables", add_class_summaries),
+    (5, "cache version counters", add_cache_versions),
+    (6, "case-insensitive student name index", """
+        CREATE INDEX IF NOT EXISTS idx_student_name_nocase
+            ON student (name COLLATE NOCASE);
+    """),
+    (7, "background job queue", JOB_QUEUE),
+    (8, "student progress analytics", add_student_progress),
+    (9, "normalized SEGAK tests, segak_record view", normalize_segak),
+    (10, "change log and deleted-row archive", add_change_log),
+    (11, "student full-text search index", add_student_search),
+    (12, "latest BMI and SEGAK record per student", add_student_latest),
+    (13, "client ids for offline capture uploads", ADD_CLIENT_ENTRIES),
+    (14, "school code per teacher", TEACHER_SCHOOL),
+    (15, "cache version for SEGAK norms", add_norm_versions),
+]
+
+
+# =========================
+# RUNNER
+# =========================
+def current_version(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            applied_at  TEXT NOT NULL
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    # foreign_keys mesti OFF semasa jadual dibina semula (dan hanya boleh
+    # ditukar di luar transaction)
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys = OFF")
+    applied = []
+
+    try:
+        for version, name, step in MIGRATIONS:
+            # BEGIN IMMEDIATE supaya dua worker tak jalankan migration sama
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if version <= current_version(conn):
+                    conn.rollback()
+                    continue
+
+                if callable(step):
+                    step(conn)
+                else:
+                    run_script(conn, step)
+
+                problems = conn.execute("PRAGMA foreign_key_check").fetchall()
+                if problems:
+                    raise RuntimeError(
+                        f"migration {version} left {len(problems)} foreign key violations"
+                    )
+
+                conn.execute(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (version, name, time.strftime("%Y-%m-%d %H:%M:%S"))
+                )
+                conn.commit()
+                applied.append((version, name))
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.execute("PRAGMA foreign_keys = ON")
+
+    return applied
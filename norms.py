@@ -0,0 +1,138 @@
+import threading
+
+import numpy as np
+
+import cache
+from classification import fitness_batch, fitness_from_total_batch
+
+# =========================
+# SEGAK NORM INDEX
+# =========================
+# Norma dalam jadual segak_norm (band nilai -> skor 1-5 bagi setiap
+# aktiviti, jantina dan umur) dimuat ke dalam memori bagi setiap fail DB
+# (shard), dan dimuat semula hanya bila versi cache 'norms' berubah
+# (trigger migration 15). Setiap (aktiviti, jantina, umur) jadi array
+# padat: skor = table[nilai], O(1).
+
+# lajur segak_record bagi setiap aktiviti dalam SEGAK_activity
+ACTIVITY_COLUMNS = (
+    ("Step Test", "step_test"),
+    ("Push Up", "push_up"),
+    ("Sit Up", "sit_up"),
+    ("Sit and Reach", "sit_reach"),
+)
+
+# nilai terbesar yang diindeks (kadar nadi step test < 250)
+VALUE_CAP = 250
+
+# guru tidak diketahui (import CSV / skor semula rekod lama)
+SYSTEM_TEACHER_ID = 0
+
+
+class NormIndex:
+    def __init__(self, activity_ids, bands):
+        self.activity_ids = [activity_ids[name] for name, _ in ACTIVITY_COLUMNS]
+        self.tables = {}
+        self.ages = {}
+
+        for activity_id, gender, age, score, low, high in bands:
+            key = (activity_id, gender, age)
+            if key not in self.tables:
+                self.tables[key] = np.zeros(VALUE_CAP + 1, dtype=np.int8)
+            high = VALUE_CAP if high is None else min(int(high), VALUE_CAP)
+            self.tables[key][int(low):high + 1] = score
+            self.ages.setdefault(gender, set()).add(age)
+
+        self.ages = {g: (min(a), max(a)) for g, a in self.ages.items()}
+
+    @classmethod
+    def load(cls, conn):
+        activity_ids = dict(conn.execute(
+            "SELECT activity_name, activity_id FROM SEGAK_activity"
+        ))
+        bands = conn.execute("""
+            SELECT activity_id, gender, age, score, min_value, max_value
+            FROM segak_norm
+        """).fetchall()
+        return cls(activity_ids, bands)
+
+    def table(self, activity_id, gender, age):
+        # umur di luar julat norma -> guna umur terdekat
+        if gender not in self.ages or age is None:
+            return None
+        youngest, oldest = self.ages[gender]
+        age = min(max(int(age), youngest), oldest)
+        return self.tables.get((activity_id, gender, age))
+
+    def score(self, activity_id, gender, age, value):
+        table = self.table(activity_id, gender, age)
+        if table is None or value is None:
+            return 0
+        return int(table[min(max(int(value), 0), VALUE_CAP)])
+
+    def score_batch(self, activity_id, genders, ages, values):
+        values = np.asarray(values, dtype=float)
+        missing = np.isnan(values)
+        values = np.clip(np.nan_to_num(values), 0, VALUE_CAP).astype(np.int64)
+        scores = np.zeros(len(values), dtype=np.int8)
+
+        # kumpul ikut (jantina, umur): paling banyak ~10 kumpulan
+        keys = np.array([f"{g}|{a}" for g, a in zip(genders, ages)])
+        for key in np.unique(keys):
+            gender, age = key.split("|")
+            table = self.table(activity_id, gender, None if age == "None" else age)
+            if table is None:
+                continue
+            mask = keys == key
+            scores[mask] = table[values[mask]]
+
+        scores[missing] = 0
+        return scores
+
+
+# fail DB -> (versi 'norms', NormIndex)
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_index(conn):
+    path = getattr(conn, "path", None)
+    version = cache.versions(conn, ("norms",))
+    found = _indexes.get(path)
+    if found is None or found[0] != version:
+        with _index_lock:
+            found = _indexes.get(path)
+            if found is None or found[0] != version:
+                found = _indexes[path] = (version, NormIndex.load(conn))
+    return found[1]
+
+
+# =========================
+# SCORING
+# =========================
+def score_segak(index, genders, ages, step_test, push_up, sit_up, sit_reach):
+    # pulangkan (skor n x 4, jumlah skor atau None, tahap kecergasan)
+    values = (step_test, push_up, sit_up, sit_reach)
+    scores = np.column_stack([
+        index.score_batch(activity_id, genders, ages, column)
+        for activity_id, column in zip(index.activity_ids, values)
+    ])
+    totals = scores.sum(axis=1)
+    complete = (scores > 0).all(axis=1)
+
+    # tiada norma (jantina/umur kosong) -> ladder rata lama
+    levels = np.where(
+        complete,
+        fitness_from_total_batch(totals),
+        fitness_batch(push_up, sit_up, sit_reach)
+    )
+    totals = [int(t) if c else None for t, c in zip(totals, complete)]
+    return scores.tolist(), totals, levels.tolist()
+
+
+def score_one(index, gender, age, step_test, push_up, sit_up, sit_reach):
+    scores, totals, levels = score_segak(
+        index, [gender], [age], [step_test], [push_up], [sit_up], [sit_reach]
+    )
+    return scores[0], totals[0], levels[0]
+
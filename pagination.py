@@ -0,0 +1,59 @@
+import base64
+import json
+
+# =========================
+# KEYSET PAGINATION
+# =========================
+# Cursor menyimpan kunci susunan (ORDER BY) baris terakhir yang dipaparkan,
+# jadi halaman seterusnya terus "seek" melalui index tanpa OFFSET.
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def encode_cursor(key, position):
+    raw = json.dumps({"k": list(key), "n": position}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    # cursor rosak/lama -> mula semula dari halaman pertama
+    if not token:
+        return None, 0
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return data["k"], int(data["n"])
+    except (ValueError, KeyError, TypeError):
+        return None, 0
+
+
+def page_args(args, key_size):
+    per_page = args.get("per_page", DEFAULT_PER_PAGE, type=int)
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    key, start = decode_cursor(args.get("after"))
+    # cursor dari senarai lain (bilangan kunci tak sama) diabaikan
+    if key is not None and len(key) != key_size:
+        return per_page, None, 0
+    return per_page, key, start
+
+
+class Page:
+    # Satu halaman hasil query. Query perlu LIMIT per_page + 1 supaya kita
+    # tahu ada halaman seterusnya tanpa COUNT(*) ke atas seluruh jadual.
+
+    def __init__(self, rows, per_page, key, start=0):
+        self.rows = rows[:per_page]
+        self.per_page = per_page
+        self.key = key
+        self.start = start
+        self.count = len(self.rows)
+        self.has_next = len(rows) > per_page
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        return encode_cursor(self.key(self.rows[-1]), self.start + self.count)
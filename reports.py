@@ -0,0 +1,231 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+import cache
+
+# =========================
+# REPORT CARD PUKAL (KELAS / TINGKATAN)
+# =========================
+# Data semua pelajar dibaca dengan SATU query, report card dirender
+# selari dalam process pool, dan hasilnya (HTML bercetak atau ZIP)
+# disimpan dalam REPORT_DIR. Nama fail ialah hash versi cache_version
+# semua pelajar terlibat, jadi fail yang sama diguna semula sehingga
+# rekod berubah.
+#
+# Report dibina oleh job "report" dalam job queue (jobs.py); kemajuan
+# dan ralat dibaca dari jadual job oleh mana-mana worker gunicorn.
+FORMATS = ("html", "zip")
+
+# kurang dari ini (atau 1 CPU), render terus: kos mula process pool lebih besar
+POOL_THRESHOLD = 60
+CHUNK_CARDS = 25
+
+MAX_AGE_SECONDS = 24 * 3600
+
+KEY_PATTERN = re.compile(r"^[0-9a-f]{16}\.(html|zip)$")
+
+
+# =========================
+# SKOP DAN CACHE KEY
+# =========================
+def year_of(class_name):
+    # "1 Amanah" -> "1"
+    return class_name.split()[0] if class_name.split() else class_name
+
+
+def scope_classes(conn, class_id=None, year=None):
+    classes = cache.class_list(conn)
+    if class_id is not None:
+        return [c for c in classes if c["class_id"] == class_id]
+    if year:
+        return [c for c in classes if year_of(c["class_name"]) == year]
+    return []
+
+
+def report_key(conn, classes, fmt):
+    # susunan tetap: kunci yang sama tidak bergantung pada pelan query
+    class_ids = sorted(c["class_id"] for c in classes)
+    student_ids = [
+        r[0] for r in conn.execute(
+            f"SELECT student_id FROM student WHERE class_id IN ({', '.join('?' * len(class_ids))})"
+            " ORDER BY student_id",
+            class_ids
+        )
+    ]
+    scopes = ["classes", "roster"] + [f"student:{sid}" for sid in student_ids]
+    versions = cache.versions(conn, scopes)
+    digest = hashlib.sha1(
+        json.dumps([class_ids, student_ids, versions]).encode()
+    ).hexdigest()[:16]
+    return f"{digest}.{fmt}"
+
+
+# =========================
+# DATA (SATU QUERY)
+# =========================
+# Rekod terkini setiap pelajar dari student_latest (migration 12): satu
+# lookup primary key bagi setiap pelajar, nilai aktiviti SEGAK ikut segak_id
+LATEST_SQL = """
+    SELECT s.student_id, s.name, s.gender, s.age, c.class_name AS class,
+           l.record_date, l.height, l.weight, l.bmi_value, l.bmi_status,
+           l.test_date, r.step_test, r.push_up, r.sit_up, r.sit_reach, l.fitness_level
+    FROM student s
+    LEFT JOIN class c ON c.class_id = s.class_id
+    LEFT JOIN student_latest l ON l.student_id = s.student_id
+    LEFT JOIN segak_record r ON r.segak_id = l.segak_id
+"""
+
+REPORT_SQL = LATEST_SQL + """
+    WHERE s.class_id IN ({ids})
+    ORDER BY c.class_name, s.name, s.student_id
+"""
+
+STUDENT_SQL = LATEST_SQL + """
+    WHERE s.student_id = ?
+"""
+
+STUDENT_COLUMNS = ("student_id", "name", "gender", "age", "class")
+BMI_COLUMNS = ("record_date", "height", "weight", "bmi_value", "bmi_status")
+SEGAK_COLUMNS = ("test_date", "step_test", "push_up", "sit_up", "sit_reach", "fitness_level")
+
+
+def report_row(row):
+    return {
+        "student": {k: row[k] for k in STUDENT_COLUMNS},
+        "bmi": {k: row[k] for k in BMI_COLUMNS} if row["record_date"] else None,
+        "segak": {k: row[k] for k in SEGAK_COLUMNS} if row["test_date"] else None,
+    }
+
+
+def report_rows(conn, class_ids):
+    ids = ", ".join("?" * len(class_ids))
+    return [report_row(row) for row in conn.execute(REPORT_SQL.format(ids=ids), class_ids)]
+
+
+def student_report(conn, student_id):
+    # satu pelajar (cetak laporan sendiri); None jika pelajar tiada
+    row = conn.execute(STUDENT_SQL, (student_id,)).fetchone()
+    return report_row(row) if row is not None else None
+
+
+# =========================
+# RENDER
+# =========================
+_env = None
+
+
+def template_env(template_dir):
+    # Jinja sendiri (tanpa Flask) supaya boleh jalan dalam process pool
+    global _env
+    if _env is None:
+        _env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(["html"])
+        )
+    return _env
+
+
+def render_cards(template_dir, rows):
+    template = template_env(template_dir).get_template("report_card.html")
+    return [template.render(bundle=True, **row) for row in rows]
+
+
+def render_all(template_dir, rows, progress):
+    chunks = [rows[i:i + CHUNK_CARDS] for i in range(0, len(rows), CHUNK_CARDS)]
+    cards = []
+
+    if len(rows) < POOL_THRESHOLD or (os.cpu_count() or 1) < 2:
+        for chunk in chunks:
+            cards += render_cards(template_dir, chunk)
+            progress(len(cards))
+        return cards
+
+    # spawn: process baru yang bersih, bukan fork dari process Flask berthread
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=context) as pool:
+        for result in pool.map(render_cards, [template_dir] * len(chunks), chunks):
+            cards += result
+            progress(len(cards))
+    return cards
+
+
+def bundle_html(template_dir, cards, title):
+    template = template_env(template_dir).get_template("report_bundle.html")
+    return template.render(title=title, cards=[Markup(card) for card in cards])
+
+
+def safe_name(text):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(text)).strip("_")
+
+
+def write_output(path, fmt, template_dir, rows, cards, title):
+    tmp_path = path + ".tmp"
+    if fmt == "html":
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(bundle_html(template_dir, cards, title))
+    else:
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for row, card in zip(rows, cards):
+                student = row["student"]
+                name = f"{safe_name(student['class'])}/{safe_name(student['name'])}_{student['student_id']}.html"
+                zf.writestr(name, bundle_html(template_dir, [card], student["name"]))
+    # ganti secara atomik: pembaca tak pernah nampak fail separuh
+    os.replace(tmp_path, path)
+
+
+# =========================
+# JOB & STATUS
+# =========================
+def output_path(report_dir, key):
+    return os.path.join(report_dir, key)
+
+
+def job_key(key):
+    return f"report:{key}"
+
+
+def status(report_dir, key, job):
+    # ("done", None, None) / ("running", siap, jumlah) / ("failed", mesej, None) / None
+    if os.path.exists(output_path(report_dir, key)):
+        return "done", None, None
+    if job is None or job["status"] == "done":
+        # fail sudah dibuang oleh prune
+        return None
+    if job["status"] == "failed":
+        return "failed", job["error"], None
+    return "running", job["progress"], job["total"]
+
+
+def prune(report_dir):
+    now = time.time()
+    for name in os.listdir(report_dir):
+        path = os.path.join(report_dir, name)
+        try:
+            if now - os.path.getmtime(path) > MAX_AGE_SECONDS:
+                os.remove(path)
+        except FileNotFoundError:
+            # dipadam oleh worker lain serentak
+            pass
+
+
+def build(conn, report_dir, template_dir, key, class_ids, title, progress):
+    # dijalankan oleh job "report" (jobs.py)
+    os.makedirs(report_dir, exist_ok=True)
+    prune(report_dir)
+    if os.path.exists(output_path(report_dir, key)):
+        return 0
+
+    rows = report_rows(conn, class_ids)
+    progress(0, len(rows))
+    cards = render_all(template_dir, rows, lambda done: progress(done, len(rows)))
+    write_output(output_path(report_dir, key), key.split(".")[1], template_dir, rows, cards, title)
+    return len(cards)
@@ -0,0 +1,194 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+import cache
+from migrations import SEARCH_FILL_SQL
+
+# =========================
+# CARIAN PELAJAR (FTS5)
+# =========================
+# Index student_search (migration 11) simpan nama pelajar dan nama kelas.
+# Carian dua fasa:
+# 1. awalan: setiap perkataan jadi "perkataan"*, semua mesti ada
+#    ("ahmad 4 bes" -> Ahmad dalam kelas 4 Bestari);
+# 2. ejaan hampir: jika belum cukup hasil, setiap perkataan diganti
+#    dengan istilah dalam index yang jaraknya 1-2 huruf
+#    ("Muhamad" -> muhammad, "Abdulah" -> abdullah).
+#
+# Hasil fasa 1 didahulukan. Setiap fasa ambil `limit` padanan pertama
+# ikut susunan index (student_id) dan susun halaman itu ikut nama: awalan
+# pendek seperti "mu" padan ribuan pelajar, dan susun semuanya ikut nama
+# (atau bm25) ambil 10-20 ms pada skala daerah. Taip lebih huruf untuk
+# kecilkan senarai.
+#
+# Istilah index dibaca dari student_search_vocab dan dicache (skop
+# "roster") bersama index trigram, jadi fasa 2 tidak imbas semua istilah.
+SEARCH_LIMIT = 20
+# perkataan lebih pendek tidak dicari secara ejaan hampir
+MIN_FUZZY_LENGTH = 3
+# istilah pengganti paling banyak bagi setiap perkataan
+MAX_FUZZY_TERMS = 8
+
+# sama seperti tokenizer unicode61: huruf dan nombor, "_" pemisah
+WORD = re.compile(r"[^\W_]+")
+
+
+def fold(text):
+    # huruf kecil tanpa diakritik, sama seperti remove_diacritics
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def words(text):
+    return WORD.findall(fold(text))
+
+
+def max_distance(word):
+    if len(word) < MIN_FUZZY_LENGTH or not word.isalpha():
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def distance(a, b, limit):
+    # jarak Damerau (OSA): tukar, tambah, buang atau songsang dua huruf.
+    # Berhenti awal bila semua nilai dalam baris melebihi limit.
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+# =========================
+# ISTILAH INDEX (DICACHE)
+# =========================
+def trigrams(term):
+    padded = f"^{term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def load_vocabulary(conn):
+    # (istilah tersusun, bilangan pelajar, {trigram: [indeks istilah]})
+    terms = []
+    counts = []
+    grams = {}
+    for term, students in conn.execute(
+        "SELECT term, doc FROM student_search_vocab WHERE term GLOB '[a-z]*'"
+    ):
+        if len(term) < MIN_FUZZY_LENGTH - 1:
+            continue
+        for gram in trigrams(term):
+            grams.setdefault(gram, []).append(len(terms))
+        terms.append(term)
+        counts.append(students)
+    return terms, counts, grams
+
+
+def vocabulary(conn):
+    return cache.cached(conn, "search_vocabulary", ("roster",), lambda: load_vocabulary(conn))
+
+
+def known_prefix(conn, word):
+    # ada istilah index yang bermula dengan word (ejaan mungkin betul)
+    terms = vocabulary(conn)[0]
+    i = bisect_left(terms, word)
+    return i < len(terms) and terms[i].startswith(word)
+
+
+def similar_terms(conn, word):
+    # istilah index dalam jarak max_distance(word), paling dekat dan
+    # paling biasa dahulu
+    limit = max_distance(word)
+    if not limit:
+        return []
+    terms, counts, grams = vocabulary(conn)
+
+    # satu suntingan ubah paling banyak 4 trigram (songsang dua huruf),
+    # jadi istilah dalam jarak k berkongsi sekurang-kurangnya len(word) - 4k
+    wanted = trigrams(word)
+    shared = Counter()
+    for gram in wanted:
+        shared.update(grams.get(gram, ()))
+    needed = max(1, len(wanted) - 4 * limit)
+
+    found = []
+    for index, count in shared.items():
+        term = terms[index]
+        if count < needed or term == word or abs(len(term) - len(word)) > limit:
+            continue
+        d = distance(word, term, limit)
+        if d <= limit:
+            found.append((d, -counts[index], term))
+    return [term for _, _, term in sorted(found)[:MAX_FUZZY_TERMS]]
+
+
+# =========================
+# CARIAN
+# =========================
+RESULT_SQL = """
+    SELECT s.student_id, s.name, s.gender, s.class_id,
+           c.class_name AS class
+    FROM student s
+    LEFT JOIN class c ON c.class_id = s.class_id
+    WHERE s.student_id IN (
+        SELECT rowid FROM student_search
+        WHERE student_search MATCH ? {exclude}
+        LIMIT ?
+    )
+    ORDER BY s.name COLLATE NOCASE
+"""
+
+
+def match_query(groups):
+    # [[istilah awalan, istilah tepat...], ...] -> ("a"* OR "b") AND (...)
+    parts = []
+    for prefix, *exact in groups:
+        options = [f'"{prefix}"*'] + [f'"{term}"' for term in exact]
+        parts.append(options[0] if len(options) == 1 else f"({' OR '.join(options)})")
+    return " AND ".join(parts)
+
+
+def search_students(conn, text, limit=SEARCH_LIMIT):
+    query_words = words(text)
+    if not query_words:
+        return []
+
+    rows = conn.execute(
+        RESULT_SQL.format(exclude=""),
+        (match_query([[word] for word in query_words]), limit)
+    ).fetchall()
+    if len(rows) >= limit:
+        return rows
+
+    # beberapa perkataan ("4 bestari ami"): hanya perkataan yang tiada dalam
+    # index diganti, supaya kelas dan nama yang betul tidak jadi OR besar
+    groups = [
+        [word] + (similar_terms(conn, word)
+                  if len(query_words) == 1 or not known_prefix(conn, word) else [])
+        for word in query_words
+    ]
+    if all(len(group) == 1 for group in groups):
+        return rows
+
+    found = [row["student_id"] for row in rows]
+    exclude = f"AND rowid NOT IN ({', '.join('?' * len(found))})" if found else ""
+    return rows + conn.execute(
+        RESULT_SQL.format(exclude=exclude),
+        (match_query(groups), *found, limit - len(rows))
+    ).fetchall()
+
+
+def rebuild(conn):
+    # isi semula index dari jadual student/class (shard baru, pembaikan)
+    conn.execute("DELETE FROM student_search")
+    conn.execute(SEARCH_FILL_SQL)
@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    # pilihan sahaja; tanpa brotli, gzip digunakan
+    brotli = None
+
+# =========================
+# STATIC ASSET CACHING
+# =========================
+# url_for('static', ...) ditambah ?v=<hash kandungan>. URL berubah bila
+# fail berubah, jadi URL bertanda boleh dicache setahun oleh browser.
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_hashes = {}
+
+
+def asset_hash(static_folder, filename):
+    path = os.path.join(static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    _hashes[path] = (mtime, digest)
+    return digest
+
+
+# =========================
+# COMPRESSION
+# =========================
+COMPRESS_MIMETYPES = {"text/html", "text/css", "text/javascript", "application/json"}
+# respons kecil tak berbaloi dimampat
+COMPRESS_MIN_BYTES = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encoding(header):
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in header.split(",")
+        if not part.strip().endswith(";q=0")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+
+    encoding = accepted_encoding(request.headers.get("Accept-Encoding", ""))
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    @app.url_defaults
+    def static_version(endpoint, values):
+        if endpoint == "static" and "filename" in values and "v" not in values:
+            digest = asset_hash(app.static_folder, values["filename"])
+            if digest:
+                values["v"] = digest
+
+    @app.after_request
+    def cache_and_compress(response):
+        if request.endpoint == "static":
+            version = request.args.get("v")
+            filename = (request.view_args or {}).get("filename")
+            # hanya URL dengan hash semasa; URL lama/tanpa ?v disemak semula (ETag)
+            if version and version == asset_hash(app.static_folder, filename):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = STATIC_MAX_AGE
+                response.cache_control.immutable = True
+            return response
+        return compress(response)
@@ -0,0 +1,369 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import auth
+import db
+import search
+import summary
+from classification import BMI_LABELS, FITNESS_LABELS
+from migrations import table_columns
+
+# =========================
+# SHARD IKUT SEKOLAH
+# =========================
+# Dengan SEGAK_SHARD_DIR, setiap sekolah ada fail DB sendiri
+# (<dir>/<kod sekolah>.db) dengan skema penuh. Request dihala ke shard
+# dari session["school"] (ditetapkan semasa login), jadi tulisan di satu
+# sekolah tidak menunggu kunci tulis sekolah lain dan setiap fail kecil
+# untuk dibackup. Tanpa SEGAK_SHARD_DIR, satu fail (SEGAK_DATABASE)
+# seperti biasa: satu "shard" tanpa nama (None).
+SCHOOL_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+# kod sekolah di hujung nama kelas: "1 Bestari (SMK001)"
+CLASS_SCHOOL_PATTERN = re.compile(r"\(([A-Za-z0-9_-]{1,32})\)\s*$")
+SHARD_SUFFIX = ".db"
+
+
+class UnknownSchool(Exception):
+    pass
+
+
+class Router:
+    def __init__(self, database, shard_dir=None):
+        self.database = database
+        self.shard_dir = shard_dir
+        self._schools = (None, ())
+        self._lock = threading.Lock()
+
+    @property
+    def sharded(self):
+        return self.shard_dir is not None
+
+    def schools(self):
+        # senarai dibaca semula hanya bila kandungan direktori berubah (mtime)
+        if not self.sharded:
+            return [None]
+        try:
+            mtime = os.stat(self.shard_dir).st_mtime_ns
+        except FileNotFoundError:
+            # direktori belum dibuat (split-shards / create-shard): tiada sekolah
+            return []
+        stamp, schools = self._schools
+        if stamp != mtime:
+            schools = tuple(sorted(
+                name[:-len(SHARD_SUFFIX)] for name in os.listdir(self.shard_dir)
+                if name.endswith(SHARD_SUFFIX)
+                and SCHOOL_PATTERN.match(name[:-len(SHARD_SUFFIX)])
+            ))
+            with self._lock:
+                self._schools = (mtime, schools)
+        return list(schools)
+
+    def shard_path(self, school):
+        if not school or not SCHOOL_PATTERN.match(school):
+            raise UnknownSchool(school)
+        return os.path.join(self.shard_dir, school + SHARD_SUFFIX)
+
+    def path(self, school):
+        if not self.sharded:
+            return self.database
+        if school not in self.schools():
+            raise UnknownSchool(school)
+        return self.shard_path(school)
+
+
+def school_of(class_name, default):
+    match = CLASS_SCHOOL_PATTERN.search(class_name or "")
+    return match.group(1) if match else default
+
+
+# =========================
+# FAN-OUT SELARI
+# =========================
+# Satu tugasan bagi setiap shard dalam thread pool. sqlite3 lepaskan GIL
+# semasa query berjalan, jadi shard dibaca serentak. Connection diambil
+# dari pool setiap shard (db.pool) dan dipulangkan selepas tugasan.
+FANOUT_THREADS = max(2, os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def configure(threads):
+    global _executor, FANOUT_THREADS
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        FANOUT_THREADS = threads
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=FANOUT_THREADS, thread_name_prefix="shard-fanout"
+                )
+    return _executor
+
+
+def _run(path, factory, func):
+    pool = db.pool(path, factory)
+    conn = pool.acquire()
+    try:
+        return func(conn)
+    finally:
+        pool.release(conn)
+
+
+def fan_out(router, func, factory=db.Connection, schools=None):
+    # pulang [(sekolah, hasil)] ikut susunan sekolah; ralat satu shard dibangkitkan
+    schools = router.schools() if schools is None else schools
+    paths = [router.path(school) for school in schools]
+    if len(paths) == 1:
+        return [(schools[0], _run(paths[0], factory, func))]
+    futures = [executor().submit(_run, path, factory, func) for path in paths]
+    return [(school, future.result()) for school, future in zip(schools, futures)]
+
+
+# =========================
+# LOGIN MERENTAS SHARD
+# =========================
+def find_accounts(router, email, factory=db.Connection):
+    # [(sekolah, akaun)]: email dicari dalam setiap shard (index UNIQUE)
+    return [
+        (school, account)
+        for school, accounts in fan_out(
+            router, lambda conn: auth.find_accounts(conn, email), factory
+        )
+        for account in accounts
+    ]
+
+
+# =========================
+# RINGKASAN DAERAH
+# =========================
+def school_summary(conn):
+    # dari jadual ringkasan sahaja: O(kelas x penggal) baris bagi setiap shard
+    students, bmi_records, segak_tests, classes = summary.totals(conn)
+    bmi = {}
+    for term, status, count, bmi_sum in conn.execute("""
+        SELECT term, bmi_status, SUM(record_count), SUM(bmi_sum)
+        FROM class_bmi_summary
+        GROUP BY 1, 2
+        HAVING SUM(record_count) > 0
+    """):
+        bmi.setdefault(term, {})[status] = (count, bmi_sum)
+    fitness = {}
+    for term, level, count in conn.execute("""
+        SELECT term, fitness_level, SUM(record_count)
+        FROM class_segak_summary
+        GROUP BY 1, 2
+        HAVING SUM(record_count) > 0
+    """):
+        fitness.setdefault(term, {})[level] = count
+    return {
+        "classes": classes, "students": students,
+        "bmi_records": bmi_records, "segak_tests": segak_tests,
+        "bmi": bmi, "fitness": fitness,
+    }
+
+
+TOTALS = ("classes", "students", "bmi_records", "bmi_sum", "segak_tests", "fitness_points")
+
+
+def district_rows(results, term):
+    # satu baris bagi setiap sekolah + jumlah daerah (school = None);
+    # purata dikira seperti summary.term_trend (tahap kosong = 0 mata)
+    rows = []
+    total = {"school": None, "bmi": dict.fromkeys(BMI_LABELS, 0),
+             "fitness": dict.fromkeys(FITNESS_LABELS, 0), **dict.fromkeys(TOTALS, 0)}
+    for school, found in results:
+        by_status = found["bmi"].get(term, {})
+        by_level = found["fitness"].get(term, {})
+        row = {
+            "school": school,
+            "classes": found["classes"],
+            "students": found["students"],
+            "bmi": {label: by_status.get(label, (0, 0))[0] for label in BMI_LABELS},
+            "bmi_records": sum(count for count, _ in by_status.values()),
+            "bmi_sum": sum(bmi_sum for _, bmi_sum in by_status.values()),
+            "fitness": {label: by_level.get(label, 0) for label in FITNESS_LABELS},
+            "segak_tests": sum(by_level.values()),
+            "fitness_points": sum(
+                summary.FITNESS_POINTS.get(level, 0) * count for level, count in by_level.items()
+            ),
+        }
+        rows.append(row)
+        for key in TOTALS:
+            total[key] += row[key]
+        for key in ("bmi", "fitness"):
+            for label, count in row[key].items():
+                total[key][label] += count
+
+    for row in rows + [total]:
+        row["mean_bmi"] = (
+            round(row["bmi_sum"] / row["bmi_records"], 1) if row["bmi_records"] else None
+        )
+        row["mean_fitness"] = (
+            round(row["fitness_points"] / row["segak_tests"], 2) if row["segak_tests"] else None
+        )
+    return rows, total
+
+
+def district_terms(results):
+    return sorted({term for _, found in results for term in found["bmi"]} |
+                  {term for _, found in results for term in found["fitness"]}, reverse=True)
+
+
+# =========================
+# BINA SHARD (PECAH / BARU)
+# =========================
+# Skema disalin dari sumber (jadual, index, view; trigger selepas data),
+# data sekolah disalin dengan INSERT ... SELECT dari DB sumber (ATTACH),
+# kemudian jadual ringkasan dibina semula. Log perubahan, arkib padam,
+# job dan versi cache bermula kosong dalam shard baru.
+# Guru: teacher.school sekolah ini, atau (school NULL) guru yang merekod
+# ujian pelajar sekolah ini; guru tanpa sekolah dan tanpa rekod masuk ke
+# shard lalai. Guru di beberapa shard memilih sekolah semasa login.
+STUDENT_FILTER = "student_id IN (SELECT student_id FROM temp.shard_student)"
+SHARD_TEACHER_SQL = f"""
+    CREATE TEMP TABLE shard_teacher AS
+    SELECT teacher_id FROM src.teacher t
+    WHERE t.school = :school
+       OR t.school IS NULL AND (
+              t.teacher_id IN (SELECT teacher_id FROM src.segak_test WHERE {STUDENT_FILTER})
+           OR t.teacher_id IN (SELECT teacher_id FROM src.client_entry WHERE {STUDENT_FILTER})
+           OR :unassigned
+              AND NOT EXISTS (SELECT 1 FROM src.segak_test WHERE teacher_id = t.teacher_id)
+              AND NOT EXISTS (SELECT 1 FROM src.client_entry WHERE teacher_id = t.teacher_id)
+       )
+"""
+SHARD_FILTERS = {
+    "class": "class_id IN (SELECT class_id FROM temp.shard_class)",
+    "teacher": "teacher_id IN (SELECT teacher_id FROM temp.shard_teacher)",
+    "student": STUDENT_FILTER,
+    "student_user": STUDENT_FILTER,
+    "bmi_record": STUDENT_FILTER,
+    "segak_test": STUDENT_FILTER,
+    "student_progress": STUDENT_FILTER,
+    "student_latest": STUDENT_FILTER,
+    "client_entry": STUDENT_FILTER,
+    "segak_detail": f"test_id IN (SELECT test_id FROM src.segak_test WHERE {STUDENT_FILTER})",
+}
+SHARD_EMPTY = {"change_log", "job", "cache_version"}
+ARCHIVE_SUFFIX = "_deleted"
+
+
+def build_shard(source_path, target_path, school, class_ids, unassigned=False):
+    # class_ids: kelas sekolah ini; unassigned: termasuk pelajar dan guru
+    # tanpa sekolah
+    if os.path.exists(target_path):
+        raise FileExistsError(target_path)
+    # skema disalin dari sumber: pastikan sumber sudah dimigrate
+    source = db.open_connection(source_path)
+    db.ensure_migrated(source, source_path)
+    source.close()
+
+    conn = db.open_connection(target_path)
+    try:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("ATTACH DATABASE ? AS src", (source_path,))
+        objects = conn.execute("""
+            SELECT type, name, sql FROM src.sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1
+                               WHEN 'view' THEN 2 ELSE 3 END, rowid
+        """).fetchall()
+        # jadual FTS5: CREATE VIRTUAL TABLE bina jadual shadow sendiri, dan
+        # index diisi semula selepas data disalin
+        virtual = {
+            name for _, name, kind, *_ in conn.execute("PRAGMA src.table_list")
+            if kind in ("virtual", "shadow")
+        }
+
+        conn.execute("BEGIN")
+        conn.execute("CREATE TEMP TABLE shard_class (class_id INTEGER PRIMARY KEY)")
+        conn.executemany("INSERT INTO temp.shard_class VALUES (?)", ((c,) for c in class_ids))
+        conn.execute(f"""
+            CREATE TEMP TABLE shard_student AS
+            SELECT student_id FROM src.student
+            WHERE class_id IN (SELECT class_id FROM temp.shard_class)
+               {"OR class_id IS NULL" if unassigned else ""}
+        """)
+        conn.execute(SHARD_TEACHER_SQL, {"school": school, "unassigned": unassigned})
+
+        for kind, name, sql in objects:
+            if kind != "trigger" and not (name in virtual and not sql.startswith("CREATE VIRTUAL")):
+                conn.execute(sql)
+        for kind, name, _ in objects:
+            if kind != "table" or name in SHARD_EMPTY or name.endswith(ARCHIVE_SUFFIX):
+                continue
+            if name in virtual:
+                continue
+            if name in summary.SUMMARY_TABLES:
+                continue
+            # lajur biasa sahaja (lajur GENERATED dikira semula)
+            names = ", ".join(f'"{column}"' for column, _ in table_columns(conn, name))
+            where = SHARD_FILTERS.get(name)
+            conn.execute(
+                f'INSERT INTO main."{name}" ({names}) SELECT {names} FROM src."{name}"'
+                + (f" WHERE {where}" if where else "")
+            )
+        # id AUTOINCREMENT diteruskan dari sumber: id lama tidak diguna semula
+        conn.execute("DELETE FROM main.sqlite_sequence")
+        conn.execute("INSERT INTO main.sqlite_sequence SELECT * FROM src.sqlite_sequence")
+        conn.execute("UPDATE main.teacher SET school = ?", (school,))
+
+        for kind, name, sql in objects:
+            if kind == "trigger":
+                conn.execute(sql)
+        summary.rebuild(conn)
+        search.rebuild(conn)
+
+        problems = conn.execute("PRAGMA main.foreign_key_check").fetchall()
+        if problems:
+            raise RuntimeError(f"{target_path}: {len(problems)} foreign key violations")
+        conn.commit()
+        conn.execute("DETACH DATABASE src")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA optimize")
+        students = conn.execute("SELECT COUNT(*) FROM student").fetchone()[0]
+    except Exception:
+        # ditutup sebelum dibuang; fail WAL/SHM yang tertinggal akan
+        # dibaca oleh split seterusnya ke path yang sama
+        conn.close()
+        for leftover in (target_path, target_path + "-wal", target_path + "-shm"):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
+        raise
+    conn.close()
+    return students
+
+
+def split(source_path, shard_dir, default_school, progress=print):
+    # satu shard bagi setiap kod sekolah dalam nama kelas; kelas tanpa
+    # kod (dan pelajar tanpa kelas) masuk ke default_school
+    conn = db.open_connection(source_path)
+    plan = {}
+    for class_id, class_name in conn.execute("SELECT class_id, class_name FROM class"):
+        plan.setdefault(school_of(class_name, default_school), []).append(class_id)
+    plan.setdefault(default_school, [])
+    conn.close()
+
+    os.makedirs(shard_dir, exist_ok=True)
+    counts = {}
+    for school in sorted(plan):
+        if not SCHOOL_PATTERN.match(school):
+            raise UnknownSchool(school)
+        counts[school] = build_shard(
+            source_path, os.path.join(shard_dir, school + SHARD_SUFFIX),
+            school, plan[school], unassigned=school == default_school
+        )
+        progress(f"{school}: {len(plan[school])} classes, {counts[school]} students")
+    return counts
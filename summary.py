@@ -0,0 +1,154 @@
+from classification import BMI_LABELS, FITNESS_LABELS
+from migrations import SUMMARY_TABLES
+
+# =========================
+# RINGKASAN KELAS / PENGGAL
+# =========================
+# Jadual ringkasan dikemas kini oleh trigger (lihat migration 4). Modul ini
+# membaca ringkasan untuk dashboard dan menyemak / membina semula jadual
+# itu dari data asal.
+
+# skor purata kecergasan: Poor = 1 .. Excellent = 4
+FITNESS_POINTS = {label: i + 1 for i, label in enumerate(FITNESS_LABELS)}
+
+
+# =========================
+# BACA UNTUK DASHBOARD
+# =========================
+def totals(conn):
+    return conn.execute("""
+        SELECT
+            (SELECT COALESCE(SUM(student_count), 0) FROM class_summary),
+            (SELECT COALESCE(SUM(record_count), 0) FROM class_bmi_summary),
+            (SELECT COALESCE(SUM(record_count), 0) FROM class_segak_summary),
+            (SELECT COUNT(*) FROM class)
+    """).fetchone()
+
+
+def class_overview(conn, term):
+    # satu baris setiap kelas: bilangan pelajar, taburan BMI dan kecergasan
+    classes = {}
+    for class_id, class_name, students in conn.execute("""
+        SELECT c.class_id, c.class_name, COALESCE(cs.student_count, 0)
+        FROM class c
+        LEFT JOIN class_summary cs ON cs.class_id = c.class_id
+        ORDER BY c.class_name
+    """):
+        classes[class_id] = {
+            "class_name": class_name,
+            "students": students,
+            "bmi": dict.fromkeys(BMI_LABELS, 0),
+            "fitness": dict.fromkeys(FITNESS_LABELS, 0),
+            "bmi_sum": 0,
+            "fitness_points": 0,
+        }
+
+    for class_id, status, count, bmi_sum in conn.execute(
+        """
+        SELECT class_id, bmi_status, record_count, bmi_sum
+        FROM class_bmi_summary
+        WHERE term = ? AND record_count > 0
+        """,
+        (term,)
+    ):
+        if class_id in classes:
+            row = classes[class_id]
+            row["bmi"][status] = row["bmi"].get(status, 0) + count
+            row["bmi_sum"] += bmi_sum
+
+    for class_id, level, count in conn.execute(
+        """
+        SELECT class_id, fitness_level, record_count
+        FROM class_segak_summary
+        WHERE term = ? AND record_count > 0
+        """,
+        (term,)
+    ):
+        if class_id in classes:
+            row = classes[class_id]
+            row["fitness"][level] = row["fitness"].get(level, 0) + count
+            row["fitness_points"] += FITNESS_POINTS.get(level, 0) * count
+
+    rows = []
+    for row in classes.values():
+        bmi_count = sum(row["bmi"].values())
+        fitness_count = sum(row["fitness"].values())
+        row["mean_bmi"] = round(row["bmi_sum"] / bmi_count, 1) if bmi_count else None
+        row["mean_fitness"] = (
+            round(row["fitness_points"] / fitness_count, 2) if fitness_count else None
+        )
+        rows.append(row)
+    return rows
+
+
+def term_trend(conn, limit=6):
+    # purata BMI dan kecergasan seluruh sekolah, penggal terkini dahulu
+    points = " ".join(
+        f"WHEN '{level}' THEN {point}" for level, point in FITNESS_POINTS.items()
+    )
+    bmi = {
+        term: (count, total)
+        for term, count, total in conn.execute("""
+            SELECT term, SUM(record_count), SUM(bmi_sum)
+            FROM class_bmi_summary
+            GROUP BY term
+        """)
+    }
+    fitness = {
+        term: (count, total)
+        for term, count, total in conn.execute(f"""
+            SELECT term, SUM(record_count),
+                   SUM(record_count * CASE fitness_level {points} ELSE 0 END)
+            FROM class_segak_summary
+            GROUP BY term
+        """)
+    }
+
+    trend = []
+    for term in sorted(set(bmi) | set(fitness), reverse=True):
+        bmi_count, bmi_sum = bmi.get(term, (0, 0))
+        tests, total = fitness.get(term, (0, 0))
+        # penggal yang semua rekodnya sudah dipadam
+        if not bmi_count and not tests:
+            continue
+        trend.append({
+            "term": term,
+            "bmi_records": bmi_count,
+            "mean_bmi": round(bmi_sum / bmi_count, 1) if bmi_count else None,
+            "segak_tests": tests,
+            "mean_fitness": round(total / tests, 2) if tests else None,
+        })
+        if len(trend) == limit:
+            break
+    return trend
+
+
+# =========================
+# SEMAK / BINA SEMULA
+# =========================
+def _rows(conn, sql, key_size):
+    # baris kosong (kiraan 0) ditinggalkan oleh trigger selepas delete
+    return {
+        tuple(row[:key_size]): tuple(round(v, 4) for v in row[key_size:])
+        for row in conn.execute(sql)
+        if row[key_size]
+    }
+
+
+def check(conn):
+    # pulangkan [(jadual, kunci, nilai disimpan, nilai sebenar)]
+    problems = []
+    for table, (keys, values, select_sql) in SUMMARY_TABLES.items():
+        stored = _rows(conn, f"SELECT {', '.join(keys + values)} FROM {table}", len(keys))
+        expected = _rows(conn, select_sql, len(keys))
+        for key in sorted(set(stored) | set(expected), key=repr):
+            if stored.get(key) != expected.get(key):
+                problems.append((table, key, stored.get(key), expected.get(key)))
+    return problems
+
+
+def rebuild(conn):
+    # tidak commit; pemanggil yang tentukan transaction
+    for table, (keys, values, select_sql) in SUMMARY_TABLES.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} ({', '.join(keys + values)}) {select_sql}")